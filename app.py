@@ -1,166 +1,192 @@
 import dash
-from dash import dcc, html, Input, Output, State, ctx
+from dash import dcc, html, dash_table, Input, Output, State, Patch, ctx, no_update
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+from flask import jsonify, request
+from werkzeug.utils import secure_filename
 import pandas as pd
+import pyarrow as pa
 import plotly.express as px
 import plotly.graph_objects as go
 import base64
 import io
 import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from category_index import CATEGORY_COLUMNS, CategoryIndex, filter_key
+from columnar_store import load_table, open_table
+from data_snapshot import DataSnapshot, SnapshotManager
+from figure_cache import FigureCache
+from filter_helper import IndexedFrame, filter_df
+from india_map import india_map
+from job_manager import create_job_manager, job_outbox
+from metrics import METRICS
+from nic_classifier import SECTORS, classify_master, sector_profile, state_code_diversity
+from profile_aggregator import MASTER_COLUMNS, ProfileAggregator, read_master_csv, read_master_header
+from record_browser import NUMERIC_COLUMNS, PAGE_SIZE, RECORD_COLUMNS, RecordIndex
+from response_encoding import install_compression, loads, templates_script
+from rollup_api import install_rollup_api
+from rollups import RankIndex, build_rollup_cube, build_state_features, select_rollup, select_dic
+from score_engine import INPUT_LABELS, SCORE_PILLARS, ScoreEngine
+from sql_engine import EXAMPLE_QUERY, MAX_ROWS, QUERY_TIMEOUT_SECONDS, QueryError, build_sql_engine, cached_query, install_sql_api
+from state_geometry import build_assets, level_for_zoom
+from time_cubes import DATE_COLUMNS, MEASURES, build_time_cubes
+from upload_stream import UPLOAD_CHUNK_ROWS, new_upload_id, read_progress, stream_csv_to_file, write_progress
 
 # === CONFIG ===
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], 
                 title="MSME Analytics Dashboard", suppress_callback_exceptions=True)
 server = app.server
-WORK_DIR = r"c:\Users\PRAVESH\Desktop\UDHAI"
-
-# State coordinates for mapping
-STATE_COORDS = {
-    'ANDHRA PRADESH': {'lat': 15.9129, 'lon': 79.7400},
-    'ARUNACHAL PRADESH': {'lat': 28.2180, 'lon': 94.7278},
-    'ASSAM': {'lat': 26.2006, 'lon': 92.9376},
-    'BIHAR': {'lat': 25.0961, 'lon': 85.3131},
-    'CHHATTISGARH': {'lat': 21.2787, 'lon': 81.8661},
-    'GOA': {'lat': 15.2993, 'lon': 74.1240},
-    'GUJARAT': {'lat': 22.2587, 'lon': 71.1924},
-    'HARYANA': {'lat': 29.0588, 'lon': 76.0856},
-    'HIMACHAL PRADESH': {'lat': 31.1048, 'lon': 77.1734},
-    'JHARKHAND': {'lat': 23.6102, 'lon': 85.2799},
-    'KARNATAKA': {'lat': 15.3173, 'lon': 75.7139},
-    'KERALA': {'lat': 10.8505, 'lon': 76.2711},
-    'MADHYA PRADESH': {'lat': 22.9734, 'lon': 78.6569},
-    'MAHARASHTRA': {'lat': 19.7515, 'lon': 75.7139},
-    'MANIPUR': {'lat': 24.6637, 'lon': 93.9063},
-    'MEGHALAYA': {'lat': 25.4670, 'lon': 91.3662},
-    'MIZORAM': {'lat': 23.1645, 'lon': 92.9376},
-    'NAGALAND': {'lat': 26.1584, 'lon': 94.5624},
-    'ODISHA': {'lat': 20.9517, 'lon': 85.0985},
-    'PUNJAB': {'lat': 31.1471, 'lon': 75.3412},
-    'RAJASTHAN': {'lat': 27.0238, 'lon': 74.2179},
-    'SIKKIM': {'lat': 27.5330, 'lon': 88.5122},
-    'TAMIL NADU': {'lat': 11.1271, 'lon': 78.6569},
-    'TELANGANA': {'lat': 18.1124, 'lon': 79.0193},
-    'TRIPURA': {'lat': 23.9408, 'lon': 91.9882},
-    'UTTAR PRADESH': {'lat': 26.8467, 'lon': 80.9462},
-    'UTTARAKHAND': {'lat': 30.0668, 'lon': 79.0193},
-    'WEST BENGAL': {'lat': 22.9868, 'lon': 87.8550},
-    'DELHI': {'lat': 28.7041, 'lon': 77.1025},
-    'CHANDIGARH': {'lat': 30.7333, 'lon': 76.7794},
-    'PUDUCHERRY': {'lat': 11.9416, 'lon': 79.8083},
-    'LAKSHADWEEP': {'lat': 10.5669, 'lon': 72.6417},
-    'JAMMU AND KASHMIR': {'lat': 33.7782, 'lon': 76.5762},
-    'DAMAN AND DIU': {'lat': 20.4283, 'lon': 72.8397},
-    'DADAR AND NAGAR HAVELI': {'lat': 20.1809, 'lon': 73.0169}
-}
+WORK_DIR = os.environ.get('MSME_WORK_DIR', r"c:\Users\PRAVESH\Desktop\UDHAI")
+RELOAD_POLL_SECONDS = 5  # how often each worker checks the source files for changes
+MAX_BACKGROUND_JOBS = 2  # heavy callbacks computing at once on this host (the rest queue)
+JOB_RESULT_SECONDS = 600  # how long a finished background result is reused
+
+# Heavy callbacks run as background jobs; a result is reused for the same inputs and data version
+JOB_MANAGER, JOB_SLOTS = create_job_manager(
+    WORK_DIR, MAX_BACKGROUND_JOBS, expire=JOB_RESULT_SECONDS,
+    cache_by=[lambda: SNAPSHOTS.current().version])
+# Timings recorded inside background jobs reach /metrics through this queue
+METRICS.outbox = job_outbox(WORK_DIR)
+
+# Serialized callback outputs, shared by all sessions in this worker, keyed by data version;
+# what background jobs compute comes back through the outbox
+FIGURE_CACHE = FigureCache(max_bytes=64 * 1024 * 1024, version_fn=lambda: SNAPSHOTS.current().version)
+FIGURE_CACHE.outbox = job_outbox(WORK_DIR, 'figures')
 
 # === LOAD DATA ===
-def load_csv(filename):
-    path = os.path.join(WORK_DIR, filename)
-    if os.path.exists(path):
-        try:
-            return pd.read_csv(path)
-        except Exception as e:
-            print(f"Error loading {filename}: {e}")
+def load_csv(filename, columns=None):
+    """Load a dataset with its declared dtypes, from the columnar copy once it has been converted"""
+    try:
+        df = load_table(WORK_DIR, filename, columns)
+        if df is not None:
+            return df
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
     return pd.DataFrame()
 
-# NIC Sector Mapping (5-digit code ranges to broad sectors)
-NIC_SECTOR_MAP = {
-    'Manufacturing': range(10000, 34000),
-    'Textiles & Apparel': range(13000, 15000),
-    'Food Processing': range(10000, 11000),
-    'Chemicals': range(20000, 21000),
-    'Metal & Machinery': range(24000, 29000),
-    'Construction': range(41000, 44000),
-    'Trade & Retail': range(45000, 48000),
-    'Transportation': range(49000, 54000),
-    'Hotels & Restaurants': range(55000, 57000),
-    'IT & Services': range(58000, 64000),
-    'Professional Services': range(69000, 75000),
-    'Other Services': range(77000, 97000)
-}
+def load_master(filename, columns=None):
+    """Load the master registrations as text columns, aligned to the data rows"""
+    try:
+        df = load_table(WORK_DIR, filename, columns, reader=read_master_csv)
+        if df is not None:
+            return df
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
+    return pd.DataFrame()
 
-def get_nic_sector(nic_code):
-    """Map a 5-digit NIC code to its broad sector"""
+def open_master(filename):
+    """Memory-mapped master registrations as an Arrow table, shared by all workers on the host"""
     try:
-        code = int(str(nic_code)[:5])
-        for sector, code_range in NIC_SECTOR_MAP.items():
-            if code in code_range:
-                return sector
-        return 'Other'
-    except:
-        return 'Other'
+        table = open_table(WORK_DIR, filename, reader=read_master_csv)
+        if table is not None:
+            return table
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
+    return pa.table({})
 
-print("Loading MSME data...", flush=True)
-df_loc = load_csv("location_profile.csv")
-df_soc = load_csv("social_profile.csv")
-df_emp = load_csv("employment_profile.csv")
-df_ind = load_csv("industry_profile.csv")
-df_score = load_csv("composite_score.csv")
-df_master = load_csv("msme_merged.csv")  # Master file for detailed NIC analysis
-print(f"Data loaded: {len(df_loc)} locations, {len(df_master)} master records", flush=True)
-
-# === HELPER ===
-def filter_df(df, state, district):
-    if df.empty:
+ENTERPRISE_TYPES = ['Micro', 'Small', 'Medium']
+
+def parse_enterprise_split(df):
+    """Expand "Micro: 5 | Small: 2 | Medium: 1" into per-type count and employment columns"""
+    if df.empty or 'enterprise_type_split' not in df.columns:
         return df
-    dff = df.copy()
-    if state and 'State' in dff.columns:
-        dff = dff[dff['State'] == state]
-    if district and 'District' in dff.columns:
-        dff = dff[dff['District'] == district]
-    return dff
-
-def create_india_map(df_state, color_col, scale='Viridis', title='', size_col=None):
-    """Create bubble map of India using state coordinates"""
-    if df_state.empty:
-        return go.Figure()
-    
-    # Add coordinates
-    df_map = df_state.copy()
-    df_map['lat'] = df_map['State'].map(lambda x: STATE_COORDS.get(x, {}).get('lat', 22))
-    df_map['lon'] = df_map['State'].map(lambda x: STATE_COORDS.get(x, {}).get('lon', 78))
-    
-    # Create figure
-    if size_col and size_col in df_map.columns:
-        fig = px.scatter_mapbox(
-            df_map,
-            lat='lat', lon='lon',
-            color=color_col,
-            size=size_col,
-            hover_name='State',
-            hover_data=[color_col],
-            color_continuous_scale=scale,
-            size_max=25,  # Reduced from 40 to make dots smaller
-            zoom=4.2,
-            center={"lat": 22, "lon": 78},
-            title=title
-        )
-    else:
-        fig = px.scatter_mapbox(
-            df_map,
-            lat='lat', lon='lon',
-            color=color_col,
-            hover_name='State',
-            hover_data=[color_col],
-            color_continuous_scale=scale,
-            size=[12]*len(df_map),  # Reduced from 30 to make dots smaller
-            zoom=4.2,
-            center={"lat": 22, "lon": 78},
-            title=title
-        )
-    
-    fig.update_layout(
-        mapbox_style="open-street-map",
-        margin={"r":0,"t":30,"l":0,"b":0},
-        height=850,
-        dragmode=False  # Disable rotation/dragging
-    )
-    fig.update_mapboxes(
-        bearing=0,  # Lock orientation
-        pitch=0     # Lock tilt
-    )
-    return fig
+    split = df['enterprise_type_split'].fillna('').astype(str)
+    msmes = df['total_msmes'].where(df['total_msmes'] > 0)
+    avg_emp_per_msme = (df['total_employment'] / msmes).fillna(0)
+    for etype in ENTERPRISE_TYPES:
+        col = etype.lower()
+        count = split.str.extract(rf'{etype}:\s*(\d+)', expand=False)
+        df[f'{col}_count'] = count.fillna(0).astype('int64')
+        # Employment is apportioned by the district's average employees per MSME
+        df[f'{col}_employment'] = df[f'{col}_count'] * avg_emp_per_msme
+    return df
+
+MASTER_FILE = "msme_merged.csv"
+PROFILE_FILES = {
+    'loc': "location_profile.csv",
+    'soc': "social_profile.csv",
+    'emp': "employment_profile.csv",
+    'ind': "industry_profile.csv",
+    'score': "composite_score.csv",
+}
+
+def build_score_engine(frames, master, nic):
+    """Score engine over the state totals of the profiles and the master's NIC codes"""
+    if nic is None or frames['soc'].df.empty or frames['emp'].df.empty:
+        return None
+    soc = frames['soc'].df.groupby('State')[['total_msmes', 'female_owned', 'sc_count', 'st_count']].sum()
+    emp = frames['emp'].df.groupby('State')[['total_investment', 'total_employment']].sum()
+    states = soc.join(emp, how='outer')
+    states['nic_codes'] = state_code_diversity(master, nic).reindex(states.index, fill_value=0)
+    return ScoreEngine(states)
+
+def build_snapshot(stamps):
+    """Read the source files and index them into a new DataSnapshot"""
+    profiles = {name: load_csv(filename) for name, filename in PROFILE_FILES.items()}
+    # Master file for detailed NIC analysis, kept as a read-only mapping of its Arrow copy
+    master = open_master(MASTER_FILE)
+    nic = classify_master(master)
+    # Profile frames are kept sorted by (State, District) so selections are slices
+    frames = {
+        'loc': IndexedFrame(profiles['loc']),
+        'soc': IndexedFrame(profiles['soc']),
+        'emp': IndexedFrame(parse_enterprise_split(profiles['emp'])),
+        'ind': IndexedFrame(profiles['ind']),
+        # Registrations per district and NIC sector, classified from every code of the master
+        'sector': IndexedFrame(sector_profile(master, nic)),
+    }
+    # Composite scores are computed in-app; composite_score.csv is only used without a master file
+    scores = build_score_engine(frames, master, nic)
+    df_score = scores.baseline.drop(columns='Rank').reset_index() if scores else profiles['score']
+    # Rollup cube (national -> state -> district) read by the dashboard callback
+    rollups = build_rollup_cube(frames['loc'].df, frames['soc'].df, frames['emp'].df,
+                                frames['ind'].df, df_score)
+    indexes = {
+        'scores': scores,
+        # Every rollup metric pre-sorted, nationally and per state, for the top-N charts and tables
+        'ranks': RankIndex(rollups),
+        # All state-level metrics side by side with national percentile ranks, for the DSS highlights
+        'states': build_state_features(rollups),
+        # Sorted orderings of the master's records, built as columns get sorted, for the record browser
+        'records': RecordIndex(master),
+        # One bitmap per value of the master's category columns, for the record browser's cross-filters
+        'categories': CategoryIndex(master),
+        # In-process DuckDB over the master (scanned in place) and the profiles, for the SQL page and API
+        'sql': build_sql_engine({
+            'location_profile': frames['loc'].df, 'social_profile': frames['soc'].df,
+            'employment_profile': frames['emp'].df, 'industry_profile': frames['ind'].df,
+            'composite_score': df_score, 'sector_profile': frames['sector'].df}, master),
+        # Monthly cumulative totals per district of each master date, for the trends page and its animation
+        'time': build_time_cubes(master),
+    }
+    return DataSnapshot(stamps, frames, rollups, master, indexes)
+
+# Source files are polled and reloaded in the background; callbacks read SNAPSHOTS.current()
+SNAPSHOTS = SnapshotManager([os.path.join(WORK_DIR, f) for f in [*PROFILE_FILES.values(), MASTER_FILE]],
+                            build_snapshot, poll_seconds=RELOAD_POLL_SECONDS)
+
+print("Loading MSME data...", flush=True)
+_snap = SNAPSHOTS.refresh()
+print(f"Data loaded: {len(_snap.frames['loc'].df)} locations, {_snap.master.num_rows} master records", flush=True)
+
+# State boundaries for choropleth maps, simplified and serialized once; served by /geo/<level>
+try:
+    GEO_ASSETS = build_assets()
+except Exception as e:
+    print(f"Error loading state boundaries: {e}")
+    GEO_ASSETS = {}
+
+def state_geojson(style, zoom):
+    """Boundary URL for a choropleth at this zoom, None for bubble maps (or without boundaries)"""
+    asset = GEO_ASSETS.get(level_for_zoom(zoom)) if style == 'choropleth' else None
+    if asset is None:
+        return None
+    # The ETag in the URL lets browsers cache each level for good
+    return app.get_relative_path(f'/geo/india_states.{level_for_zoom(zoom)}.json?v={asset.etag}')
 
 # === LAYOUTS ===
 def create_header():
@@ -184,10 +210,27 @@ def create_header():
         html.Div([
             dbc.Button("Dashboard", id="btn-dashboard", color="danger", className="me-2", n_clicks=0),
             dbc.Button("DSS Tools", id="btn-dss", color="warning", className="me-2", n_clicks=0),
+            dbc.Button("Records", id="btn-records", color="info", className="me-2", n_clicks=0),
+            dbc.Button("SQL", id="btn-sql", color="secondary", className="me-2", n_clicks=0),
+            dbc.Button("Trends", id="btn-trends", color="success", className="me-2", n_clicks=0),
             dbc.Button("Data Upload", id="btn-upload", color="primary", n_clicks=0)
         ])
     ], className="header-container")
 
+def create_job_status(prefix):
+    """Progress bar and Cancel button of a background callback, shown while it runs
+
+    The stores hold the inputs of a job to start ({prefix}-job) and the time of the last
+    answer served from the figure cache ({prefix}-hit), which cancels a running job.
+    """
+    return html.Div([
+        dbc.Progress(id=f'{prefix}-progress', value=0, striped=True, animated=True,
+                     style={'height': '18px', 'flex': '1'}, className="me-2"),
+        dbc.Button("Cancel", id=f'{prefix}-cancel', color="secondary", size="sm", outline=True, n_clicks=0),
+        dcc.Store(id=f'{prefix}-job'),
+        dcc.Store(id=f'{prefix}-hit')
+    ], id=f'{prefix}-job-status', style={'display': 'none'}, className="mt-2 mb-2")
+
 def create_dashboard_layout():
     return html.Div([
         html.Div([
@@ -203,10 +246,14 @@ def create_dashboard_layout():
             html.Label("State:", className="nav-label"),
             dcc.Dropdown(id='state-selector', placeholder="All States", style={'width': '200px'}, className="me-3"),
             html.Label("District:", className="nav-label"),
-            dcc.Dropdown(id='district-selector', placeholder="All Districts", style={'width': '200px'})
+            dcc.Dropdown(id='district-selector', placeholder="All Districts", style={'width': '200px'}, className="me-3"),
+            html.Label("Map:", className="nav-label"),
+            dcc.Dropdown(id='map-style', value='bubble', clearable=False, style={'width': '150px'},
+                options=[{'label': 'Bubbles', 'value': 'bubble'}, {'label': 'Choropleth', 'value': 'choropleth'}])
         ], className="nav-bar"),
         
         dbc.Container([
+            create_job_status('dashboard'),
             dcc.Loading(id="loading", type="circle", children=[
                 html.Br(),
                 dbc.Row(id='kpi-row', className="mb-3"),
@@ -239,10 +286,53 @@ def create_dashboard_layout():
                         ], className="section-card")
                     ], width=4)
                 ])
-            ])
+            ]),
+            
+            # What-if simulator (Development Score tab only)
+            html.Div(id='whatif-container', children=create_whatif_panel(), style={'display': 'none'})
         ], fluid=True, className="p-4")
     ])
 
+WHATIF_WEIGHTS = [('whatif-weight-scale', 'Scale'), ('whatif-weight-social', 'Social'),
+                  ('whatif-weight-employment', 'Employment'), ('whatif-weight-industry', 'Industry')]
+
+def create_whatif_panel():
+    return html.Div([
+        html.H5("What-if Simulator", className="section-title"),
+        html.P("Re-weight the four pillars or change a state's inputs to see how every state re-ranks.",
+               className="text-muted", style={'fontSize': '0.9rem'}),
+        dcc.Store(id='whatif-adjustments', data=[]),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Pillar Weights", className="dss-control-label"),
+                *[html.Div([
+                    html.Small(label),
+                    dcc.Slider(id=slider_id, min=0, max=100, step=5, value=25,
+                               marks={0: '0', 25: '25', 50: '50', 75: '75', 100: '100'})
+                ]) for slider_id, label in WHATIF_WEIGHTS]
+            ], width=4),
+            dbc.Col([
+                html.Label("Scenario Inputs", className="dss-control-label"),
+                dcc.Dropdown(id='whatif-state', placeholder="State", className="mb-2"),
+                dcc.Dropdown(id='whatif-input', value='female_owned', clearable=False, className="mb-2",
+                             options=[{'label': label, 'value': col} for col, label in INPUT_LABELS.items()]),
+                dbc.InputGroup([
+                    dbc.Input(id='whatif-change', type='number', value=10, step=1),
+                    dbc.InputGroupText("%"),
+                    dbc.Button("Add", id='whatif-add', color="primary", n_clicks=0),
+                    dbc.Button("Reset", id='whatif-reset', color="secondary", outline=True, n_clicks=0)
+                ], size="sm", className="mb-2"),
+                html.Small("Female/SC/ST ownership changes are percentage points of the state's MSMEs; "
+                           "other inputs change relatively.", className="text-muted"),
+                html.Ul(id='whatif-adjustment-list', className="mt-2", style={'fontSize': '0.9rem'})
+            ], width=4),
+            dbc.Col([
+                html.Div(id='whatif-summary')
+            ], width=4)
+        ]),
+        html.Div(id='whatif-results', style={'maxHeight': '500px', 'overflowY': 'auto'})
+    ], className="section-card mt-3")
+
 def create_dss_layout():
     return dbc.Container([
         dbc.Row([
@@ -264,6 +354,17 @@ def create_dss_layout():
                         className="mb-3"
                     ),
                     
+                    html.Label("Map Style", className="dss-control-label"),
+                    dcc.RadioItems(
+                        id='dss-map-style',
+                        options=[{'label': ' Bubbles', 'value': 'bubble'}, {'label': ' Choropleth', 'value': 'choropleth'}],
+                        value='bubble', inline=True, inputStyle={'marginRight': '4px'}, labelStyle={'marginRight': '15px'},
+                        className="mb-3"
+                    ),
+                    create_job_status('dss'),
+                    # (state, style) the map on screen was drawn for; highlight changes are patched onto it
+                    dcc.Store(id='dss-map-selection'),
+                    
                     html.Div("Decision Insights", className="dss-section-header"),
                     html.Div(id='dss-insights', style={'fontSize': '0.9rem', 'padding': '10px', 'backgroundColor': '#f8f9fa', 'borderRadius': '5px', 'minHeight': '60px'}),
                     
@@ -282,6 +383,98 @@ def create_dss_layout():
         ], className="g-0")
     ], fluid=True)
 
+# Cross-filter dropdowns of the record browser: (component id, master column, label)
+RECORD_FILTERS = [(f'records-{col}', col, label) for col, label in CATEGORY_COLUMNS.items()]
+
+def create_records_layout():
+    return html.Div([
+        html.Div([
+            html.Label("State:", className="nav-label"),
+            dcc.Dropdown(id='records-state', placeholder="All States", style={'width': '200px'}, className="me-3"),
+            html.Label("District:", className="nav-label"),
+            dcc.Dropdown(id='records-district', placeholder="All Districts", style={'width': '200px'}, className="me-3"),
+            html.Span(id='records-count', className="text-muted")
+        ], className="nav-bar"),
+        
+        dbc.Container([
+            html.Div([
+                html.H5("Cross-filter", className="section-title"),
+                dbc.Row([
+                    dbc.Col(dcc.Dropdown(id=filter_id, multi=True, placeholder=label), width=2)
+                    for filter_id, _, label in RECORD_FILTERS
+                ], className="g-2"),
+                dcc.Graph(id='records-breakdown', style={'height': '300px'}, config={'displayModeBar': False})
+            ], className="section-card mb-3"),
+            
+            html.Div([
+                html.H5("Registered Enterprises", className="section-title"),
+                html.P("Sort by clicking a column header; filter by typing in the row under it (e.g. Female, > 10).",
+                       className="text-muted", style={'fontSize': '0.9rem'}),
+                # Filtering, sorting and paging happen on the server: only the visible page is sent
+                dash_table.DataTable(
+                    id='records-table',
+                    columns=[{'name': label, 'id': col, 'type': 'numeric' if col in NUMERIC_COLUMNS else 'text'}
+                             for col, label in RECORD_COLUMNS.items()],
+                    page_current=0, page_size=PAGE_SIZE, page_action='custom',
+                    sort_action='custom', sort_mode='single', sort_by=[],
+                    filter_action='custom', filter_query='',
+                    style_table={'overflowX': 'auto'},
+                    style_cell={'textAlign': 'left', 'fontSize': '0.85rem', 'maxWidth': '280px',
+                                'overflow': 'hidden', 'textOverflow': 'ellipsis'},
+                    style_header={'fontWeight': 'bold'}
+                )
+            ], className="section-card")
+        ], fluid=True, className="p-4")
+    ])
+
+def create_sql_layout():
+    return dbc.Container([
+        html.Br(),
+        html.Div([
+            html.H5("SQL Query", className="section-title"),
+            html.P(f"Read-only: one SELECT over the tables below, at most {MAX_ROWS:,} rows and "
+                   f"{QUERY_TIMEOUT_SECONDS} seconds per query.", className="text-muted", style={'fontSize': '0.9rem'}),
+            dcc.Textarea(id='sql-query', value=EXAMPLE_QUERY,
+                         style={'width': '100%', 'height': '160px', 'fontFamily': 'monospace', 'fontSize': '0.9rem'}),
+            dbc.Button("Run", id='sql-run', color="primary", n_clicks=0, className="mt-2"),
+            html.Div(id='sql-tables', className="text-muted small mt-3"),
+            dcc.Loading(html.Div(id='sql-results', className="mt-3"))
+        ], className="section-card")
+    ], fluid=True, className="p-4")
+
+def create_trends_layout():
+    return html.Div([
+        html.Div([
+            html.Label("Date:", className="nav-label"),
+            dcc.Dropdown(id='trends-field', options=[{'label': l, 'value': c} for c, l in DATE_COLUMNS.items()],
+                         value='registrationdate', clearable=False, style={'width': '200px'}, className="me-3"),
+            html.Label("Measure:", className="nav-label"),
+            dcc.Dropdown(id='trends-measure', options=[{'label': l, 'value': m} for m, (_, l) in MEASURES.items()],
+                         value='msme_count', clearable=False, style={'width': '180px'}, className="me-3"),
+            html.Label("State:", className="nav-label"),
+            dcc.Dropdown(id='trends-state', placeholder="All States", style={'width': '200px'}, className="me-3"),
+            html.Span(id='trends-summary', className="text-muted")
+        ], className="nav-bar"),
+        
+        dbc.Container([
+            html.Div([
+                html.H5("Date Range", className="section-title"),
+                # Month positions of the selected date's cube; marks and bounds are set from the cube
+                dcc.RangeSlider(id='trends-range', min=0, max=1, step=1, value=[0, 1], allowCross=False,
+                                tooltip={'placement': 'bottom'}),
+            ], className="section-card mb-3"),
+            dbc.Row([
+                dbc.Col(html.Div([
+                    dcc.Loading(dcc.Graph(id='trends-map', style={'height': '720px'},
+                                          config={'scrollZoom': False, 'displayModeBar': False}))
+                ], className="section-card"), width=7),
+                dbc.Col(html.Div([
+                    dcc.Graph(id='trends-monthly', style={'height': '720px'}, config={'displayModeBar': False})
+                ], className="section-card"), width=5),
+            ], className="g-3")
+        ], fluid=True, className="p-4")
+    ])
+
 def create_upload_layout():
     return dbc.Container([
         html.Br(),
@@ -302,6 +495,8 @@ def create_upload_layout():
                     },
                     multiple=False
                 ),
+                html.P("Large extracts: POST the file to /upload/stream/<filename> and poll "
+                       "/upload/progress/<upload_id> instead.", className="text-muted small"),
                 html.Div(id='upload-output', className='mt-3')
             ])
         ], className="p-4", style={'maxWidth': '700px', 'margin': 'auto'})
@@ -317,69 +512,193 @@ app.layout = html.Div([
 # === CALLBACKS ===
 
 @app.callback(Output('page-mode', 'data'),
-              [Input('btn-dashboard', 'n_clicks'), Input('btn-dss', 'n_clicks'), Input('btn-upload', 'n_clicks')],
+              [Input('btn-dashboard', 'n_clicks'), Input('btn-dss', 'n_clicks'), Input('btn-records', 'n_clicks'),
+               Input('btn-sql', 'n_clicks'), Input('btn-trends', 'n_clicks'), Input('btn-upload', 'n_clicks')],
               State('page-mode', 'data'))
-def toggle_mode(btn1, btn2, btn3, current):
+@METRICS.callback()
+def toggle_mode(btn1, btn2, btn3, btn4, btn5, btn6, current):
     cid = ctx.triggered_id
     if cid == 'btn-dss': return 'dss'
+    if cid == 'btn-records': return 'records'
+    if cid == 'btn-sql': return 'sql'
+    if cid == 'btn-trends': return 'trends'
     if cid == 'btn-upload': return 'upload'
     return 'dashboard'
 
 @app.callback(Output('page-content', 'children'), Input('page-mode', 'data'))
+@METRICS.callback(view=lambda mode: mode or '')
 def render_page(mode):
     if mode == 'dss': return create_dss_layout()
+    if mode == 'records': return create_records_layout()
+    if mode == 'sql': return create_sql_layout()
+    if mode == 'trends': return create_trends_layout()
     if mode == 'upload': return create_upload_layout()
     return create_dashboard_layout()
 
 @app.callback(Output('state-selector', 'options'), Input('page-mode', 'data'))
+@METRICS.callback()
 def populate_state_dropdown(mode):
-    if df_loc.empty: return []
-    return [{'label': s, 'value': s} for s in sorted(df_loc['State'].dropna().unique())]
+    return [{'label': s, 'value': s} for s in SNAPSHOTS.current().frames['loc'].states()]
 
 @app.callback(Output('dss-state-selector', 'options'), Input('page-mode', 'data'))
+@METRICS.callback()
 def populate_dss_state(mode):
-    if df_loc.empty: return []
-    return [{'label': s, 'value': s} for s in sorted(df_loc['State'].dropna().unique())]
+    return [{'label': s, 'value': s} for s in SNAPSHOTS.current().frames['loc'].states()]
 
 @app.callback(Output('district-selector', 'options'), Input('state-selector', 'value'))
+@METRICS.callback()
 def update_districts(state):
-    if not state or df_loc.empty: return []
-    dists = df_loc[df_loc['State'] == state]['District'].dropna().unique()
-    return [{'label': d, 'value': d} for d in sorted(dists)]
+    if not state: return []
+    return [{'label': d, 'value': d} for d in SNAPSHOTS.current().frames['loc'].districts(state)]
+
+# Dashboard Labels (header, map description and chart-3 visibility depend on the tab alone)
+DASHBOARD_LABELS = {
+    'tab1': ("Location Distribution",
+             "Bubble size represents MSME density. Darker colors indicate higher concentration of enterprises.", False),
+    'tab2': ("Social Inclusion",
+             "Map shows female ownership percentage. Larger bubbles indicate more enterprises.", False),
+    'tab3': ("Employment & Investment",
+             "Bubble size shows total employment. Color intensity indicates employment levels across states.", True),
+    'tab4': ("Industry Profile", "", True),
+    'tab5': ("Development Scorecard",
+             "Color coding shows MSME development score (Red: Low, Yellow: Medium, Green: High).", True),
+}
+
+@app.callback(
+    [Output('chart-header', 'children'), Output('map-description', 'children'), Output('chart-3-container', 'style'),
+     Output('whatif-container', 'style')],
+    Input('tab-selector', 'value')
+)
+@METRICS.callback(view=lambda tab: tab)
+def update_dashboard_labels(tab):
+    header, map_desc, show_chart3 = DASHBOARD_LABELS.get(tab, ("Analytics", "", False))
+    return (header, map_desc, {'display': 'block' if show_chart3 else 'none'},
+            {'display': 'block' if tab == 'tab5' else 'none'})
+
+# Dashboard Map (state-level, so a district change never rebuilds it)
+# tab -> (profile, color column, scale, title, size column)
+DASHBOARD_MAPS = {
+    'tab1': ('loc', 'msme_count', 'Viridis', 'MSME Density', 'msme_count'),
+    'tab2': ('soc', 'women_pct', 'RdPu', 'Female Ownership %', 'total_msmes'),
+    'tab3': ('emp', 'total_employment', 'Plasma', 'Employment', 'total_employment'),
+}
+
+@app.callback(Output('main-map', 'figure'),
+              [Input('tab-selector', 'value'), Input('state-selector', 'value'), Input('map-style', 'value')])
+@METRICS.callback(view=lambda tab, *_: tab)
+@FIGURE_CACHE.memoize('update_dashboard_map')
+def update_dashboard_map(tab, state, style='bubble'):
+    snap = SNAPSHOTS.current()
+    lap = METRICS.laps()
+    map_fig = go.Figure()
+    try:
+        if tab in DASHBOARD_MAPS:
+            profile, color_col, scale, title, size_col = DASHBOARD_MAPS[tab]
+            view = select_rollup(snap.rollups, profile, state)
+            lap('filter')
+            if not view.districts.empty:
+                map_fig = india_map(view.states.reset_index(), color_col, scale, title, size_col,
+                                    geojson=state_geojson(style, 4.2))
+
+        elif tab == 'tab4':
+            view = select_rollup(snap.rollups, 'ind', state)
+            lap('filter')
+            if not view.districts.empty:
+                # Rollups keep sums; the profile columns are per-row means
+                mean_cols = {f'{c}_mean': c for c in ['manufacturing_pct', 'services_pct']}
+                df_map = view.states[list(mean_cols)].rename(columns=mean_cols).reset_index()
+                # Red for high manufacturing, Green for high services
+                map_fig = india_map(df_map, 'manufacturing_pct', 'RdYlGn_r', 'Manufacturing vs Services %',
+                                    hover=[('manufacturing_pct', 'Manufacturing %', '.1f'),
+                                           ('services_pct', 'Services %', '.1f')],
+                                    zoom=3.8, height=650, geojson=state_geojson(style, 3.8))
+
+        elif tab == 'tab5':
+            scores = snap.rollups.get('score')
+            if scores is not None and (not state or state in scores['state'].index):
+                dff = (scores['state'].loc[[state]] if state else scores['state']).reset_index()
+                lap('filter')
+                map_fig = india_map(dff, 'Final_MSME_Score', 'RdYlGn', 'MSME Score', geojson=state_geojson(style, 4.2))
+
+    except Exception as e:
+        print(f"Dashboard map error: {e}")
+    lap('figure')
+    
+    return map_fig
+
+# Background jobs: a new selection kills the running job, Cancel stops it, progress shows meanwhile.
+# Each is started from a {prefix}-job store by a plain callback that answers cache hits itself,
+# so a job (a forked process) only runs for outputs nobody has computed yet.
+def background_options(prefix):
+    return dict(
+        background=True, manager=JOB_MANAGER, prevent_initial_call=True,
+        progress=[Output(f'{prefix}-progress', 'value'), Output(f'{prefix}-progress', 'label')],
+        progress_default=[0, ''],
+        running=[(Output(f'{prefix}-job-status', 'style'), {'display': 'flex'}, {'display': 'none'})],
+        cancel=[Input(f'{prefix}-cancel', 'n_clicks'), Input(f'{prefix}-hit', 'data')],
+    )
+
+@contextmanager
+def job_progress(set_progress):
+    """Run a job's work in one of the MAX_BACKGROUND_JOBS slots, reporting queued / computing"""
+    with JOB_SLOTS.slot(on_wait=lambda: set_progress((10, "Queued"))):
+        set_progress((50, "Computing"))
+        yield
+
+# Dashboard Panels (KPIs, insights and charts)
+DASHBOARD_PANELS = [Output('kpi-row', 'children'), Output('chart-1', 'figure'), Output('chart-2', 'figure'),
+                    Output('chart-3', 'figure'), Output('insights-section', 'children')]
 
-# Dashboard Main
 @app.callback(
-    [Output('kpi-row', 'children'), Output('main-map', 'figure'), Output('chart-1', 'figure'), 
-     Output('chart-2', 'figure'), Output('chart-header', 'children'),
-     Output('chart-3', 'figure'), Output('chart-3-container', 'style'),
-     Output('insights-section', 'children'), Output('map-description', 'children')],
+    DASHBOARD_PANELS + [Output('dashboard-job', 'data'), Output('dashboard-hit', 'data')],
     [Input('tab-selector', 'value'), Input('state-selector', 'value'), Input('district-selector', 'value')]
 )
+@METRICS.callback(view=lambda tab, *_: tab)
 def update_dashboard(tab, state, district):
-    map_fig = go.Figure()
+    if tab == 'tab5':
+        # The scorecard is state-level: a district change leaves it as it is
+        if ctx.triggered_id == 'district-selector':
+            raise PreventUpdate
+        district = None
+    panels = build_dashboard_panels.cached(tab, state, district)
+    if panels is None:
+        return [no_update] * len(DASHBOARD_PANELS) + [[tab, state, district], no_update]
+    return [*panels, no_update, time.time()]
+
+@app.callback(
+    [Output(o.component_id, o.component_property, allow_duplicate=True) for o in DASHBOARD_PANELS],
+    Input('dashboard-job', 'data'),
+    **background_options('dashboard')
+)
+@METRICS.callback(view=lambda set_progress, job: job[0])
+def compute_dashboard(set_progress, job):
+    with job_progress(set_progress):
+        return build_dashboard_panels(*job)
+
+@FIGURE_CACHE.memoize('update_dashboard')
+def build_dashboard_panels(tab, state, district):
+    snap = SNAPSHOTS.current()
+    ranks = snap.indexes['ranks']
+    lap = METRICS.laps()  # stage timings: filter / aggregate / figure
     chart1 = go.Figure()
     chart2 = go.Figure()
     chart3 = go.Figure()
     kpis = []
-    header = "Analytics"
-    show_chart3 = {'display': 'none'}
     insights = html.Div()
-    map_desc = ""
     
     try:
         if tab == 'tab1':
-            dff = filter_df(df_loc, state, district)
-            header ="Location Distribution"
-            map_desc = "Bubble size represents MSME density. Darker colors indicate higher concentration of enterprises."
-            
-            if not dff.empty:
-                state_agg = dff.groupby('State', as_index=False).agg({'msme_count': 'sum'})
-                map_fig = create_india_map(state_agg, 'msme_count', 'Viridis', 'MSME Density', 'msme_count')
-                
+            view = select_rollup(snap.rollups, 'loc', state, district)
+            lap('filter')
+
+            if not view.districts.empty:
+                top_states = ranks.top('loc', 'msme_count', 10, state, district, level='state').reset_index()
+
                 # Generate insights
-                top_state = state_agg.loc[state_agg['msme_count'].idxmax()]
-                total_msmes = dff['msme_count'].sum()
-                top_3_states = state_agg.nlargest(3, 'msme_count')
+                top_state = top_states.iloc[0]
+                total_msmes = int(view.totals['msme_count'])
+                district_count = int(view.totals['districts'])
+                top_3_states = top_states.head(3)
                 top_3_contribution = (top_3_states['msme_count'].sum() / total_msmes * 100)
                 
                 insights = dbc.Alert([
@@ -390,49 +709,44 @@ def update_dashboard(tab, state, district):
                     html.Ul([
                         html.Li(f"🥇 {top_state['State']} leads with {top_state['msme_count']:,} MSMEs"),
                         html.Li(f"📈 Top 3 states account for {top_3_contribution:.1f}% of total enterprises"),
-                        html.Li(f"🏢 Total {dff['District'].nunique()} districts have registered MSMEs"),
+                        html.Li(f"🏢 Total {district_count} districts have registered MSMEs"),
                     ], style={'marginBottom': '0'})
                 ], color="info", className="mb-3")
                 
                 kpis = [
-                    dbc.Col(html.Div([html.Div(f"{dff['msme_count'].sum():,}", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{total_msmes:,}", className="kpi-value"), 
                                       html.Div("Total MSMEs", className="kpi-label")], className="kpi-card bg-grey"), width=3),
-                    dbc.Col(html.Div([html.Div(dff['District'].nunique(), className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(district_count, className="kpi-value"), 
                                       html.Div("Districts", className="kpi-label")], className="kpi-card bg-blue"), width=3)
                 ]
+                lap('aggregate')
                 
-                top10 = dff.groupby('District')['msme_count'].sum().nlargest(10).reset_index()
+                top10 = ranks.top('loc', 'msme_count', 10, state, district).reset_index()
                 chart1 = px.bar(top10, x='District', y='msme_count', title="Top 10 Districts by MSME Count")
                 chart1.update_layout(height=320)
                 
                 if state:
-                    chart2 = px.pie(dff, names='Dic_Name', values='msme_count', title="DIC Distribution", hole=0.4)
+                    dic = select_dic(snap.rollups, state, district)
+                    chart2 = px.pie(dic, names='Dic_Name', values='msme_count', title="DIC Distribution", hole=0.4)
                 else:
-                    top_states = state_agg.nlargest(10, 'msme_count')
                     chart2 = px.bar(top_states, x='State', y='msme_count', title="Top 10 States by MSME Count", color='msme_count')
                 chart2.update_layout(height=320)
         
         elif tab == 'tab2':
-            dff = filter_df(df_soc, state, district)
-            header = "Social Inclusion"
-            map_desc = "Map shows female ownership percentage. Larger bubbles indicate more enterprises."
+            view = select_rollup(snap.rollups, 'soc', state, district)
+            lap('filter')
             
-            if not dff.empty:
-                state_agg = dff.groupby('State', as_index=False).agg({
-                    'female_owned': 'sum', 'total_msmes': 'sum', 'sc_count': 'sum', 'st_count': 'sum'
-                })
-                state_agg['women_pct'] = (state_agg['female_owned'] / state_agg['total_msmes'] * 100).fillna(0)
-                map_fig = create_india_map(state_agg, 'women_pct', 'RdPu', 'Female Ownership %', 'total_msmes')
+            if not view.districts.empty:
+                totals = view.totals
                 
                 # Generate insights
-                female_total = dff['female_owned'].sum()
-                male_total = dff['male_owned'].sum()
+                female_total = int(totals['female_owned'])
+                male_total = int(totals['male_owned'])
                 total_all = female_total + male_total
                 women_pct = (female_total / total_all * 100) if total_all > 0 else 0
-                top_women_state = state_agg.loc[state_agg['women_pct'].idxmax()]
+                top_women_state = ranks.top('soc', 'women_pct', 1, state, district, level='state').reset_index().iloc[0]
                 
-                sc_st_total = dff['sc_count'].sum() + dff['st_count'].sum()
-                sc_st_pct = (sc_st_total / dff['total_msmes'].sum() * 100) if dff['total_msmes'].sum() > 0 else 0
+                sc_st_pct = totals['sc_st_pct']
                 
                 insights = dbc.Alert([
                     html.Div([
@@ -447,16 +761,17 @@ def update_dashboard(tab, state, district):
                 ], color="success", className="mb-3")
                 
                 kpis = [
-                    dbc.Col(html.Div([html.Div(f"{dff['female_owned'].sum():,}", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{female_total:,}", className="kpi-value"), 
                                       html.Div("Women Owned", className="kpi-label")], className="kpi-card bg-red"), width=3),
-                    dbc.Col(html.Div([html.Div(f"{dff['male_owned'].sum():,}", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{male_total:,}", className="kpi-value"), 
                                       html.Div("Men Owned", className="kpi-label")], className="kpi-card bg-yellow"), width=3)
                 ]
+                lap('aggregate')
                 
                 # CHART 1: Social Category Distribution as DONUT CHART
                 cats_data = pd.DataFrame({
                     'Category': ['General', 'OBC', 'SC', 'ST'], 
-                    'Count': [dff['general_count'].sum(), dff['obc_count'].sum(), dff['sc_count'].sum(), dff['st_count'].sum()]
+                    'Count': [int(totals['general_count']), int(totals['obc_count']), int(totals['sc_count']), int(totals['st_count'])]
                 })
                 
                 chart1 = px.pie(
@@ -473,7 +788,7 @@ def update_dashboard(tab, state, district):
                 # CHART 2: Gender Distribution as PIE CHART with OUTSIDE percentages
                 genders_data = pd.DataFrame({
                     'Gender': ['Male', 'Female'], 
-                    'Count': [dff['male_owned'].sum(), dff['female_owned'].sum()]
+                    'Count': [male_total, female_total]
                 })
                 chart2 = px.pie(
                     genders_data, 
@@ -491,22 +806,21 @@ def update_dashboard(tab, state, district):
                 chart2.update_layout(height=350)
         
         elif tab == 'tab3':
-            dff = filter_df(df_emp, state, district)
-            header = "Employment & Investment"
-            map_desc = "Bubble size shows total employment. Color intensity indicates employment levels across states."
+            view = select_rollup(snap.rollups, 'emp', state, district)
+            lap('filter')
             
-            if not dff.empty:
-                state_agg = dff.groupby('State', as_index=False).agg({'total_employment': 'sum', 'total_msmes': 'sum'})
-                map_fig = create_india_map(state_agg, 'total_employment', 'Plasma', 'Employment', 'total_employment')
+            if not view.districts.empty:
+                totals = view.totals
+                state_agg = view.states.reset_index()
                 
                 # Enhanced KPIs
-                total_investment = dff['total_investment'].sum()
-                total_employment = dff['total_employment'].sum()
-                avg_investment_per_job = total_investment / total_employment if total_employment > 0 else 0
+                total_investment = totals['total_investment']
+                total_employment = int(totals['total_employment'])
+                total_msmes = int(totals['total_msmes'])
+                avg_investment_per_job = totals['investment_per_job']
                 
                 # Generate insights
-                top_employer = dff.loc[dff['total_employment'].idxmax()]
-                avg_emp_per_msme = total_employment / dff['total_msmes'].sum() if dff['total_msmes'].sum() > 0 else 0
+                avg_emp_per_msme = totals['avg_employment']
                 
                 insights = dbc.Alert([
                     html.Div([
@@ -514,7 +828,7 @@ def update_dashboard(tab, state, district):
                         html.Strong("💼 Employment Insights:"),
                     ], className="mb-2"),
                     html.Ul([
-                        html.Li(f"👥 Total {total_employment:,} jobs created across {dff['total_msmes'].sum():,} MSMEs"),
+                        html.Li(f"👥 Total {total_employment:,} jobs created across {total_msmes:,} MSMEs"),
                         html.Li(f"📊 Average {avg_emp_per_msme:.1f} employees per enterprise"),
                         html.Li(f"💰 Investment efficiency: ₹{avg_investment_per_job:.1f}L per job created"),
                     ], style={'marginBottom': '0'})
@@ -528,42 +842,15 @@ def update_dashboard(tab, state, district):
                     dbc.Col(html.Div([html.Div(f"₹{avg_investment_per_job:.1f}L", className="kpi-value"), 
                                       html.Div("Investment per Job", className="kpi-label")], className="kpi-card bg-red"), width=3)
                 ]
+                lap('aggregate')
                 
                 # CHART 1: Enterprise Type Distribution with Employment
-                # Parse enterprise_type_split to extract counts
-                def parse_enterprise_types(df):
-                    enterprise_data = {'Micro': 0, 'Small': 0, 'Medium': 0}
-                    employment_data = {'Micro': 0, 'Small': 0, 'Medium': 0}
-                    
-                    for idx, row in df.iterrows():
-                        split_str = str(row.get('enterprise_type_split', ''))
-                        emp = row.get('total_employment', 0)
-                        msmes = row.get('total_msmes', 1)
-                        avg_emp_per_msme = emp / msmes if msmes > 0 else 0
-                        
-                        # Parse "Micro: 5 | Small: 2 | Medium: 1" format
-                        for part in split_str.split('|'):
-                            part = part.strip()
-                            if 'Micro:' in part:
-                                count = int(part.split(':')[1].strip())
-                                enterprise_data['Micro'] += count
-                                employment_data['Micro'] += count * avg_emp_per_msme
-                            elif 'Small:' in part:
-                                count = int(part.split(':')[1].strip())
-                                enterprise_data['Small'] += count
-                                employment_data['Small'] += count * avg_emp_per_msme
-                            elif 'Medium:' in part:
-                                count = int(part.split(':')[1].strip())
-                                enterprise_data['Medium'] += count
-                                employment_data['Medium'] += count * avg_emp_per_msme
-                    
-                    return pd.DataFrame({
-                        'Enterprise Type': list(enterprise_data.keys()),
-                        'Count': list(enterprise_data.values()),
-                        'Employment': list(employment_data.values())
-                    })
-                
-                enterprise_df = parse_enterprise_types(dff)
+                # Counts and apportioned employment were parsed from enterprise_type_split at load
+                enterprise_df = pd.DataFrame({
+                    'Enterprise Type': ENTERPRISE_TYPES,
+                    'Count': [int(totals[f'{t.lower()}_count']) for t in ENTERPRISE_TYPES],
+                    'Employment': [totals[f'{t.lower()}_employment'] for t in ENTERPRISE_TYPES]
+                })
                 enterprise_df['Avg Employment'] = enterprise_df['Employment'] / enterprise_df['Count']
                 enterprise_df['Avg Employment'] = enterprise_df['Avg Employment'].fillna(0)
                 
@@ -579,15 +866,9 @@ def update_dashboard(tab, state, district):
                 chart1.update_traces(texttemplate='%{text:.0f}', textposition='outside')
                 chart1.update_layout(height=400, showlegend=False)
                 
-                # CHART 2: Investment Efficiency - Top Districts
-                dff_efficiency = dff.copy()
-                dff_efficiency['employment_per_investment'] = (
-                    dff_efficiency['total_employment'] / dff_efficiency['total_investment']
-                ).replace([float('inf'), -float('inf')], 0).fillna(0)
-                
-                # Filter out zeros and get top performers
-                dff_efficiency = dff_efficiency[dff_efficiency['employment_per_investment'] > 0]
-                top_efficient = dff_efficiency.nlargest(15, 'employment_per_investment')
+                # CHART 2: Investment Efficiency - Top Districts (zeros filtered out)
+                top_efficient = ranks.top('emp', 'employment_per_investment', 15, state, district).reset_index()
+                top_efficient = top_efficient[top_efficient['employment_per_investment'] > 0]
                 
                 if len(top_efficient) > 0:
                     chart2 = px.bar(
@@ -611,7 +892,7 @@ def update_dashboard(tab, state, district):
                     chart2.update_layout(height=400, title="No data available")
                 
                 # CHART 3: Top Employment Generators
-                top_employers = dff.nlargest(15, 'total_employment')
+                top_employers = ranks.top('emp', 'total_employment', 15, state, district).reset_index()
                 
                 chart3 = px.bar(
                     top_employers,
@@ -628,70 +909,29 @@ def update_dashboard(tab, state, district):
                     xaxis_title="",
                     yaxis_title="Total Employment"
                 )
-                
-                # Show Chart 3
-                show_chart3 = {'display': 'block'}
         
         elif tab == 'tab4':
-            dff = filter_df(df_ind, state, district)
-            header = "Industry Profile"
-            if not dff.empty:
-                # Aggregate by state for map visualization
-                state_agg = dff.groupby('State', as_index=False).agg({
-                    'manufacturing_pct': 'mean',
-                    'services_pct': 'mean',
-                    'industry_diversity_index': 'mean'
-                })
-                
-                # Create map showing BOTH manufacturing and services percentages
-                # Add both metrics to the dataframe for hover display
-                state_agg_map = state_agg.copy()
-                
-                # Create custom map with both metrics visible
-                df_map = state_agg_map.copy()
-                df_map['lat'] = df_map['State'].map(lambda x: STATE_COORDS.get(x, {}).get('lat', 22))
-                df_map['lon'] = df_map['State'].map(lambda x: STATE_COORDS.get(x, {}).get('lon', 78))
-                
-                # Create scatter mapbox with both manufacturing and services in hover
-                map_fig = px.scatter_mapbox(
-                    df_map,
-                    lat='lat', 
-                    lon='lon',
-                    color='manufacturing_pct',
-                    hover_name='State',
-                    hover_data={
-                        'manufacturing_pct': ':.1f',
-                        'services_pct': ':.1f',
-                        'lat': False,
-                        'lon': False
-                    },
-                    color_continuous_scale='RdYlGn_r',  # Red for high manufacturing, Green for high services
-                    size=[12]*len(df_map),
-                    zoom=3.8,
-                    center={"lat": 22, "lon": 78},
-                    title='Manufacturing vs Services %',
-                    labels={
-                        'manufacturing_pct': 'Manufacturing %',
-                        'services_pct': 'Services %'
-                    }
-                )
-                
-                map_fig.update_layout(
-                    mapbox_style="open-street-map",
-                    margin={"r":0,"t":30,"l":0,"b":0},
-                    height=650,
-                    dragmode=False
-                )
-                map_fig.update_mapboxes(bearing=0, pitch=0)
+            view = select_rollup(snap.rollups, 'ind', state, district)
+            lap('filter')
+            if not view.districts.empty:
+                # Rollups keep sums; the profile columns are per-row means
+                mean_cols = {f'{c}_mean': c for c in ['manufacturing_pct', 'services_pct', 'industry_diversity_index']}
+                dff = view.districts[list(mean_cols)].rename(columns=mean_cols).reset_index()
+
+                def top_means(metric, level='district'):
+                    top = ranks.top('ind', f'{metric}_mean', 15, state, district, level=level)
+                    return top[list(mean_cols)].rename(columns=mean_cols).reset_index()
+                totals = view.totals
                 
                 kpis = [
-                    dbc.Col(html.Div([html.Div(f"{dff['manufacturing_pct'].mean():.1f}%", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{totals['manufacturing_pct_mean']:.1f}%", className="kpi-value"), 
                                       html.Div("Avg Manufacturing", className="kpi-label")], className="kpi-card bg-red"), width=3),
-                    dbc.Col(html.Div([html.Div(f"{dff['services_pct'].mean():.1f}%", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{totals['services_pct_mean']:.1f}%", className="kpi-value"), 
                                       html.Div("Avg Services", className="kpi-label")], className="kpi-card bg-blue"), width=3),
-                    dbc.Col(html.Div([html.Div(f"{dff['industry_diversity_index'].mean():.1f}", className="kpi-value"), 
+                    dbc.Col(html.Div([html.Div(f"{totals['industry_diversity_index_mean']:.1f}", className="kpi-value"), 
                                       html.Div("Avg Diversity Index", className="kpi-label")], className="kpi-card bg-green"), width=3)
                 ]
+                lap('aggregate')
                 
                 # CHART 1: Manufacturing vs Services Bar Chart
                 if state:
@@ -719,7 +959,7 @@ def update_dashboard(tab, state, district):
                     chart1.update_layout(height=400, xaxis_tickangle=-45)
                 else:
                     # Show state-level aggregation
-                    top_states = state_agg.nlargest(15, 'manufacturing_pct')
+                    top_states = top_means('manufacturing_pct', level='state')
                     mfg_vs_svc = top_states.melt(
                         id_vars=['State'], 
                         value_vars=['manufacturing_pct', 'services_pct'],
@@ -743,7 +983,7 @@ def update_dashboard(tab, state, district):
                 
                 # CHART 2: Industry Diversity Index
                 if state:
-                    diversity_data = dff.sort_values('industry_diversity_index', ascending=False).head(15)
+                    diversity_data = top_means('industry_diversity_index')
                     chart2 = px.bar(
                         diversity_data,
                         x='District',
@@ -754,7 +994,7 @@ def update_dashboard(tab, state, district):
                     )
                     chart2.update_layout(height=400, xaxis_tickangle=-45)
                 else:
-                    diversity_state = state_agg.sort_values('industry_diversity_index', ascending=False).head(15)
+                    diversity_state = top_means('industry_diversity_index', level='state')
                     chart2 = px.bar(
                         diversity_state,
                         x='State',
@@ -764,23 +1004,50 @@ def update_dashboard(tab, state, district):
                         color_continuous_scale='Viridis'
                     )
                     chart2.update_layout(height=400, xaxis_tickangle=-45)
+
+                # CHART 3: Sector mix from every NIC code of the selected registrations
+                lap('figure')
+                sectors = filter_df(snap.frames['sector'], state, district)
+                lap('filter')
+                if not sectors.empty:
+                    sector_mix = sectors.groupby('Sector')[['primary_msmes', 'active_msmes']].sum()
+                    sector_mix = sector_mix.reindex([s for s in SECTORS if s in sector_mix.index]).reset_index()
+                    sector_mix = sector_mix.sort_values('primary_msmes', ascending=False, kind='mergesort').melt(
+                        id_vars=['Sector'],
+                        value_vars=['primary_msmes', 'active_msmes'],
+                        var_name='Measure',
+                        value_name='MSMEs'
+                    )
+                    sector_mix['Measure'] = sector_mix['Measure'].map({
+                        'primary_msmes': 'Primary activity',
+                        'active_msmes': 'Any activity'
+                    })
+                    lap('aggregate')
+                    chart3 = px.bar(
+                        sector_mix,
+                        x='Sector',
+                        y='MSMEs',
+                        color='Measure',
+                        title="Sector Mix (NIC codes)",
+                        barmode='group',
+                        color_discrete_map={'Primary activity': '#FF6B35', 'Any activity': '#004E89'}
+                    )
+                    chart3.update_layout(height=400, xaxis_tickangle=-45, xaxis_title="")
                 
-                # No Chart 3 - keeping single map only
-                show_chart3 = {'display': 'none'}
         
         elif tab == 'tab5':
-            dff = filter_df(df_score, state, None)
-            header = "Development Scorecard"
-            map_desc = "Color coding shows MSME development score (Red: Low, Yellow: Medium, Green: High)."
+            scores = snap.rollups.get('score')
             
-            if not dff.empty:
-                map_fig = create_india_map(dff, 'Final_MSME_Score', 'RdYlGn', 'MSME Score')
+            if scores is not None and (not state or state in scores['state'].index):
+                dff = (scores['state'].loc[[state]] if state else scores['state']).reset_index()
+                lap('filter')
                 
                 # Enhanced KPIs
-                avg_score = dff['Final_MSME_Score'].mean()
-                top_state = dff.loc[dff['Final_MSME_Score'].idxmax(), 'State']
-                top_score = dff['Final_MSME_Score'].max()
-                category_counts = dff['Category'].value_counts()
+                avg_score = dff['Final_MSME_Score'].mean() if state else scores['national']['Final_MSME_Score']
+                top_states = ranks.top('score', 'Final_MSME_Score', 20, state, level='state').reset_index()
+                top_state = top_states['State'].iloc[0]
+                top_score = top_states['Final_MSME_Score'].iloc[0]
+                category_counts = dff['Category'].value_counts() if state else scores['category_counts']
                 
                 # Generate insights
                 advanced_count = category_counts.get('Advanced', 0)
@@ -807,9 +1074,9 @@ def update_dashboard(tab, state, district):
                     dbc.Col(html.Div([html.Div(str(len(dff)), className="kpi-value"), 
                                       html.Div("States/UTs", className="kpi-label")], className="kpi-card bg-red"), width=3)
                 ]
+                lap('aggregate')
                 
                 # CHART 1: Enhanced State Rankings (Top 20 only for better readability)
-                top_states = dff.nlargest(20, 'Final_MSME_Score')
                 
                 chart1 = px.bar(
                     top_states.sort_values('Final_MSME_Score'),
@@ -835,7 +1102,7 @@ def update_dashboard(tab, state, district):
                 )
                 
                 # CHART 2: Radar Chart for Top 5 States showing all 4 dimensions
-                top5_states = dff.nlargest(5, 'Final_MSME_Score')
+                top5_states = top_states.head(5)
                 
                 chart2 = go.Figure()
                 
@@ -876,20 +1143,14 @@ def update_dashboard(tab, state, district):
                 )
                 
                 # CHART 3: Category Distribution with Score Breakdown
-                category_stats = dff.groupby('Category').agg({
-                    'Final_MSME_Score': 'mean',
-                    'State': 'count'
-                }).reset_index()
-                category_stats.columns = ['Category', 'Avg_Score', 'Count']
-                
-                # Sort by category order
-                category_order = ['Nascent', 'Emerging', 'Developing', 'Advanced']
-                category_stats['Category'] = pd.Categorical(
-                    category_stats['Category'], 
-                    categories=category_order, 
-                    ordered=True
-                )
-                category_stats = category_stats.sort_values('Category')
+                if state:
+                    category_stats = dff.groupby('Category').agg({
+                        'Final_MSME_Score': 'mean',
+                        'State': 'count'
+                    }).reset_index()
+                    category_stats.columns = ['Category', 'Avg_Score', 'Count']
+                else:
+                    category_stats = scores['category_stats']
                 
                 chart3 = go.Figure()
                 
@@ -936,77 +1197,389 @@ def update_dashboard(tab, state, district):
                     hovermode='x unified'
                 )
                 
-                # Show Chart 3
-                show_chart3 = {'display': 'block'}
 
     except Exception as e:
         print(f"Dashboard error: {e}")
+    lap('figure')
     
-    return kpis, map_fig, chart1, chart2, header, chart3, show_chart3, insights, map_desc
+    return kpis, chart1, chart2, chart3, insights
 
 # DSS View
+DSS_OUTPUTS = [Output('dss-main-map', 'figure'), Output('dss-insights', 'children'), Output('dss-map-selection', 'data')]
+
+def dss_response(fig, insights, state, style, patch):
+    """(figure, insights, selection drawn); with patch, only the colouring of the figure"""
+    if patch and fig.get('data'):
+        # Same states on the map, only the colouring changes: send just those parts
+        trace = fig['data'][0]
+        colouring = Patch()
+        for key in ('marker', 'z', 'customdata', 'hovertemplate'):
+            if key in trace:
+                colouring['data'][0][key] = trace[key]
+        colouring['layout']['coloraxis'] = fig['layout'].get('coloraxis')
+        colouring['layout']['title'] = fig['layout'].get('title')
+        fig = colouring
+    return fig, insights, [state, style]
+
 @app.callback(
-    [Output('dss-main-map', 'figure'), Output('dss-data-table', 'children'), Output('dss-insights', 'children')],
-    [Input('dss-state-selector', 'value'), Input('dss-highlight-selector', 'value')]
+    DSS_OUTPUTS + [Output('dss-job', 'data'), Output('dss-hit', 'data')],
+    [Input('dss-state-selector', 'value'), Input('dss-highlight-selector', 'value'), Input('dss-map-style', 'value')],
+    State('dss-map-selection', 'data')
 )
-def update_dss(state, highlight):
-    dff = df_loc.copy() if not df_loc.empty else pd.DataFrame()
-    if state and not dff.empty:
-        dff = dff[dff['State'] == state]
-    
-    if dff.empty:
-        return go.Figure(), html.P("No data"), "No data available"
+@METRICS.callback(view=lambda state, highlight, *_: highlight)
+def update_dss(state, highlight, style, drawn):
+    # A state or style job that was cancelled or is still queued leaves another map on screen
+    patch = ctx.triggered_id == 'dss-highlight-selector' and drawn == [state, style]
+    cached = build_dss_map.cached(state, highlight, style)
+    if cached is None:
+        return [no_update] * len(DSS_OUTPUTS) + [[state, highlight, style, patch], no_update]
+    return [*dss_response(*cached, state, style, patch), no_update, time.time()]
+
+@app.callback(
+    [Output(o.component_id, o.component_property, allow_duplicate=True) for o in DSS_OUTPUTS],
+    Input('dss-job', 'data'),
+    **background_options('dss')
+)
+@METRICS.callback(view=lambda set_progress, job: job[1])
+def compute_dss(set_progress, job):
+    state, highlight, style, patch = job
+    with job_progress(set_progress):
+        fig, insights = build_dss_map(state, highlight, style)
+    return dss_response(fig, insights, state, style, patch)
+
+# Highlight rules: rule(state features, column) -> (highlight score per state, states highlighted)
+def top_share(share):
+    """The column's value where a state is in the national top share of states, 0 elsewhere"""
+    def rule(features, column):
+        below = features[f'{column}_percentile'] < 1 - share
+        return features[column].mask(below, 0), (~below & features[column].notna()).sum()
+    return rule
+
+def under(limit):
+    """How far a percentage is from 100, counting the states below limit"""
+    def rule(features, column):
+        return 100 - features[column], (features[column] < limit).sum()
+    return rule
+
+# Highlight mode -> (state feature column, rule, colour scale, insight)
+DSS_HIGHLIGHTS = {
+    'high_density': ('msme_count', top_share(0.3), [[0, 'lightgrey'], [0.01, 'red'], [1, 'darkred']],
+                     "🔴 {count} states highlighted in RED (top 30% MSME density)"),
+    'low_female': ('women_pct', under(20), [[0, 'lightgreen'], [0.5, 'yellow'], [1, 'orange']],
+                   "🟠 {count} states need focus on women entrepreneurship (< 20% female owned)"),
+    'high_employment': ('total_employment', top_share(0.3), [[0, 'lightgrey'], [0.01, 'green'], [1, 'darkgreen']],
+                        "🟢 {count} states are HIGH employment generators (top 30%)"),
+}
+
+@FIGURE_CACHE.memoize('update_dss')
+def build_dss_map(state, highlight, style='bubble'):
+    snap = SNAPSHOTS.current()
+    lap = METRICS.laps()
+    features = snap.indexes['states']
+    state_agg = features[features.index == state] if state else features
+    lap('filter')
     
-    state_agg = dff.groupby('State', as_index=False).agg({'msme_count': 'sum'})
+    if state_agg.empty:
+        return go.Figure(), "No data available"
+    state_agg = state_agg.reset_index()
     color = 'msme_count'
     scale = 'Viridis'
     insights = "All India view - select a highlight option"
     
-    if highlight == 'high_density':
-        threshold = state_agg['msme_count'].quantile(0.7)
-        state_agg['highlight_score'] = state_agg['msme_count']
-        state_agg.loc[state_agg['msme_count'] < threshold, 'highlight_score'] = 0
+    spec = DSS_HIGHLIGHTS.get(highlight)
+    if spec and spec[0] in state_agg.columns:
+        column, rule, scale, insights = spec
+        state_agg['highlight_score'], count = rule(state_agg, column)
         color = 'highlight_score'
-        scale = [[0, 'lightgrey'], [0.01, 'red'], [1, 'darkred']]
-        count = (state_agg['msme_count'] >= threshold).sum()
-        insights = f"🔴 {count} states highlighted in RED (top 30% MSME density)"
-    
-    elif highlight == 'low_female':
-        if not df_soc.empty:
-            soc_state = df_soc.groupby('State', as_index=False).agg({'female_owned': 'sum', 'total_msmes': 'sum'})
-            soc_state['women_pct'] = (soc_state['female_owned'] / soc_state['total_msmes'] * 100).fillna(0)
-            state_agg = state_agg.merge(soc_state[['State', 'women_pct']], on='State', how='left')
-            state_agg['highlight_score'] = 100 - state_agg['women_pct']
-            color = 'highlight_score'
-            scale = [[0, 'lightgreen'], [0.5, 'yellow'], [1, 'orange']]
-            count = (state_agg['women_pct'] < 20).sum()
-            insights = f"🟠 {count} states need focus on women entrepreneurship (< 20% female owned)"
+        insights = insights.format(count=count)
     
-    elif highlight == 'high_employment':
-        if not df_emp.empty:
-            emp_state = df_emp.groupby('State', as_index=False).agg({'total_employment': 'sum'})
-            state_agg = state_agg.merge(emp_state, on='State', how='left')
-            threshold = state_agg['total_employment'].quantile(0.7)
-            state_agg['highlight_score'] = state_agg['total_employment']
-            state_agg.loc[state_agg['total_employment'] < threshold, 'highlight_score'] = 0
-            color = 'highlight_score'
-            scale = [[0, 'lightgrey'], [0.01, 'green'], [1, 'darkgreen']]
-            count = (state_agg['total_employment'] >= threshold).sum()
-            insights = f"🟢 {count} states are HIGH employment generators (top 30%)"
+    lap('aggregate')
+    fig = india_map(state_agg, color, scale, f"DSS: {highlight}", size_col='msme_count' if highlight == 'none' else None,
+                    height=880, geojson=state_geojson(style, 4.2))
+    lap('figure')
     
-    fig = create_india_map(state_agg, color, scale, f"DSS: {highlight}", size_col='msme_count' if highlight == 'none' else None)
-    fig.update_layout(height=880, dragmode=False)
-    fig.update_mapboxes(bearing=0, pitch=0)
+    return fig, insights
+
+# DSS Table (top districts depend on the state only, not the highlight mode)
+@app.callback(Output('dss-data-table', 'children'), Input('dss-state-selector', 'value'))
+@METRICS.callback()
+@FIGURE_CACHE.memoize('update_dss_table')
+def update_dss_table(state):
+    top_districts = SNAPSHOTS.current().indexes['ranks'].top('loc', 'msme_count', 15, state).reset_index()
+    if top_districts.empty:
+        return html.P("No data")
     
-    # Table
-    top_districts = dff.groupby('District')['msme_count'].sum().nlargest(15).reset_index()
+    top_districts = top_districts[['District', 'msme_count']]
     top_districts.columns = ['District', 'MSMEs']
-    table = dbc.Table.from_dataframe(top_districts, striped=True, bordered=True, hover=True, size='sm')
+    return dbc.Table.from_dataframe(top_districts, striped=True, bordered=True, hover=True, size='sm')
+
+# What-if Simulator (scores every state in-app; no cache, a scenario takes milliseconds)
+@app.callback(Output('whatif-state', 'options'), Input('page-mode', 'data'))
+@METRICS.callback()
+def populate_whatif_state(mode):
+    scores = SNAPSHOTS.current().indexes.get('scores')
+    return [{'label': s, 'value': s} for s in scores.states] if scores else []
+
+@app.callback(
+    Output('whatif-adjustments', 'data'),
+    [Input('whatif-add', 'n_clicks'), Input('whatif-reset', 'n_clicks')],
+    [State('whatif-state', 'value'), State('whatif-input', 'value'), State('whatif-change', 'value'),
+     State('whatif-adjustments', 'data')]
+)
+@METRICS.callback()
+def update_whatif_adjustments(add, reset, state, input_col, change, adjustments):
+    if ctx.triggered_id == 'whatif-reset':
+        return []
+    if ctx.triggered_id != 'whatif-add' or not state or not input_col or not change:
+        raise PreventUpdate
+    return (adjustments or []) + [{'state': state, 'input': input_col, 'change_pct': change}]
+
+@app.callback(
+    [Output('whatif-results', 'children'), Output('whatif-summary', 'children'),
+     Output('whatif-adjustment-list', 'children')],
+    [Input(slider_id, 'value') for slider_id, _ in WHATIF_WEIGHTS] + [Input('whatif-adjustments', 'data')]
+)
+@METRICS.callback()
+def update_whatif(w_scale, w_social, w_employment, w_industry, adjustments):
+    scores = SNAPSHOTS.current().indexes.get('scores')
+    if scores is None:
+        return html.P("No data"), None, []
+    weights = [w or 0 for w in (w_scale, w_social, w_employment, w_industry)]
+    adjustments = adjustments or []
+    result = scores.compare(weights, adjustments).reset_index()
+    
+    moved = result[result['Category'] != result['Baseline_Category']]
+    total = sum(weights)
+    weight_text = ", ".join(f"{label} {w / total * 100:.0f}%" for (_, label), w in zip(WHATIF_WEIGHTS, weights)) if total else "equal"
+    summary = dbc.Alert([
+        html.Strong("📊 Scenario Summary"),
+        html.Ul([
+            html.Li(f"Weights: {weight_text}"),
+            html.Li(f"{(result['Rank_Change'] != 0).sum()} states change rank"),
+            html.Li(f"{len(moved)} states change category" + (
+                ": " + ", ".join(f"{r.State} ({r.Baseline_Category} → {r.Category})" for r in moved.itertuples())
+                if len(moved) else "")),
+        ], style={'marginBottom': '0'})
+    ], color="info")
+    
+    table = result[['Rank', 'State', 'Final_MSME_Score', 'Score_Change', 'Rank_Change', 'Category',
+                    'Baseline_Category'] + SCORE_PILLARS]
+    table = table.rename(columns={'Final_MSME_Score': 'Score', 'Score_Change': 'Δ Score', 'Rank_Change': 'Δ Rank',
+                                  'Baseline_Category': 'Was', **{c: c.replace('_Score', '') for c in SCORE_PILLARS}})
+    items = [html.Li(f"{a['state']}: {INPUT_LABELS.get(a['input'], a['input'])} {a['change_pct']:+g}%")
+             for a in adjustments]
+    return dbc.Table.from_dataframe(table, striped=True, bordered=True, hover=True, size='sm'), summary, items
+
+# Once a reload lands, render the landing views so the first visitor doesn't pay for them
+def warm_figure_cache(snap):
+    update_dashboard_map('tab1', None, 'bubble')
+    build_dashboard_panels('tab1', None, None)
+    build_dss_map(None, 'none', 'bubble')
+    update_dss_table(None)
+
+SNAPSHOTS.on_swap = warm_figure_cache
+
+# Record Browser (one page of master records per request, from the snapshot's record index)
+@app.callback(Output('records-state', 'options'), Input('page-mode', 'data'))
+@METRICS.callback()
+def populate_records_state(mode):
+    # The record index's own (trimmed) names: some profile names carry trailing spaces
+    return [{'label': s, 'value': s} for s in SNAPSHOTS.current().indexes['records'].states()]
+
+@app.callback(Output('records-district', 'options'), Input('records-state', 'value'))
+@METRICS.callback()
+def update_records_districts(state):
+    if not state: return []
+    return [{'label': d, 'value': d} for d in SNAPSHOTS.current().indexes['records'].districts(state)]
+
+@app.callback(
+    [Output(filter_id, 'options') for filter_id, _, _ in RECORD_FILTERS],
+    [Input(filter_id, 'value') for filter_id, _, _ in RECORD_FILTERS] +
+    [Input('records-state', 'value'), Input('records-district', 'value')]
+)
+@METRICS.callback()
+def update_record_filter_options(*args):
+    # Each value is counted under the other filters, so the labels show what picking it would leave
+    *values, state, district = args
+    categories = SNAPSHOTS.current().indexes['categories']
+    filters = {col: v for (_, col, _), v in zip(RECORD_FILTERS, values)}
+    options = []
+    for _, col, _ in RECORD_FILTERS:
+        counts = categories.value_counts(col, filters, state, district)
+        options.append([{'label': f"{value} ({n:,})", 'value': value} for value, n in counts.items()])
+    return options
+
+@app.callback(
+    Output('records-breakdown', 'figure'),
+    [Input(filter_id, 'value') for filter_id, _, _ in RECORD_FILTERS] + [Input('records-state', 'value')]
+)
+@METRICS.callback()
+def update_record_breakdown(*args):
+    *values, state = args
+    filters = {col: v for (_, col, _), v in zip(RECORD_FILTERS, values)}
+    counts = SNAPSHOTS.current().indexes['categories'].district_counts(filters, state)
+    # Per district within a state, per state nationally
+    by = 'District' if state else 'State'
+    top = counts.groupby(level=by).sum().nlargest(20).reset_index()
+    fig = px.bar(top, x=by, y='msme_count', title=f"Matching registrations by {by.lower()} (top 20)",
+                 labels={'msme_count': 'Registrations', by: ''})
+    fig.update_layout(margin=dict(l=40, r=10, t=40, b=80), xaxis_tickangle=-45)
+    return fig
+
+@app.callback(
+    Output('records-table', 'page_current'),
+    [Input('records-state', 'value'), Input('records-district', 'value'),
+     Input('records-table', 'sort_by'), Input('records-table', 'filter_query')] +
+    [Input(filter_id, 'value') for filter_id, _, _ in RECORD_FILTERS]
+)
+@METRICS.callback()
+def reset_records_page(state, district, sort_by, filter_query, *categories):
+    return 0
+
+@app.callback(
+    [Output('records-table', 'data'), Output('records-table', 'page_count'), Output('records-count', 'children')],
+    [Input('records-table', 'page_current'), Input('records-table', 'page_size'), Input('records-table', 'sort_by'),
+     Input('records-table', 'filter_query'), Input('records-state', 'value'), Input('records-district', 'value')] +
+    [Input(filter_id, 'value') for filter_id, _, _ in RECORD_FILTERS]
+)
+@METRICS.callback()
+def update_records(page_current, page_size, sort_by, filter_query, state, district, *values):
+    snap = SNAPSHOTS.current()
+    filters = {col: v for (_, col, _), v in zip(RECORD_FILTERS, values)}
+    sort = (sort_by or [{}])[0]
+    page = snap.indexes['records'].page(
+        state, district, sort.get('column_id'), sort.get('direction') != 'desc', filter_query,
+        page_current or 0, page_size, rows=snap.indexes['categories'].row_mask(filters), rows_key=filter_key(filters))
+    page_size = page_size or PAGE_SIZE
+    return page.rows.to_dict('records'), max(1, -(-page.total // page_size)), f"{page.total:,} registrations"
+
+# SQL Page (results cached per data version, shared with POST /api/v1/sql)
+@app.callback(Output('sql-tables', 'children'), Input('page-mode', 'data'))
+@METRICS.callback()
+def populate_sql_tables(mode):
+    engine = SNAPSHOTS.current().indexes.get('sql')
+    if mode != 'sql' or engine is None:
+        return None
+    return [html.Div([html.Strong(table), ": " + ", ".join(col for col, _ in columns)])
+            for table, columns in engine.schema().items()]
+
+@app.callback(Output('sql-results', 'children'), Input('sql-run', 'n_clicks'), State('sql-query', 'value'))
+@METRICS.callback()
+def run_sql(n_clicks, sql):
+    if not n_clicks or not (sql or '').strip():
+        raise PreventUpdate
+    snap = SNAPSHOTS.current()
+    if snap.indexes.get('sql') is None:
+        return dbc.Alert("SQL engine unavailable (install duckdb)", color="warning")
+    try:
+        result = loads(cached_query(FIGURE_CACHE, snap, sql))
+    except QueryError as e:
+        return dbc.Alert(str(e), color="danger")
     
-    return fig, table, insights
+    # Columns by position: a query can return two columns with the same name
+    ids = [str(i) for i in range(len(result['columns']))]
+    rows = [dict(zip(ids, row)) for row in result['rows']]
+    note = f"{len(rows):,} rows in {result['seconds']:.2f}s" + (f" (first {MAX_ROWS:,} shown)" if result['truncated'] else "")
+    return [
+        html.Small(note, className="text-muted"),
+        dash_table.DataTable(columns=[{'name': name, 'id': i} for i, name in zip(ids, result['columns'])],
+                             data=rows, page_size=25, sort_action='native', style_table={'overflowX': 'auto'},
+                             style_cell={'textAlign': 'left', 'fontSize': '0.85rem'}, style_header={'fontWeight': 'bold'})
+    ]
+
+# Trends (every figure of a date range comes from the snapshot's monthly cubes)
+@app.callback(Output('trends-state', 'options'), Input('page-mode', 'data'))
+@METRICS.callback()
+def populate_trends_state(mode):
+    return [{'label': s, 'value': s} for s in SNAPSHOTS.current().frames['loc'].states()]
+
+@app.callback(
+    [Output('trends-range', 'max'), Output('trends-range', 'value'), Output('trends-range', 'marks')],
+    Input('trends-field', 'value')
+)
+@METRICS.callback()
+def update_trends_range(field):
+    cube = SNAPSHOTS.current().indexes['time'].get(field)
+    if cube is None:
+        return 1, [0, 1], {}
+    last = len(cube.months) - 1
+    # A mark every January, thinned to about a dozen
+    januaries = [i for i, m in enumerate(cube.months) if m.endswith('-01')]
+    every = max(1, -(-len(januaries) // 12))
+    marks = {i: cube.months[i][:4] for i in januaries[::every]}
+    return last, [0, last], marks
+
+def trends_map(cube, measure, state, start, end):
+    """Bubble map of the running total per state over a month range, animated one frame per step"""
+    frames = cube.frames(measure, start, end)
+    label = MEASURES[measure][1]
+    final = frames[-1].values.rename('value').reset_index()
+    if state:
+        final = final[final['State'] == state]
+    fig = india_map(final, 'value', 'Viridis', f"{label} since {cube.months[cube.span(start, end)[0]]}",
+                    size_col='value', hover=[('value', label, ',.0f')], height=720)
+    if not fig['data']:
+        return fig
+    # Fixed color range and bubble scale across frames: the final frame holds every peak
+    trace = fig['data'][0]
+    peak = max(final['value'].max(), 1)
+    fig['layout']['coloraxis'].update(cmin=0, cmax=peak)
+    fig['frames'] = []
+    for frame in frames:
+        values = frame.values.reindex(final['State']).fillna(0).to_numpy()
+        fig['frames'].append({'name': frame.month, 'data': [{
+            'marker': {**trace['marker'], 'color': values.tolist(), 'size': values.tolist()},
+            'customdata': values[:, None].tolist()}]})
+    play = {'frame': {'duration': 300, 'redraw': True}, 'transition': {'duration': 0}, 'fromcurrent': True}
+    fig['layout']['updatemenus'] = [{
+        'type': 'buttons', 'direction': 'left', 'x': 0.02, 'y': 0.02, 'xanchor': 'left', 'yanchor': 'bottom',
+        'buttons': [{'label': '▶', 'method': 'animate', 'args': [None, play]},
+                    {'label': '⏸', 'method': 'animate',
+                     'args': [[None], {'frame': {'duration': 0, 'redraw': False}, 'mode': 'immediate'}]}]}]
+    fig['layout']['sliders'] = [{
+        'active': len(frames) - 1, 'x': 0.12, 'y': 0.02, 'len': 0.85, 'yanchor': 'bottom',
+        'currentvalue': {'prefix': 'Up to '}, 'pad': {'t': 0, 'b': 0},
+        'steps': [{'label': f.month, 'method': 'animate',
+                   'args': [[f.month], {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate'}]}
+                  for f in frames]}]
+    return fig
+
+@app.callback(
+    [Output('trends-map', 'figure'), Output('trends-monthly', 'figure'), Output('trends-summary', 'children')],
+    [Input('trends-field', 'value'), Input('trends-measure', 'value'), Input('trends-state', 'value'),
+     Input('trends-range', 'value')]
+)
+@METRICS.callback(view=lambda field, measure, *_: measure)
+def update_trends(field, measure, state, months):
+    start, end = months or [None, None]
+    return build_trends(field, measure, state, start, end)
+
+@FIGURE_CACHE.memoize('update_trends')
+def build_trends(field, measure, state, start, end):
+    cube = SNAPSHOTS.current().indexes['time'].get(field)
+    if cube is None or measure not in cube.cumulative:
+        return go.Figure(), go.Figure(), "No dates in the master file"
+    start, end = cube.span(start, end)
+    lap = METRICS.laps()
+    
+    fig_map = trends_map(cube, measure, state, start, end)
+    lap('map')
+    monthly = cube.monthly(start, end, state).reset_index()
+    label = MEASURES[measure][1]
+    fig_monthly = px.bar(monthly, x='Month', y=measure, title=f"{label} per month ({DATE_COLUMNS[field]})",
+                         labels={measure: label, 'Month': ''})
+    fig_monthly.update_layout(margin=dict(l=40, r=10, t=40, b=40))
+    lap('monthly')
+    
+    total = monthly[measure].sum()
+    summary = f"{total:,.0f} {label.lower()} from {cube.months[start]} to {cube.months[end]}"
+    if cube.undated:
+        summary += f" ({cube.undated:,} records without a valid date)"
+    return fig_map, fig_monthly, summary
 
 # Upload
 @app.callback(Output('upload-output', 'children'), Input('upload-data', 'contents'), State('upload-data', 'filename'))
+@METRICS.callback()
 def handle_upload(contents, filename):
     if contents is None:
         raise PreventUpdate
@@ -1016,14 +1589,15 @@ def handle_upload(contents, filename):
         decoded = base64.b64decode(content_string)
         
         if 'csv' in filename:
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+            filename = secure_filename(filename)
             save_path = os.path.join(WORK_DIR, filename)
-            df.to_csv(save_path, index=False)
+            rows, columns = stream_csv_to_file(io.BytesIO(decoded), save_path)
+            SNAPSHOTS.refresh()
             
             return dbc.Alert([
                 html.H5("✅ Upload Successful!", className="alert-heading"),
                 html.P(f"File: {filename}"),
-                html.P(f"Rows: {len(df)} | Columns: {len(df.columns)}"),
+                html.P(f"Rows: {rows} | Columns: {len(columns)}"),
                 html.P(f"Saved to: {save_path}"),
                 dbc.Button("Reload Dashboard", color="success", href="/", className="mt-2")
             ], color="success")
@@ -1033,6 +1607,169 @@ def handle_upload(contents, filename):
     except Exception as e:
         return dbc.Alert(f"❌ Upload failed: {str(e)}", color="danger")
 
+# === SERVER ROUTES ===
+# Registered first so it runs last, after the metrics hook has read the uncompressed body
+install_compression(server)
+# Callback latency, stage and payload histograms for Prometheus at /metrics
+METRICS.install(app)
+
+# Cached figures name the default plotly template instead of embedding it (see response_encoding);
+# the browser loads it once from here, before assets/figure_decode.js needs it
+TEMPLATES_JS, TEMPLATES_TAG = templates_script()
+app.config.external_scripts.append(app.get_relative_path(f'/figure-templates.js?v={TEMPLATES_TAG}'))
+
+# Read-only JSON over the rollups for reporting tools (/api/v1/...), cached alongside the figures
+install_rollup_api(server, SNAPSHOTS, FIGURE_CACHE)
+# Read-only SQL for analysts (POST /api/v1/sql), sharing the SQL page's result cache
+install_sql_api(server, SNAPSHOTS, FIGURE_CACHE)
+
+@server.route('/figure-templates.js')
+def figure_templates():
+    cache = ('public, max-age=31536000, immutable' if request.args.get('v') == TEMPLATES_TAG
+             else 'public, max-age=3600')
+    return server.response_class(TEMPLATES_JS, mimetype='text/javascript', headers={'Cache-Control': cache})
+
+@server.route('/upload/stream/<filename>', methods=['POST'])
+def upload_stream(filename):
+    """Stream a large CSV (raw body or multipart 'file' field) into WORK_DIR in chunks"""
+    filename = secure_filename(filename)
+    if not filename.lower().endswith('.csv'):
+        return jsonify(error="Please upload a CSV file"), 400
+    
+    upload_id = request.args.get('upload_id') or new_upload_id()
+    if 'file' in request.files:
+        src, total_bytes = request.files['file'].stream, None
+    else:
+        src, total_bytes = request.stream, request.content_length
+    
+    def report(**status):
+        write_progress(WORK_DIR, upload_id, filename=filename, status='running', **status)
+    
+    report(rows=0, bytes_read=0, total_bytes=total_bytes)
+    try:
+        rows, columns = stream_csv_to_file(src, os.path.join(WORK_DIR, filename), total_bytes, on_progress=report)
+    except Exception as e:
+        write_progress(WORK_DIR, upload_id, filename=filename, status='failed', error=str(e))
+        return jsonify(upload_id=upload_id, error=f"Upload failed: {e}"), 400
+    
+    SNAPSHOTS.refresh()
+    write_progress(WORK_DIR, upload_id, filename=filename, status='done', rows=rows, columns=len(columns))
+    return jsonify(upload_id=upload_id, filename=filename, rows=rows, columns=columns)
+
+# Incremental profile updates from new master registrations
+AGGREGATES_FILE = ".profile_aggregates.pkl"
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+def master_stamp():
+    """Size and mtime of the master file, to tell whether saved aggregates still match it"""
+    try:
+        st = os.stat(os.path.join(WORK_DIR, MASTER_FILE))
+        return (st.st_size, st.st_mtime_ns)
+    except OSError:
+        return None
+
+def get_aggregator():
+    """Aggregates over the master file: saved state if it matches, else one full pass"""
+    global _aggregator
+    if _aggregator is None or _aggregator.source_stamp != master_stamp():
+        path = os.path.join(WORK_DIR, AGGREGATES_FILE)
+        agg = None
+        if os.path.exists(path):
+            try:
+                agg = ProfileAggregator.load(path)
+            except Exception as e:
+                print(f"Error loading {AGGREGATES_FILE}: {e}")
+        if agg is None or agg.source_stamp != master_stamp():
+            agg = ProfileAggregator.from_master(load_master(MASTER_FILE, MASTER_COLUMNS))
+            agg.source_stamp = master_stamp()
+        _aggregator = agg
+    return _aggregator
+
+def write_profile_csv(df, filename):
+    path = os.path.join(WORK_DIR, filename)
+    df.to_csv(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+
+@server.route('/master/append', methods=['POST'])
+def append_master():
+    """Apply a CSV of new/updated master rows (keyed by aid) to the profiles as deltas"""
+    global _aggregator
+    src = request.files['file'].stream if 'file' in request.files else request.stream
+    with _aggregator_lock:
+        master_path = os.path.join(WORK_DIR, MASTER_FILE)
+        staged = os.path.join(WORK_DIR, f".{MASTER_FILE}.append")
+        try:
+            # Rows are staged and folded into a copy first, so a request that fails changes nothing
+            agg = get_aggregator().copy()
+            columns = read_master_header(master_path) if os.path.exists(master_path) else None
+            header, rows, touched = columns is None, 0, set()
+            with open(staged, 'w', newline='', encoding='utf-8') as out:
+                for chunk in read_master_csv(src, chunksize=UPLOAD_CHUNK_ROWS):
+                    columns = columns or list(chunk.columns)
+                    chunk.reindex(columns=columns, fill_value='').to_csv(out, header=header, index=False)
+                    header = False
+                    touched |= agg.apply_batch(chunk)
+                    rows += len(chunk)
+            size = os.path.getsize(master_path) if os.path.exists(master_path) else 0
+            try:
+                with open(staged, 'rb') as f, open(master_path, 'ab') as master:
+                    shutil.copyfileobj(f, master)
+            except Exception:
+                with open(master_path, 'ab') as master:
+                    master.truncate(size)
+                raise
+        except Exception as e:
+            return jsonify(error=f"Append failed: {e}"), 400
+        finally:
+            if os.path.exists(staged):
+                os.remove(staged)
+        
+        agg.source_stamp = master_stamp()
+        _aggregator = agg
+        try:
+            agg.save(os.path.join(WORK_DIR, AGGREGATES_FILE))
+        except Exception as e:
+            print(f"Error saving {AGGREGATES_FILE}: {e}")  # rebuilt from the master on next load
+        profiles = agg.profiles()
+        for name, filename in PROFILE_FILES.items():
+            write_profile_csv(profiles[name], filename)
+    SNAPSHOTS.refresh()
+    
+    return jsonify(rows=rows, districts_updated=len(touched), master_records=len(agg))
+
+@server.route('/data/version')
+def data_version():
+    """Version of the data this worker is serving, to check that workers have converged"""
+    snap = SNAPSHOTS.current()
+    return jsonify(version=snap.version, built=snap.built, files=[list(s) for s in snap.stamps])
+
+@server.route('/geo/india_states.<level>.json')
+def state_boundaries(level):
+    """State boundaries at one simplification level, gzipped when accepted and revalidated by ETag"""
+    asset = GEO_ASSETS.get(level)
+    if asset is None:
+        return jsonify(error="Unknown level"), 404
+    gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+    # Each encoding is a different representation, so it gets its own tag
+    etag = f'{asset.etag}-gz' if gzipped else asset.etag
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding',
+               'Cache-Control': 'public, max-age=31536000, immutable' if request.args.get('v') == asset.etag
+                                else 'public, max-age=3600'}
+    if etag in request.if_none_match:
+        return '', 304, headers
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+    return server.response_class(asset.gzip_body if gzipped else asset.body, headers=headers,
+                                 mimetype='application/geo+json')
+
+@server.route('/upload/progress/<upload_id>')
+def upload_progress(upload_id):
+    status = read_progress(WORK_DIR, secure_filename(upload_id))
+    if status is None:
+        return jsonify(error="Unknown upload"), 404
+    return jsonify(status)
+
 if __name__ == '__main__':
     print("Starting dashboard on http://127.0.0.1:8050", flush=True)
     app.run(debug=True, port=8050, dev_tools_ui=False, dev_tools_props_check=False)
@@ -0,0 +1,95 @@
+// Expands the compact figures built by response_encoding.py before plotly.js draws them:
+// {dtype, bdata} typed arrays are decoded and template names replaced by the templates
+// defined in /figure-templates.js. Figures are decoded in place, so this runs once per figure.
+(function () {
+    var DTYPES = {
+        f8: Float64Array, f4: Float32Array, i4: Int32Array, u4: Uint32Array,
+        i2: Int16Array, u2: Uint16Array, i1: Int8Array, u1: Uint8Array
+    };
+
+    function decodeArray(value) {
+        var bytes = atob(value.bdata);
+        var buffer = new Uint8Array(bytes.length);
+        for (var i = 0; i < bytes.length; i++) {
+            buffer[i] = bytes.charCodeAt(i);
+        }
+        return new DTYPES[value.dtype](buffer.buffer);
+    }
+
+    function decodeTrace(node) {
+        Object.keys(node).forEach(function (key) {
+            var value = node[key];
+            if (!value || typeof value !== 'object' || Array.isArray(value) || ArrayBuffer.isView(value)) {
+                return;
+            }
+            if (typeof value.bdata === 'string' && DTYPES[value.dtype]) {
+                node[key] = decodeArray(value);
+            } else {
+                decodeTrace(value);
+            }
+        });
+    }
+
+    function decodeFigure(figure) {
+        if (!figure) {
+            return;
+        }
+        (figure.data || []).forEach(decodeTrace);
+        (figure.frames || []).forEach(decodeFrame);
+        var layout = figure.layout;
+        var templates = window.dashFigureTemplates || {};
+        if (layout && typeof layout.template === 'string') {
+            layout.template = templates[layout.template] || {};
+        }
+    }
+
+    function decodeFrame(frame) {
+        (frame.data || []).forEach(decodeTrace);
+    }
+
+    function patch(Plotly) {
+        if (!Plotly || Plotly._compactFigures) {
+            return Plotly;
+        }
+        ['newPlot', 'react'].forEach(function (name) {
+            var original = Plotly[name];
+            Plotly[name] = function (gd, data, layout, config) {
+                if (Array.isArray(data)) {
+                    decodeFigure({data: data, layout: layout});
+                } else {
+                    decodeFigure(data);
+                }
+                return original.apply(this, arguments);
+            };
+        });
+        var addFrames = Plotly.addFrames;
+        Plotly.addFrames = function (gd, frames) {
+            (frames || []).forEach(decodeFrame);
+            return addFrames.apply(this, arguments);
+        };
+        var animate = Plotly.animate;
+        Plotly.animate = function (gd, frameOrGroupNameOrFrameList) {
+            var target = frameOrGroupNameOrFrameList;
+            if (Array.isArray(target)) {
+                target.forEach(function (frame) {
+                    if (frame && typeof frame === 'object') {
+                        decodeFrame(frame);
+                    }
+                });
+            } else if (target && typeof target === 'object') {
+                decodeFigure(target);
+            }
+            return animate.apply(this, arguments);
+        };
+        Plotly._compactFigures = true;
+        return Plotly;
+    }
+
+    // dcc.Graph loads plotly.js lazily and it sets window.Plotly itself
+    var plotly = patch(window.Plotly);
+    Object.defineProperty(window, 'Plotly', {
+        configurable: true,
+        get: function () { return plotly; },
+        set: function (value) { plotly = patch(value); }
+    });
+})();
@@ -0,0 +1,226 @@
+"""Scaling benchmarks: callback latency and peak memory on synthetic data of several sizes
+
+For each size a synthetic dataset is generated once (see synthetic_data) and the app
+is imported in a fresh process with MSME_WORK_DIR pointing at it. Every case is run
+untraced for its latency, then once under tracemalloc for its peak memory. Results
+are compared with a stored baseline; a case that got slower or hungrier than the
+tolerance allows is reported and the exit status is 1.
+
+    python benchmark.py --sizes 10000 100000 1000000
+    python benchmark.py --sizes 10000 100000 --save-baseline
+"""
+import argparse
+import base64
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BASELINE_FILE = 'benchmark_baseline.json'
+DATA_DIR = '.benchmark-data'
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+TOLERANCE = 0.5  # allowed slowdown / memory growth over the baseline
+NOISE_MS = 5.0  # latency changes smaller than this are never regressions
+NOISE_MB = 1.0
+NOISE_RSS_MB = 20.0
+NOISE_BYTES = 1024
+
+TABS = ['tab1', 'tab2', 'tab3', 'tab4', 'tab5']
+HIGHLIGHTS = ['none', 'high_density', 'low_female', 'high_employment']
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def measure(fn, repeat):
+    """Median/min latency (ms) over repeat runs after one warm-up, and tracemalloc peak (MB)
+
+    A case returning a serialized payload also records its size.
+    """
+    result = fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    stats = {'median_ms': round(statistics.median(times), 3), 'min_ms': round(min(times), 3),
+             'peak_mb': round(peak / (1024 * 1024), 3)}
+    if isinstance(result, (str, bytes)):
+        stats['payload_bytes'] = len(result)
+    return stats
+
+
+def benchmark_cases(app):
+    """(name, zero-argument callable) for every benchmarked code path, bypassing the figure cache"""
+    import columnar_store
+    from profile_aggregator import read_master_csv
+    from response_encoding import dumps
+
+    snap = app.SNAPSHOTS.current()
+    loc = snap.frames['loc'].df
+    top = loc.groupby('State')['msme_count'].sum().idxmax()
+    top_district = loc[loc['State'] == top].groupby('District')['msme_count'].sum().idxmax()
+    scopes = {'national': (None, None), 'state': (top, None), 'district': (top, top_district)}
+    panels = inspect.unwrap(app.build_dashboard_panels)
+    dashboard_map = inspect.unwrap(app.update_dashboard_map)
+    dss_map = inspect.unwrap(app.build_dss_map)
+    dss_table = inspect.unwrap(app.update_dss_table)
+    scratch = os.path.join(app.WORK_DIR, columnar_store.STORE_DIR, 'benchmark-scratch.arrow')
+
+    cases = []
+    for name, filename in app.PROFILE_FILES.items():
+        cases.append((f'load_csv[{filename}]', lambda f=filename: app.load_csv(f)))
+        cases.append((f'convert[{filename}]', lambda f=filename: columnar_store.convert(
+            os.path.join(app.WORK_DIR, f), scratch, lambda p, f=f: columnar_store.read_typed_csv(
+                p, columnar_store.SCHEMAS.get(f, {})))))
+    cases.append((f'convert[{app.MASTER_FILE}]', lambda: columnar_store.convert(
+        os.path.join(app.WORK_DIR, app.MASTER_FILE), scratch, read_master_csv)))
+    cases.append(('build_snapshot', lambda: app.build_snapshot(snap.stamps)))
+    for tab in TABS:
+        for scope, (state, district) in scopes.items():
+            cases.append((f'update_dashboard[{tab}/{scope}]', lambda t=tab, s=state, d=district: panels(t, s, d)))
+        for scope, (state, _) in list(scopes.items())[:2]:
+            cases.append((f'update_dashboard_map[{tab}/{scope}]', lambda t=tab, s=state: dashboard_map(t, s)))
+        # What the figure cache stores and Dash sends for this tab
+        outputs = panels(tab, None, None)
+        cases.append((f'serialize[update_dashboard/{tab}]', lambda o=outputs: dumps(o)))
+    for highlight in HIGHLIGHTS:
+        for scope, (state, _) in list(scopes.items())[:2]:
+            cases.append((f'update_dss[{highlight}/{scope}]', lambda h=highlight, s=state: dss_map(s, h)))
+    cases.append(('update_dss_table[national]', lambda: dss_table(None)))
+
+    # The upload re-saves a profile with its own contents, then reloads the snapshot
+    upload_file = app.PROFILE_FILES['loc']
+    with open(os.path.join(app.WORK_DIR, upload_file), 'rb') as f:
+        contents = 'data:text/csv;base64,' + base64.b64encode(f.read()).decode()
+    cases.append((f'handle_upload[{upload_file}]', lambda: app.handle_upload(contents, upload_file)))
+    return cases
+
+
+def run_worker(repeat, only=None):
+    """Benchmark the app in this process (MSME_WORK_DIR already set); returns the results dict"""
+    started = time.perf_counter()
+    import app
+    elapsed = round((time.perf_counter() - started) * 1000, 3)
+    results = {'import_app': {'median_ms': elapsed, 'min_ms': elapsed}}
+    for name, fn in benchmark_cases(app):
+        if only and not any(o in name for o in only):
+            continue
+        results[name] = measure(fn, repeat)
+    results['process'] = {'peak_rss_mb': round(_peak_rss_mb(), 1),
+                          'master_rows': app.SNAPSHOTS.current().master.num_rows}
+    return results
+
+
+def dataset(size, seed):
+    """Folder with the synthetic dataset of this size, generating it the first time"""
+    from synthetic_data import generate
+    path = os.path.join(DATA_DIR, f'{size}-{seed}')
+    if not os.path.exists(os.path.join(path, 'composite_score.csv')):
+        print(f'Generating {size:,} synthetic registrations in {path}', flush=True)
+        generate(size, path, seed, progress=None)
+    return path
+
+
+def run_size(size, seed, repeat, only):
+    env = dict(os.environ, MSME_WORK_DIR=os.path.abspath(dataset(size, seed)))
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', '--repeat', str(repeat)]
+    if only:
+        cmd += ['--only', *only]
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f'benchmark worker failed for {size} rows:\n{out.stderr[-4000:]}')
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Regressions as (size, case, metric, baseline value, new value)"""
+    regressions = []
+    for size, cases in results.items():
+        for case, metrics in cases.items():
+            base = baseline.get(size, {}).get(case, {})
+            # The fastest run is the least disturbed by other load on the machine
+            for metric, noise in [('min_ms', NOISE_MS), ('peak_mb', NOISE_MB), ('peak_rss_mb', NOISE_RSS_MB),
+                                  ('payload_bytes', NOISE_BYTES)]:
+                old, new = base.get(metric), metrics.get(metric)
+                if old is not None and new is not None and new > old * (1 + tolerance) and new - old > noise:
+                    regressions.append((size, case, metric, old, new))
+    return regressions
+
+
+def print_report(results, baseline):
+    for size, cases in results.items():
+        print(f'\n== {int(size):,} registrations ==')
+        print(f"{'case':<48}{'median ms':>12}{'baseline':>12}{'peak MB':>10}{'baseline':>10}")
+        for case, metrics in cases.items():
+            if 'median_ms' not in metrics:
+                continue
+            base = baseline.get(size, {}).get(case, {})
+            print(f"{case:<48}{metrics['median_ms']:>12.1f}{base.get('median_ms', float('nan')):>12.1f}"
+                  f"{metrics.get('peak_mb', float('nan')):>10.1f}{base.get('peak_mb', float('nan')):>10.1f}")
+        print(f"process peak RSS: {cases['process']['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='+', help='run only cases whose name contains one of these')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat, args.only)))
+        return 0
+
+    results = {str(size): run_size(size, args.seed, args.repeat, args.only) for size in args.sizes}
+    try:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = {'results': {}}
+    baseline = stored['results']
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        stored = {'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                              'cpus': os.cpu_count()},
+                  'recorded': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'results': {**baseline, **results}}
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=1)
+        print(f'\nBaseline saved to {args.baseline}')
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for size, case, metric, old, new in regressions:
+        print(f'REGRESSION {int(size):,} rows {case} {metric}: {old} -> {new} ({new / old - 1:+.0%})')
+    if not regressions:
+        print('\nNo regressions against the baseline' if baseline else '\nNo baseline to compare with')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
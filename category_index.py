@@ -0,0 +1,187 @@
+"""Bitmap indexes over the master's categorical columns, for cross-filtering
+
+Rows are laid out in (state, district) order, so every state and every district is a
+contiguous range of bit positions. Each value of each category column (gender, social
+category, ...) gets a bitmap: one bit per row, packed eight to a byte. A combination
+such as "Female, SC, Micro, Manufacturing in Odisha" is the AND of a few bitmaps over the
+state's range, and its count a popcount; counts per district come from the running
+popcount at the district boundaries. Nothing touches the master table after the build.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Master column -> control label
+CATEGORY_COLUMNS = {
+    'gender': 'Gender',
+    'socialcategory': 'Social Category',
+    'ph': 'Physically Handicapped',
+    'organisationtype': 'Organisation Type',
+    'majoractivity': 'Major Activity',
+    'enterprisetype': 'Enterprise Type',
+}
+MAX_VALUES = 64  # per column; rarer values beyond this aren't indexed
+ROW_MASK_CACHE_ENTRIES = 8
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype='uint8')
+# Byte masks keeping the first k bits (packbits is big-endian: bit 0 is the high bit)
+_LEADING = np.array([(0xFF << (8 - k)) & 0xFF for k in range(8)], dtype='uint8')
+
+
+def filter_key(filters):
+    """Hashable, order-independent form of {column: [values]} (unfiltered columns dropped)"""
+    return tuple(sorted((c, tuple(sorted(v))) for c, v in (filters or {}).items() if v))
+
+
+def _dictionary(column):
+    """(codes, values) of a text column, whitespace trimmed"""
+    encoded = pc.utf8_trim_whitespace(column.cast(pa.string())).combine_chunks().dictionary_encode()
+    return encoded.indices.to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist()
+
+
+def district_codes(table):
+    """(code per row, (State, District) index by code) of a master table's districts
+
+    Codes are ordered by state, so each state's districts have consecutive codes.
+    """
+    state_codes, states = _dictionary(table.column('state'))
+    district_codes, districts = _dictionary(table.column('district'))
+    pairs = state_codes.astype('int64') * len(districts) + district_codes
+    unique_pairs, codes = np.unique(pairs, return_inverse=True)
+    index = pd.MultiIndex.from_arrays(
+        [[states[p // len(districts)] for p in unique_pairs], [districts[p % len(districts)] for p in unique_pairs]],
+        names=['State', 'District'])
+    return codes, index
+
+
+class CategoryIndex:
+    """Per-value bitmaps of the category columns, with per-district counts of any combination"""
+
+    def __init__(self, table):
+        self.num_rows = table.num_rows
+        self.bitmaps = {}
+        self._lock = threading.Lock()
+        self._row_masks = OrderedDict()
+        names = set(table.column_names)
+        if not self.num_rows or not {'state', 'district'} <= names:
+            self.order = np.zeros(0, dtype='int32')
+            self.starts = np.zeros(1, dtype='int64')
+            self.districts = pd.MultiIndex.from_tuples([], names=['State', 'District'])
+            return
+
+        pair_codes, self.districts = district_codes(table)
+        # Rows by district code: each state's districts are consecutive
+        self.order = np.argsort(pair_codes, kind='stable').astype('int32')
+        counts = np.bincount(pair_codes, minlength=len(self.districts))
+        self.starts = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+
+        for column in CATEGORY_COLUMNS:
+            if column not in names:
+                continue
+            codes, values = _dictionary(table.column(column))
+            codes = codes[self.order]
+            frequency = np.bincount(codes, minlength=len(values))
+            self.bitmaps[column] = {
+                values[v]: np.packbits(codes == v) for v in np.argsort(-frequency, kind='stable')[:MAX_VALUES]
+                if values[v] and frequency[v]}
+
+    def values(self, column):
+        """Indexed values of a column, most frequent first"""
+        return list(self.bitmaps.get(column, {}))
+
+    def _range(self, state=None, district=None):
+        """[start, stop) bit range of a selection; empty if it has no rows"""
+        state, district = (state or '').strip(), (district or '').strip()
+        if not (state or district):
+            return 0, self.num_rows
+        mask = self.districts.get_level_values('State') == state if state else np.ones(len(self.districts), bool)
+        if district:
+            mask &= self.districts.get_level_values('District') == district
+        blocks = np.flatnonzero(mask)
+        if len(blocks) == 0:
+            return 0, 0
+        if district and not state and len(blocks) > 1:
+            blocks = blocks[:1]  # a district name without its state: the first match
+        return int(self.starts[blocks[0]]), int(self.starts[blocks[-1] + 1])
+
+    def _mask(self, filters, start, stop, skip=None):
+        """Packed bits (the bytes covering [start, stop)) of rows matching {column: [values]}; None if unfiltered"""
+        first, last = start >> 3, (stop + 7) >> 3
+        mask = None
+        for column, values in (filters or {}).items():
+            if column == skip or not values or column not in self.bitmaps:
+                continue
+            bitmaps = self.bitmaps[column]
+            any_value = np.zeros(last - first, dtype='uint8')
+            for value in values:
+                if value in bitmaps:
+                    any_value |= bitmaps[value][first:last]
+            mask = any_value if mask is None else mask & any_value
+        return mask
+
+    def _count(self, packed, start, stop):
+        """Set bits of packed (bytes starting at start // 8) within [start, stop)"""
+        if stop <= start:
+            return 0
+        if packed is None:
+            return stop - start
+        base = start >> 3
+        total = int(_POPCOUNT[packed].sum(dtype='int64'))
+        total -= int(_POPCOUNT[packed[0] & _LEADING[start & 7]])
+        if stop & 7:
+            total -= int(_POPCOUNT[packed[(stop >> 3) - base] & ~_LEADING[stop & 7]])
+        return total
+
+    def count(self, filters=None, state=None, district=None):
+        """Registrations matching filters in a selection"""
+        start, stop = self._range(state, district)
+        return self._count(self._mask(filters, start, stop), start, stop)
+
+    def value_counts(self, column, filters=None, state=None, district=None):
+        """{value: count} of a column under every other filter, for cross-filter option labels"""
+        start, stop = self._range(state, district)
+        others = self._mask(filters, start, stop, skip=column)
+        first, last = start >> 3, (stop + 7) >> 3
+        return {value: self._count(bits[first:last] if others is None else bits[first:last] & others, start, stop)
+                for value, bits in self.bitmaps.get(column, {}).items()}
+
+    def district_counts(self, filters=None, state=None):
+        """Matching registrations per (State, District), nationally or in a state"""
+        start, stop = self._range(state)
+        blocks = np.flatnonzero((self.starts[:-1] >= start) & (self.starts[1:] <= stop))
+        bounds = self.starts[blocks[0]:blocks[-1] + 2] if len(blocks) else np.zeros(1, dtype='int64')
+        packed = self._mask(filters, start, stop)
+        if packed is None:
+            counts = np.diff(bounds)
+        else:
+            # Set bits before each boundary: whole bytes from a running popcount, plus the leading bits of the next
+            running = np.concatenate([[0], np.cumsum(_POPCOUNT[packed], dtype='int64')])
+            padded = np.append(packed, np.uint8(0))
+            local = bounds - ((start >> 3) << 3)
+            before = running[local >> 3] + _POPCOUNT[padded[local >> 3] & _LEADING[local & 7]]
+            counts = np.diff(before)
+        return pd.Series(counts, index=self.districts[blocks], name='msme_count')
+
+    def row_mask(self, filters):
+        """bool per master row (in file order) for the filters; None when nothing is filtered"""
+        filters = {c: v for c, v in (filters or {}).items() if c in self.bitmaps}
+        key = filter_key(filters)
+        if not key:
+            return None
+        with self._lock:
+            mask = self._row_masks.get(key)
+            if mask is not None:
+                self._row_masks.move_to_end(key)
+                return mask
+        bits = np.unpackbits(self._mask(filters, 0, self.num_rows), count=self.num_rows).astype(bool)
+        mask = np.empty(self.num_rows, dtype=bool)
+        mask[self.order] = bits
+        with self._lock:
+            self._row_masks[key] = mask
+            while len(self._row_masks) > ROW_MASK_CACHE_ENTRIES:
+                self._row_masks.popitem(last=False)
+        return mask
@@ -0,0 +1,119 @@
+"""Typed columnar (Arrow IPC / Feather) copies of the CSV datasets, converted on first read
+
+The CSVs stay the source of truth. The first time one is read it is parsed with its
+declared schema and saved under WORK_DIR/.columnar, in a file named after the CSV's
+size and mtime; later reads (every worker, every reload) use that copy. The copies
+are uncompressed and memory-mapped, so a table opened with open_table is backed by
+the OS page cache: every worker process on a host shares one physical copy.
+A file is never rewritten in place, so a worker still mapping an older version keeps
+a valid view of it.
+"""
+import glob
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+STORE_DIR = '.columnar'
+
+# Declared column types. 'str' and 'code' columns are never parsed as numbers, so NIC
+# codes keep their leading zero ('01632'); 'code' also drops the '.0' an earlier
+# float round-trip left on identifiers ('517569.0' -> '517569').
+TEXT_TYPES = ('str', 'code')
+SCHEMAS = {
+    'location_profile.csv': {
+        'State': 'str', 'District': 'str', 'LG_Dist_Code': 'code', 'PINCode': 'code', 'Dic_Name': 'str',
+        'msme_count': 'int64',
+    },
+    'social_profile.csv': {
+        'State': 'str', 'District': 'str', 'total_msmes': 'int64', 'sc_count': 'int64', 'st_count': 'int64',
+        'obc_count': 'int64', 'general_count': 'int64', 'female_owned': 'int64', 'male_owned': 'int64',
+        'ph_count': 'int64',
+    },
+    'employment_profile.csv': {
+        'State': 'str', 'District': 'str', 'total_msmes': 'int64', 'total_employment': 'float64',
+        'avg_employment': 'float64', 'total_investment': 'float64', 'enterprise_type_split': 'str',
+    },
+    'industry_profile.csv': {
+        'State': 'str', 'District': 'str', 'top_nic_sector': 'str', 'manufacturing_pct': 'float64',
+        'services_pct': 'float64', 'industry_diversity_index': 'int64',
+    },
+    'composite_score.csv': {
+        'State': 'str', 'Scale_Score': 'float64', 'Social_Score': 'float64', 'Employment_Score': 'float64',
+        'Industry_Score': 'float64', 'Final_MSME_Score': 'float64', 'Category': 'str',
+    },
+}
+
+
+def read_typed_csv(path, schema):
+    """Read a CSV applying its declared types; columns it doesn't declare are inferred"""
+    df = pd.read_csv(path, dtype={col: str for col, dtype in schema.items() if dtype in TEXT_TYPES})
+    for col, dtype in schema.items():
+        if col not in df.columns or dtype == 'str':
+            continue
+        if dtype == 'code':
+            df[col] = df[col].str.replace(r'\.0$', '', regex=True)
+        else:
+            values = pd.to_numeric(df[col], errors='coerce')
+            # Integer columns with gaps stay float rather than failing the load
+            df[col] = values.astype(dtype) if dtype == 'float64' or values.notna().all() else values
+    return df
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return f'{st.st_size}:{st.st_mtime_ns}'
+
+
+def store_path(work_dir, filename, stamp):
+    """Columnar copy of one version of a CSV"""
+    version = hashlib.sha1(stamp.encode()).hexdigest()[:12]
+    return os.path.join(work_dir, STORE_DIR, f'{os.path.splitext(filename)[0]}-{version}.arrow')
+
+
+def _remove_stale(path):
+    # Copies of older versions; on Windows a copy another worker still maps can't be removed yet
+    stem = path.rsplit('-', 1)[0]
+    for old in glob.glob(f'{glob.escape(stem)}-*.arrow'):
+        if old != path:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def convert(csv_path, dest_path, reader):
+    """Parse a CSV with reader and save it as an uncompressed Arrow IPC file"""
+    table = pa.Table.from_pandas(reader(csv_path), preserve_index=False)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f'{dest_path}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, dest_path)
+    _remove_stale(dest_path)
+
+
+def open_table(work_dir, filename, columns=None, reader=None):
+    """Memory-mapped Arrow table of a dataset, converting the CSV first if there is no current copy
+
+    reader parses the CSV (defaults to its declared schema). The table's buffers point
+    into the mapped file, so it costs no private memory until converted to pandas.
+    Returns None if the CSV doesn't exist.
+    """
+    csv_path = os.path.join(work_dir, filename)
+    if not os.path.exists(csv_path):
+        return None
+    path = store_path(work_dir, filename, _source_stamp(csv_path))
+    if not os.path.exists(path):
+        if reader is None:
+            schema = SCHEMAS.get(filename, {})
+            reader = lambda p: read_typed_csv(p, schema)
+        convert(csv_path, path, reader)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def load_table(work_dir, filename, columns=None, reader=None):
+    """A dataset as a (private) pandas frame; see open_table"""
+    table = open_table(work_dir, filename, columns, reader)
+    return None if table is None else table.to_pandas()
@@ -0,0 +1,113 @@
+"""Versioned, immutable bundles of the dashboard data, rebuilt in the background and swapped atomically"""
+import hashlib
+import os
+import threading
+import time
+
+
+def source_stamps(paths):
+    """(path, size, mtime_ns) of each source file; None for files that are missing"""
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append((os.path.basename(path), st.st_size, st.st_mtime_ns))
+        except OSError:
+            stamps.append((os.path.basename(path), None, None))
+    return tuple(stamps)
+
+
+def stamp_version(stamps):
+    """Short id for a set of source stamps, identical in every worker that sees the same files"""
+    return hashlib.sha1(repr(stamps).encode()).hexdigest()[:12]
+
+
+class DataSnapshot:
+    """Everything the callbacks read for one version of the source files
+
+    Treat it as read-only: a callback takes the current snapshot once and uses it
+    throughout, so a reload that lands mid-request never mixes two versions. The
+    profile frames are small private pandas copies; master is a memory-mapped Arrow
+    table whose pages are shared with every other worker on the host. indexes holds
+    derived structures (e.g. the score engine) built once per version.
+    """
+
+    def __init__(self, stamps, frames, rollups, master, indexes=None):
+        self.stamps = stamps
+        self.version = stamp_version(stamps)
+        self.frames = frames
+        self.rollups = rollups
+        self.master = master
+        self.indexes = indexes or {}
+        self.built = time.time()
+
+
+class SnapshotManager:
+    """Holds the current DataSnapshot and replaces it when the source files change
+
+    build(stamps) returns a new DataSnapshot. It runs on a background thread while
+    the old snapshot keeps serving, and the swap is a single reference assignment.
+    The version comes from the files themselves, so separate worker processes that
+    poll the same directory converge on the same version id. on_swap, if given, runs
+    after each swap (e.g. to warm caches for the new version).
+    """
+
+    def __init__(self, paths, build, poll_seconds=5.0, on_swap=None):
+        self.paths = list(paths)
+        self._build = build
+        self.poll_seconds = poll_seconds
+        self.on_swap = on_swap
+        self._build_lock = threading.Lock()
+        self._watcher_pid = None
+        self._snapshot = None
+
+    def current(self):
+        """The snapshot to use for one request"""
+        if self._snapshot is None:
+            self.refresh()
+        self._ensure_watcher()
+        return self._snapshot
+
+    def refresh(self, block=True):
+        """Rebuild from the files on disk now if they differ from the current snapshot"""
+        if not block:
+            threading.Thread(target=self.refresh, daemon=True).start()
+            return self._snapshot
+        with self._build_lock:
+            stamps = source_stamps(self.paths)
+            if self._snapshot is None or stamps != self._snapshot.stamps:
+                self._swap(stamps)
+        return self._snapshot
+
+    def _swap(self, stamps):
+        start = time.perf_counter()
+        try:
+            snapshot = self._build(stamps)
+        except Exception as e:
+            print(f"Data reload error: {e}")
+            if self._snapshot is not None:
+                return
+            raise
+        self._snapshot = snapshot
+        print(f"Data snapshot {snapshot.version} loaded in {time.perf_counter() - start:.1f}s", flush=True)
+        if self.on_swap:
+            try:
+                self.on_swap(snapshot)
+            except Exception as e:
+                print(f"Cache warm-up error: {e}")
+
+    def _ensure_watcher(self):
+        # One watcher per process: a thread started before a fork doesn't survive in the child
+        if self.poll_seconds and self._watcher_pid != os.getpid():
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name='snapshot-watcher', daemon=True).start()
+
+    def _watch(self):
+        previous = None
+        while True:
+            time.sleep(self.poll_seconds)
+            stamps = source_stamps(self.paths)
+            # Only reload once the files have stopped changing, not halfway through a write
+            if stamps == previous and stamps != self._snapshot.stamps:
+                self.refresh()
+            previous = stamps
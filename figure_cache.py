@@ -0,0 +1,164 @@
+"""Bounded, size-evicting cache of serialized callback payloads with single-flight coalescing
+
+Background jobs run in subprocesses, which only see the entries the worker had when
+they were forked: what a job computes is forwarded through an outbox and stored by the
+worker the next time it looks something up.
+"""
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import METRICS
+from response_encoding import dumps, loads
+
+
+class _Flight:
+    """One in-progress computation that identical concurrent requests wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+        self.error = None
+
+
+class FigureCache:
+    """LRU cache keyed by (callback, inputs, data version), evicted by payload bytes
+
+    Entries are stored as the JSON the callback would have sent, with figures in their
+    compact form (see response_encoding), so a hit costs one decode, cached objects
+    can't be mutated by callers, and eviction is by real size.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, version_fn=None):
+        self.max_bytes = max_bytes
+        self._version_fn = version_fn
+        self._version = 0
+        self._seen_version = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._pid = os.getpid()
+        self.outbox = None  # where payloads computed in job subprocesses are forwarded
+
+    @property
+    def version(self):
+        return self._version_fn() if self._version_fn else self._version
+
+    def invalidate(self):
+        """Drop every entry and move to a new data version"""
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self.size = 0
+
+    def _store(self, key, payload):
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = payload
+        self.size += len(payload)
+        while self.size > self.max_bytes:
+            _, old = self._entries.popitem(last=False)
+            self.size -= len(old)
+
+    @staticmethod
+    def _decode(payload):
+        with METRICS.stage('serialize'):
+            return loads(payload)
+
+    def collect(self):
+        """Store the payloads job subprocesses forwarded (those of the current data version)"""
+        if self.outbox is None or os.getpid() != self._pid:
+            return
+        while True:
+            try:
+                key, payload = self.outbox.popleft()
+            except IndexError:
+                return
+            with self._lock:
+                if key[-1] == self.version and key not in self._entries:
+                    self._store(key, payload)
+
+    def lookup(self, key):
+        """The cached outputs for key, or None; never computes"""
+        self.collect()
+        key = key + (self.version,)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if payload is None:
+            return None
+        METRICS.inc('figure_cache_requests_total', callback=key[0], result='hit')
+        return self._decode(payload)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached payload for key, computing it at most once across threads"""
+        return self._decode(self.payload(key, compute))
+
+    def payload(self, key, compute):
+        """The cached JSON for key as a string, computing it at most once across threads"""
+        self.collect()
+        version = self.version
+        key = key + (version,)
+        with self._lock:
+            if version != self._seen_version:
+                # Entries for an older data version can never be hit again
+                self._seen_version = version
+                self._entries.clear()
+                self.size = 0
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = _Flight()
+                    self.misses += 1
+
+        if payload is not None:
+            METRICS.inc('figure_cache_requests_total', callback=key[0], result='hit')
+            return payload
+        if not leader:
+            METRICS.inc('figure_cache_requests_total', callback=key[0], result='coalesced')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.payload
+
+        METRICS.inc('figure_cache_requests_total', callback=key[0], result='miss')
+        try:
+            outputs = compute()
+            with METRICS.stage('serialize'):
+                flight.payload = dumps(outputs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and key[-1] == self.version:
+                    self._store(key, flight.payload)
+            flight.done.set()
+        if flight.error is None and self.outbox is not None and os.getpid() != self._pid:
+            self.outbox.append((key, flight.payload))
+        return flight.payload
+
+    def memoize(self, name):
+        """Decorator caching a callback's outputs by its positional inputs
+
+        The decorated function's cached(*args) returns the cached outputs or None.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args):
+                return self.get_or_compute((name,) + args, lambda: func(*args))
+            wrapper.cached = lambda *args: self.lookup((name,) + args)
+            return wrapper
+        return decorator
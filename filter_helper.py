@@ -1,10 +1,89 @@
 # Helper to filter dataframes
+#
+# Profile frames are sorted by (State, District) once at load time and the row
+# range of every state and every (state, district) pair is recorded. A selection
+# is then a positional slice of the sorted frame: no copy and no column scan.
+import numpy as np
+import pandas as pd
+
+
+def _group_ranges(*cols):
+    """Map each run of equal keys in sorted key columns to its (start, stop) row range"""
+    n = len(cols[0])
+    if n == 0:
+        return {}
+    change = np.zeros(n, dtype=bool)
+    change[0] = True
+    for col in cols:
+        change[1:] |= col[1:] != col[:-1]
+    starts = np.flatnonzero(change)
+    stops = np.append(starts[1:], n)
+    if len(cols) == 1:
+        return {cols[0][a]: (int(a), int(b)) for a, b in zip(starts, stops)}
+    return {tuple(col[a] for col in cols): (int(a), int(b)) for a, b in zip(starts, stops)}
+
+
+class IndexedFrame:
+    """A profile frame sorted by (State, District) with per-state/district row ranges"""
+
+    def __init__(self, df):
+        if not df.empty and 'State' in df.columns:
+            by = ['State', 'District'] if 'District' in df.columns else ['State']
+            df = df.sort_values(by, kind='mergesort', na_position='last', ignore_index=True)
+        self.df = df
+        self.state_ranges = {}
+        self.district_ranges = {}
+        if df.empty or 'State' not in df.columns:
+            return
+
+        # NaN keys sort last, so the valid rows are a prefix of the frame
+        states = df['State'].to_numpy(dtype=object)
+        n_states = int(pd.notna(states).sum())
+        self.state_ranges = _group_ranges(states[:n_states])
+        if 'District' in df.columns:
+            districts = df['District'].to_numpy(dtype=object)
+            self.district_ranges = {
+                k: r for k, r in _group_ranges(states[:n_states], districts[:n_states]).items()
+                if pd.notna(k[1])
+            }
+
+    def states(self):
+        """Sorted state names"""
+        return list(self.state_ranges)
+
+    def districts(self, state):
+        """Sorted district names for a state"""
+        return [d for s, d in self.district_ranges if s == state]
+
+    def select(self, state=None, district=None):
+        """Return the rows for a selection as a slice of the sorted frame"""
+        df = self.df
+        if df.empty or not (state or district):
+            return df
+        if state and district:
+            rows = self.district_ranges.get((state, district))
+        elif state:
+            rows = self.state_ranges.get(state)
+        else:
+            # District without a state: the same name can occur in several states
+            ranges = [r for (s, d), r in self.district_ranges.items() if d == district]
+            if len(ranges) != 1:
+                return df.take(np.concatenate([np.arange(a, b) for a, b in ranges] or [[]]).astype(int))
+            rows = ranges[0]
+        if rows is None:
+            return df.iloc[0:0]
+        return df.iloc[rows[0]:rows[1]]
+
+
 def filter_df(df, state, district):
-    dff = df.copy()
-    if state:
-        dff = dff[dff['State'] == state]
-    if district:
-        # Handle cases where District column might reference a different name or be missing in some merged views
-        # But for our main CSVs (loc, soc, emp, ind), 'District' exists.
-        dff = dff[dff['District'] == district]
-    return dff
+    """Rows of a profile frame for the selected state/district (read-only, not a copy)"""
+    if isinstance(df, IndexedFrame):
+        return df.select(state, district)
+    if df.empty:
+        return df
+    mask = np.ones(len(df), dtype=bool)
+    if state and 'State' in df.columns:
+        mask &= (df['State'] == state).to_numpy()
+    if district and 'District' in df.columns:
+        mask &= (df['District'] == district).to_numpy()
+    return df[mask]
@@ -0,0 +1,165 @@
+"""State bubble and choropleth maps built from one pre-aligned base figure
+
+The base mapbox layout and the state coordinate arrays are prepared once at
+import. A request only looks up its states' positions (one vectorized indexer call)
+and fills in the color, size and hover arrays of a plain figure dict, skipping the
+plotly.express pipeline and figure validation on every call. Choropleths reference
+the state boundaries by URL (see state_geometry), so no polygon is sent per figure.
+"""
+import copy
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from plotly.colors import get_colorscale
+
+# State coordinates for mapping
+STATE_COORDS = {
+    'ANDHRA PRADESH': {'lat': 15.9129, 'lon': 79.7400},
+    'ARUNACHAL PRADESH': {'lat': 28.2180, 'lon': 94.7278},
+    'ASSAM': {'lat': 26.2006, 'lon': 92.9376},
+    'BIHAR': {'lat': 25.0961, 'lon': 85.3131},
+    'CHHATTISGARH': {'lat': 21.2787, 'lon': 81.8661},
+    'GOA': {'lat': 15.2993, 'lon': 74.1240},
+    'GUJARAT': {'lat': 22.2587, 'lon': 71.1924},
+    'HARYANA': {'lat': 29.0588, 'lon': 76.0856},
+    'HIMACHAL PRADESH': {'lat': 31.1048, 'lon': 77.1734},
+    'JHARKHAND': {'lat': 23.6102, 'lon': 85.2799},
+    'KARNATAKA': {'lat': 15.3173, 'lon': 75.7139},
+    'KERALA': {'lat': 10.8505, 'lon': 76.2711},
+    'MADHYA PRADESH': {'lat': 22.9734, 'lon': 78.6569},
+    'MAHARASHTRA': {'lat': 19.7515, 'lon': 75.7139},
+    'MANIPUR': {'lat': 24.6637, 'lon': 93.9063},
+    'MEGHALAYA': {'lat': 25.4670, 'lon': 91.3662},
+    'MIZORAM': {'lat': 23.1645, 'lon': 92.9376},
+    'NAGALAND': {'lat': 26.1584, 'lon': 94.5624},
+    'ODISHA': {'lat': 20.9517, 'lon': 85.0985},
+    'PUNJAB': {'lat': 31.1471, 'lon': 75.3412},
+    'RAJASTHAN': {'lat': 27.0238, 'lon': 74.2179},
+    'SIKKIM': {'lat': 27.5330, 'lon': 88.5122},
+    'TAMIL NADU': {'lat': 11.1271, 'lon': 78.6569},
+    'TELANGANA': {'lat': 18.1124, 'lon': 79.0193},
+    'TRIPURA': {'lat': 23.9408, 'lon': 91.9882},
+    'UTTAR PRADESH': {'lat': 26.8467, 'lon': 80.9462},
+    'UTTARAKHAND': {'lat': 30.0668, 'lon': 79.0193},
+    'WEST BENGAL': {'lat': 22.9868, 'lon': 87.8550},
+    'DELHI': {'lat': 28.7041, 'lon': 77.1025},
+    'CHANDIGARH': {'lat': 30.7333, 'lon': 76.7794},
+    'PUDUCHERRY': {'lat': 11.9416, 'lon': 79.8083},
+    'LAKSHADWEEP': {'lat': 10.5669, 'lon': 72.6417},
+    'JAMMU AND KASHMIR': {'lat': 33.7782, 'lon': 76.5762},
+    'DAMAN AND DIU': {'lat': 20.4283, 'lon': 72.8397},
+    'DADAR AND NAGAR HAVELI': {'lat': 20.1809, 'lon': 73.0169}
+}
+CENTER = {'lat': 22, 'lon': 78}
+
+# Coordinates aligned to one state index; the extra last row is the fallback (map centre)
+STATE_INDEX = pd.Index(list(STATE_COORDS))
+STATE_LAT = np.array([c['lat'] for c in STATE_COORDS.values()] + [CENTER['lat']])
+STATE_LON = np.array([c['lon'] for c in STATE_COORDS.values()] + [CENTER['lon']])
+
+POINT_SIZE = 20  # fixed bubble diameter (px) when no size column is given: px drew a constant size at its size_max, 20
+
+# Only the parts of the default plotly template a bubble map uses
+BASE_LAYOUT = {
+    'template': {'layout': {
+        'font': {'color': '#2a3f5f'},
+        'hoverlabel': {'align': 'left'},
+        'paper_bgcolor': 'white',
+        'title': {'x': 0.05},
+        'coloraxis': {'colorbar': {'outlinewidth': 0, 'ticks': ''}},
+    }},
+    'mapbox': {'style': 'open-street-map', 'center': CENTER, 'zoom': 4.2, 'bearing': 0, 'pitch': 0,
+               'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]}},
+    'margin': {'r': 0, 't': 30, 'l': 0, 'b': 0},
+    'height': 850,
+    'dragmode': False,  # Disable rotation/dragging
+}
+
+
+@lru_cache(maxsize=64)
+def _named_colorscale(name):
+    return get_colorscale(name)
+
+
+def colorscale(scale):
+    """Resolve a named scale ('Viridis', 'RdYlGn_r') once; explicit [[stop, color], ...] lists pass through"""
+    return _named_colorscale(scale) if isinstance(scale, str) else scale
+
+
+def state_positions(states):
+    """Row of STATE_LAT/STATE_LON for each state (unknown states map to the centre)"""
+    pos = STATE_INDEX.get_indexer(pd.Index(states))
+    pos[pos < 0] = len(STATE_INDEX)
+    return pos
+
+
+def _value(values):
+    # Plain floats/ints for JSON; NaN stays NaN (sent as null)
+    return np.asarray(values).tolist()
+
+
+def _choropleth_trace(df_state, color_col, geojson, feature_id_key):
+    return {
+        'type': 'choroplethmapbox',
+        'geojson': geojson,
+        'featureidkey': feature_id_key,
+        'locations': _value(df_state['State']),
+        'z': _value(df_state[color_col]),
+        'coloraxis': 'coloraxis',
+        'marker': {'line': {'color': 'white', 'width': 0.8}, 'opacity': 0.85},
+    }
+
+
+def india_map(df_state, color_col, scale='Viridis', title='', size_col=None, hover=None,
+              size_max=25, zoom=4.2, height=850, geojson=None, feature_id_key='properties.NAME_1'):
+    """Bubble map of per-state values as a figure dict
+
+    hover is a list of (column, label, d3 format) shown under the state name;
+    it defaults to the color column. With geojson (a GeoJSON URL or object) the
+    states are filled as a choropleth instead, matched on feature_id_key, and
+    size_col is ignored.
+    """
+    if df_state.empty:
+        return {'data': [], 'layout': {}}
+
+    hover = hover or [(color_col, color_col, '')]
+    customdata = np.column_stack([df_state[col].to_numpy() for col, _, _ in hover])
+    lines = ''.join(f'<br>{label}=%{{customdata[{i}]{":" + fmt if fmt else ""}}}'
+                    for i, (_, label, fmt) in enumerate(hover))
+
+    layout = copy.deepcopy(BASE_LAYOUT)
+    layout['mapbox']['zoom'] = zoom
+    layout['height'] = height
+    layout['title'] = {'text': title}
+    color_label = next((label for col, label, _ in hover if col == color_col), color_col)
+    layout['coloraxis'] = {'colorscale': colorscale(scale), 'colorbar': {'title': {'text': color_label}}}
+    common = {
+        'hovertext': _value(df_state['State']),
+        'customdata': customdata.tolist(),
+        'hovertemplate': f'<b>%{{hovertext}}</b><br>{lines}<extra></extra>',
+        'showlegend': False,
+        'subplot': 'mapbox',
+    }
+    if geojson is not None:
+        return {'data': [{**_choropleth_trace(df_state, color_col, geojson, feature_id_key), **common}],
+                'layout': layout}
+
+    marker = {'color': _value(df_state[color_col]), 'coloraxis': 'coloraxis'}
+    if size_col and size_col in df_state.columns:
+        size = df_state[size_col].to_numpy(dtype='float64')
+        peak = np.nanmax(size) if len(size) else 0
+        marker.update(size=_value(size), sizemode='area', sizeref=peak / size_max ** 2 if peak > 0 else 1)
+    else:
+        marker['size'] = POINT_SIZE
+
+    pos = state_positions(df_state['State'])
+    trace = {
+        'type': 'scattermapbox',
+        'mode': 'markers',
+        'lat': _value(STATE_LAT[pos]),
+        'lon': _value(STATE_LON[pos]),
+        **common,
+        'marker': marker,
+    }
+    return {'data': [trace], 'layout': layout}
@@ -0,0 +1,93 @@
+"""Local manager for Dash background callbacks, with a cap on how many jobs run at once
+
+Each background callback runs in its own subprocess (Dash's DiskcacheManager), so a
+slow national query never holds a request thread. Results and progress go through a
+diskcache directory shared by every worker on the host. A job that is cancelled, or
+whose inputs change while it runs, is killed by Dash; the slot it held is reclaimed
+because slots are keyed by process id and dead processes are dropped.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import diskcache
+import psutil
+from dash import DiskcacheManager
+
+JOB_DIR = '.jobs'
+FALLBACK_JOB_DIR = 'msme-dashboard-jobs'  # under the system temp directory
+
+
+def _alive(pid):
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+class JobSlots:
+    """At most limit concurrent jobs across every process sharing the cache"""
+
+    def __init__(self, cache, limit, key='job-slots'):
+        self.cache = cache
+        self.limit = limit
+        self.key = key
+
+    def try_acquire(self, pid=None):
+        pid = pid or os.getpid()
+        with self.cache.transact():
+            holders = [p for p in self.cache.get(self.key, ()) if p != pid and _alive(p)]
+            if len(holders) >= self.limit:
+                return False
+            self.cache.set(self.key, holders + [pid])
+            return True
+
+    def release(self, pid=None):
+        pid = pid or os.getpid()
+        with self.cache.transact():
+            self.cache.set(self.key, [p for p in self.cache.get(self.key, ()) if p != pid])
+
+    def running(self):
+        """Process ids currently holding a slot"""
+        return [p for p in self.cache.get(self.key, ()) if _alive(p)]
+
+    @contextmanager
+    def slot(self, on_wait=None, poll_seconds=0.1):
+        """Hold a slot for the duration of the block; on_wait() is called once if it has to queue"""
+        waited = False
+        while not self.try_acquire():
+            if on_wait and not waited:
+                on_wait()
+            waited = True
+            time.sleep(poll_seconds)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def job_dir(work_dir):
+    """WORK_DIR/.jobs, or a directory under the system temp directory if WORK_DIR doesn't exist
+
+    The cache directory is created on open, so a missing WORK_DIR (e.g. the default
+    Windows path on another host) must not be used as its parent.
+    """
+    if os.path.isdir(work_dir):
+        return os.path.join(work_dir, JOB_DIR)
+    return os.path.join(tempfile.gettempdir(), FALLBACK_JOB_DIR)
+
+
+def create_job_manager(work_dir, limit, cache_by=None, expire=None):
+    """(DiskcacheManager, JobSlots) over job_dir(work_dir)
+
+    cache_by functions are added to each job's key; with them, finished results are
+    kept (for expire seconds) and reused by later identical requests.
+    """
+    cache = diskcache.Cache(job_dir(work_dir))
+    return DiskcacheManager(cache, cache_by=cache_by, expire=expire), JobSlots(cache, limit)
+
+
+def job_outbox(work_dir, name='metrics'):
+    """Queue that job subprocesses forward results through (metrics.Metrics.outbox, FigureCache.outbox)"""
+    return diskcache.Deque(directory=os.path.join(job_dir(work_dir), name))
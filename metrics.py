@@ -0,0 +1,259 @@
+"""Callback latency, stage and payload histograms, exposed in the Prometheus text format
+
+Each instrumented callback records its total time and the time it spent in each stage
+(filter, aggregate, figure, serialize), labelled by callback and view (tab, highlight
+mode, ...). Dash's own encoding of the response is added to the serialize stage and the
+response size is recorded by a Flask hook, since both happen after the callback returns.
+
+Background jobs run in subprocesses: their observations are forwarded through an outbox
+(a diskcache Deque) and merged into the serving process when /metrics is scraped.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+from flask import Response, g, has_request_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(8))  # 1 KB .. 16 MB
+
+_current = contextvars.ContextVar('metrics_invocation', default=None)
+
+
+class _Invocation:
+    """One callback call: its labels, total time and per-stage times"""
+
+    def __init__(self, callback, view):
+        self.callback = callback
+        self.view = view
+        self.stages = {}
+        self.seconds = 0.0
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+class _Laps:
+    """Stopwatch attributing the time since the previous lap to a stage"""
+
+    def __init__(self):
+        self.last = time.perf_counter()
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.add(stage, now - self.last)
+        self.last = now
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+
+
+class Metrics:
+    """Histograms and counters keyed by name and label set, rendered as Prometheus text"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}   # name -> (type, help, buckets)
+        self._series = {}     # (name, labels) -> [bucket counts..., sum, count] or [value]
+        self._pid = os.getpid()
+        self._buffer = []
+        self.outbox = None    # where observations made in job subprocesses are forwarded
+
+        self.histogram('dash_callback_seconds', 'Time spent in a Dash callback', LATENCY_BUCKETS)
+        self.histogram('dash_callback_stage_seconds', 'Time spent in one stage of a Dash callback',
+                       LATENCY_BUCKETS)
+        self.histogram('dash_response_bytes', 'Size of Dash callback responses', SIZE_BUCKETS)
+        self.counter('dash_callback_errors_total', 'Dash callbacks that raised')
+        self.counter('figure_cache_requests_total', 'Figure cache lookups by result')
+
+    def histogram(self, name, help_text, buckets):
+        self._families[name] = ('histogram', help_text, tuple(buckets))
+
+    def counter(self, name, help_text):
+        self._families[name] = ('counter', help_text, None)
+
+    def observe(self, name, value, **labels):
+        self._record(name, tuple(sorted(labels.items())), value)
+
+    def inc(self, name, value=1, **labels):
+        self._record(name, tuple(sorted(labels.items())), value)
+
+    def _record(self, name, labels, value):
+        if self.outbox is not None and os.getpid() != self._pid:
+            self._buffer.append((name, labels, value))
+            return
+        kind, _, buckets = self._families[name]
+        with self._lock:
+            if kind == 'counter':
+                series = self._series.setdefault((name, labels), [0])
+                series[0] += value
+                return
+            series = self._series.setdefault((name, labels), [0] * (len(buckets) + 2))
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def flush(self):
+        """Send what a job subprocess recorded to the outbox"""
+        if self._buffer and self.outbox is not None:
+            buffered, self._buffer = self._buffer, []
+            self.outbox.extend(buffered)
+
+    def collect(self):
+        """Merge what job subprocesses forwarded"""
+        if self.outbox is None or os.getpid() != self._pid:
+            return
+        while True:
+            try:
+                name, labels, value = self.outbox.popleft()
+            except IndexError:
+                return
+            self._record(name, tuple(tuple(pair) for pair in labels), value)
+
+    def render(self):
+        """Every series in the Prometheus text exposition format"""
+        self.collect()
+        lines = []
+        with self._lock:
+            series = sorted(self._series.items())
+        for name, (kind, help_text, buckets) in self._families.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (series_name, labels), values in series:
+                if series_name != name:
+                    continue
+                label_text = _format_labels(labels)
+                if kind == 'counter':
+                    lines.append(f'{name}{{{label_text}}} {values[0]}')
+                    continue
+                prefix = f'{label_text},' if label_text else ''
+                for bound, count in zip(buckets, values):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {count}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+                lines.append(f'{name}_sum{{{label_text}}} {values[-2]:.6f}')
+                lines.append(f'{name}_count{{{label_text}}} {values[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    # --- instrumentation ---
+
+    def callback(self, view=None):
+        """Decorator timing a callback; view(*args) gives its view label (e.g. the tab)"""
+        def decorator(func):
+            name = func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if _current.get() is not None:
+                    # Called from another callback (e.g. cache warming): part of that one's time
+                    return func(*args, **kwargs)
+                invocation = _Invocation(name, view(*args, **kwargs) if view else '')
+                token = _current.set(invocation)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except PreventUpdate:
+                    raise
+                except Exception:
+                    self.inc('dash_callback_errors_total', callback=name, view=invocation.view)
+                    raise
+                finally:
+                    invocation.seconds = time.perf_counter() - started
+                    _current.reset(token)
+                    if has_request_context() and g.get('metrics_pid') == os.getpid():
+                        # Finished in the response hook, once Dash has encoded the outputs.
+                        # (A job subprocess inherits the request context but never responds.)
+                        g.metrics_invocation = invocation
+                    elif os.getpid() != self._pid:
+                        self.finish(invocation)
+                    # Direct calls outside a request (cache warming, scripts) are not user latency
+            return wrapper
+        return decorator
+
+    def stage(self, name):
+        """Context manager adding the time of its block to a stage of the running callback"""
+        return _StageTimer(name)
+
+    def laps(self):
+        """Stopwatch: lap('filter') charges the time since the last lap to the 'filter' stage"""
+        return _Laps()
+
+    def finish(self, invocation, extra_serialize=0.0):
+        labels = {'callback': invocation.callback, 'view': invocation.view}
+        if extra_serialize:
+            invocation.add('serialize', extra_serialize)
+        self.observe('dash_callback_seconds', invocation.seconds + extra_serialize, **labels)
+        for stage, seconds in invocation.stages.items():
+            self.observe('dash_callback_stage_seconds', seconds, stage=stage, **labels)
+        self.flush()
+
+    def install(self, app, path='/metrics'):
+        """Time Dash's update requests and serve the metrics on app.server at path"""
+        server = app.server
+        update_path = app.config.requests_pathname_prefix + '_dash-update-component'
+
+        def callback_name(output):
+            spec = app.callback_map.get(output)
+            return inspect.unwrap(spec['callback']).__name__ if spec else 'unknown'
+
+        @server.before_request
+        def _start_timer():
+            if request.path == update_path:
+                g.metrics_started = time.perf_counter()
+                g.metrics_pid = os.getpid()
+
+        @server.after_request
+        def _observe_response(response):
+            started = g.pop('metrics_started', None)
+            invocation = g.pop('metrics_invocation', None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            if invocation is not None:
+                # Everything after the callback returned is Dash encoding the response
+                self.finish(invocation, max(elapsed - invocation.seconds, 0.0))
+                labels = {'callback': invocation.callback, 'view': invocation.view}
+            elif b'"response":' in response.get_data()[:1024]:
+                # A background job's result (after at most a small "progress" object);
+                # its timings came from the job process
+                body = request.get_json(silent=True) or {}
+                labels = {'callback': callback_name(body.get('output')), 'view': ''}
+            else:
+                return response  # job started, or still running
+            if response.status_code == 200 and not response.is_streamed:
+                self.observe('dash_response_bytes', response.calculate_content_length() or 0, **labels)
+                self.flush()
+            return response
+
+        @server.route(path)
+        def metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+class _StageTimer:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        invocation = _current.get()
+        if invocation is not None:
+            invocation.add(self.name, time.perf_counter() - self.started)
+        return False
+
+
+METRICS = Metrics()
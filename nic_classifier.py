@@ -0,0 +1,175 @@
+"""Vectorized NIC sector classification of multi-code nic5digitcode fields
+
+A field like " 1) 90001; 2) 90002; 3) 56210" is split into a flat array of codes
+plus per-row offsets, and every code is labelled at once through lookup tables over
+the whole 00000-99999 code space. When ranges overlap the narrowest range wins
+(Textiles & Apparel rather than Manufacturing); membership masks keep every range.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from numpy.lib.stride_tricks import as_strided
+
+# NIC Sector Mapping (5-digit code ranges to broad sectors)
+NIC_SECTOR_MAP = {
+    'Manufacturing': range(10000, 34000),
+    'Textiles & Apparel': range(13000, 15000),
+    'Food Processing': range(10000, 11000),
+    'Chemicals': range(20000, 21000),
+    'Metal & Machinery': range(24000, 29000),
+    'Construction': range(41000, 44000),
+    'Trade & Retail': range(45000, 48000),
+    'Transportation': range(49000, 54000),
+    'Hotels & Restaurants': range(55000, 57000),
+    'IT & Services': range(58000, 64000),
+    'Professional Services': range(69000, 75000),
+    'Other Services': range(77000, 97000)
+}
+SECTORS = ['Other'] + list(NIC_SECTOR_MAP)
+OTHER = 0
+CODE_SPACE = 100_000
+
+
+def _build_lookups():
+    sector = np.zeros(CODE_SPACE, dtype=np.int8)
+    members = np.zeros(CODE_SPACE, dtype=np.uint16)
+    # Paint the widest ranges first so narrower ones overwrite them
+    for name, codes in sorted(NIC_SECTOR_MAP.items(), key=lambda item: -len(item[1])):
+        sector[codes.start:codes.stop] = SECTORS.index(name)
+    for i, (name, codes) in enumerate(NIC_SECTOR_MAP.items(), start=1):
+        members[codes.start:codes.stop] |= 1 << i
+    members[sector == OTHER] = 1 << OTHER
+    return sector, members
+
+
+SECTOR_LOOKUP, MEMBERSHIP_LOOKUP = _build_lookups()
+
+NicCodes = namedtuple('NicCodes', ['offsets', 'codes'])
+NicSectors = namedtuple('NicSectors', ['primary', 'memberships', 'offsets', 'codes'])
+
+
+def _as_string_array(values):
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks() if values.num_chunks else pa.array([], pa.string())
+    elif not isinstance(values, pa.Array):
+        values = pd.Series(values, dtype=object)
+        values = pa.array(values.astype(str).where(values.notna(), None), pa.string(), from_pandas=True)
+    if pa.types.is_large_string(values.type):
+        values = values.cast(pa.string())
+    return pc.fill_null(values, '')
+
+
+def split_nic_codes(values):
+    """Flatten every 5-digit code of each field into one array, with row offsets
+
+    Codes of row i are codes[offsets[i]:offsets[i + 1]]. Digit runs shorter than five
+    (the " 1)" ordinals) are skipped; longer runs contribute their first five digits.
+    Works directly on the Arrow string buffers, so no Python string is created.
+    """
+    arr = _as_string_array(values)
+    n = len(arr)
+    _, offsets_buf, data_buf = arr.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int32, count=n + 1, offset=arr.offset * 4)
+    data = (np.frombuffer(data_buf, dtype=np.uint8)[offsets[0]:offsets[-1]]
+            if data_buf is not None else np.empty(0, np.uint8))
+    row_starts = offsets - offsets[0]
+
+    # Digit runs over the concatenated fields: edges alternate start, end
+    digit = np.zeros(len(data) + 2, dtype=np.int8)
+    np.less(data - np.uint8(48), 10, out=digit[1:-1].view(bool))
+    edges = np.flatnonzero(np.diff(digit))
+    starts, ends = edges[0::2], edges[1::2]
+    # A run can't continue from one field into the next
+    inner = row_starts[(row_starts > 0) & (row_starts < len(data))]
+    cross = inner[(digit[inner] == 1) & (digit[inner + 1] == 1)]
+    if len(cross):
+        starts = np.sort(np.concatenate([starts, cross]))
+        ends = np.sort(np.concatenate([ends, cross]))
+    starts = starts[ends - starts >= 5]
+
+    # Five consecutive bytes from each start, as one gather
+    digits = as_strided(data, shape=(max(len(data) - 4, 0), 5), strides=(1, 1))[starts].astype(np.int32)
+    codes = digits @ np.array([10000, 1000, 100, 10, 1], dtype=np.int32) - 48 * 11111
+    code_offsets = np.searchsorted(starts, row_starts)
+    return NicCodes(code_offsets, codes)
+
+
+def classify_nic(values):
+    """Sector of every registration from its NIC field
+
+    primary: sector id (index into SECTORS) of the first code, OTHER if there is none.
+    memberships: bitmask per row, bit i set if any of its codes falls in SECTORS[i].
+    """
+    offsets, codes = split_nic_codes(values)
+    counts = np.diff(offsets)
+    has_codes = counts > 0
+    primary = np.full(len(counts), OTHER, dtype=np.int8)
+    primary[has_codes] = SECTOR_LOOKUP[codes[offsets[:-1][has_codes]]]
+    memberships = np.full(len(counts), 1 << OTHER, dtype=np.uint16)
+    if len(codes):
+        masks = np.bitwise_or.reduceat(MEMBERSHIP_LOOKUP[codes], offsets[:-1][has_codes])
+        memberships[has_codes] = masks
+    return NicSectors(primary, memberships, offsets, codes)
+
+
+def membership_matrix(memberships):
+    """Boolean rows x SECTORS matrix from membership bitmasks"""
+    return (memberships[:, None] >> np.arange(len(SECTORS), dtype=np.uint16)) & 1 == 1
+
+
+def nic_sector(nic_code):
+    """Map a single NIC code or field to its most specific broad sector"""
+    return SECTORS[classify_nic([nic_code]).primary[0]]
+
+
+def classify_master(master):
+    """classify_nic over an Arrow master table's nic5digitcode column (None if it has none)"""
+    if not {'state', 'district', 'nic5digitcode'} <= set(master.column_names):
+        return None
+    return classify_nic(master['nic5digitcode'])
+
+
+def first_codes(result):
+    """First NIC code of every registration, -1 where it has none"""
+    counts = np.diff(result.offsets)
+    first = np.full(len(counts), -1, dtype=np.int32)
+    first[counts > 0] = result.codes[result.offsets[:-1][counts > 0]]
+    return first
+
+
+def state_code_diversity(master, result):
+    """Number of distinct first NIC codes per state (the composite score's Industry input)"""
+    if result is None:
+        return pd.Series(dtype='int64')
+    table = pa.table({'State': pc.utf8_trim_whitespace(master['state']), 'code': first_codes(result)})
+    counts = table.group_by('State').aggregate([('code', 'count_distinct')]).to_pandas()
+    return counts.set_index('State')['code_count_distinct'].sort_index()
+
+
+def sector_profile(master, result):
+    """Registrations per (State, District, Sector) from an Arrow master table and its classify_master result
+
+    primary_msmes counts registrations whose first code is in the sector;
+    active_msmes counts those with any code in it (or a broader range containing it).
+    """
+    columns = ['State', 'District', 'Sector', 'primary_msmes', 'active_msmes']
+    if result is None:
+        return pd.DataFrame(columns=columns)
+    keys = {'State': pc.utf8_trim_whitespace(master['state']),
+            'District': pc.utf8_trim_whitespace(master['district'])}
+    flags = {f's{i}': (result.memberships >> i) & 1 for i in range(len(SECTORS))}
+    flags.update({f'p{i}': result.primary == i for i in range(len(SECTORS))})
+    table = pa.table({**keys, **{k: pa.array(v.astype(np.int64)) for k, v in flags.items()}})
+    sums = table.group_by(list(keys)).aggregate([(k, 'sum') for k in flags]).to_pandas()
+
+    long = pd.DataFrame({
+        'State': np.repeat(sums['State'].to_numpy(), len(SECTORS)),
+        'District': np.repeat(sums['District'].to_numpy(), len(SECTORS)),
+        'Sector': np.tile(SECTORS, len(sums)),
+        'primary_msmes': sums[[f'p{i}_sum' for i in range(len(SECTORS))]].to_numpy().ravel(),
+        'active_msmes': sums[[f's{i}_sum' for i in range(len(SECTORS))]].to_numpy().ravel(),
+    })
+    return long[long['active_msmes'] > 0].reset_index(drop=True)[columns]
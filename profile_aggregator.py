@@ -0,0 +1,276 @@
+"""Incremental rebuild of the five profile tables from batches of master (msme_merged) rows"""
+import copy
+import csv
+import io
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from score_engine import composite_scores
+
+DISTRICT_KEYS = ['State', 'District']
+LOCATION_KEYS = ['State', 'District', 'LG_Dist_Code', 'PINCode', 'Dic_Name']
+
+# Profile count column -> (master column, value counted)
+MASTER_FLAGS = {
+    'sc_count': ('socialcategory', 'SC'),
+    'st_count': ('socialcategory', 'ST'),
+    'obc_count': ('socialcategory', 'OBC'),
+    'general_count': ('socialcategory', 'General'),
+    'female_owned': ('gender', 'Female'),
+    'male_owned': ('gender', 'Male'),
+    'ph_count': ('ph', 'Yes'),
+    'Micro': ('enterprisetype', 'Micro'),
+    'Small': ('enterprisetype', 'Small'),
+    'Medium': ('enterprisetype', 'Medium'),
+    'manufacturing': ('majoractivity', 'Manufacturing'),
+    'services': ('majoractivity', 'Services'),
+}
+# Master columns read by prepare_master_rows
+MASTER_COLUMNS = ['aid', 'state', 'district', 'lg_dist_code', 'pincode', 'dic_name', 'nic5digitcode',
+                  'totalemp', 'investmentcost'] + sorted({src for src, _ in MASTER_FLAGS.values()})
+MEASURES = ['total_msmes', 'total_employment', 'total_investment'] + list(MASTER_FLAGS)
+ENTERPRISE_TYPES = ['Micro', 'Small', 'Medium']
+ROW_KEYS = LOCATION_KEYS + ['nic']
+# What one master row adds to the aggregates; total_msmes is always 1, MASTER_FLAGS are bits of flags
+CONTRIBUTION = np.dtype([('key', 'int32'), ('total_employment', 'float64'), ('total_investment', 'float64'),
+                         ('flags', 'uint16')])
+
+
+def master_columns(header, first_row):
+    """Column names for the master file
+
+    The exported msme_merged.csv has a stray empty header cell after 'ph', so its
+    header is one field wider than its rows. Blank names are dropped when that
+    happens and given placeholder names otherwise.
+    """
+    blanks = [i for i, name in enumerate(header) if not name.strip()]
+    if blanks and first_row is not None and len(first_row) == len(header) - len(blanks):
+        return [name.strip() for name in header if name.strip()]
+    return [name.strip() or f'unnamed_{i}' for i, name in enumerate(header)]
+
+
+def _master_names(reader):
+    """Consume the header line of a peekable binary stream and return the column names"""
+    header = next(csv.reader([reader.readline().decode('utf-8-sig')]), [])
+    first_line = reader.peek(1 << 16).split(b'\n', 1)[0].decode('utf-8', 'replace')
+    first_row = next(csv.reader([first_line]), None) if first_line.strip() else None
+    return master_columns(header, first_row)
+
+
+def read_master_header(path):
+    """Column names of a master file without reading its rows"""
+    with open(path, 'rb') as f:
+        return _master_names(io.BufferedReader(f))
+
+
+def read_master_csv(src, chunksize=None):
+    """Read master rows as text, fixing the shifted header
+
+    A path is read whole; pass an open binary stream to iterate in chunks.
+    """
+    if isinstance(src, str):
+        with open(src, 'rb') as f:
+            return read_master_csv(f)
+    reader = src if hasattr(src, 'peek') else io.BufferedReader(src)
+    names = _master_names(reader)
+    return pd.read_csv(reader, header=None, names=names, dtype=str, keep_default_na=False,
+                       chunksize=chunksize, encoding='utf-8')
+
+
+def first_nic_code(nic):
+    """First 5-digit code of a " 1) 90001; 2) 90002" field (the raw value if it has none)"""
+    nic = nic.fillna('').astype(str)
+    return nic.str.extract(r'(\d{5})', expand=False).fillna(nic.str.strip())
+
+
+def prepare_master_rows(df):
+    """Reduce raw master rows to the keys and per-row contributions the profiles need"""
+    out = pd.DataFrame({
+        'aid': df['aid'].astype(str).str.strip(),
+        'State': df['state'].astype(str).str.strip(),
+        'District': df['district'].astype(str).str.strip(),
+        'LG_Dist_Code': df['lg_dist_code'].astype(str).str.strip(),
+        'PINCode': df['pincode'].astype(str).str.strip(),
+        'Dic_Name': df['dic_name'].astype(str).str.strip(),
+        'nic': first_nic_code(df['nic5digitcode']),
+        'total_msmes': 1,
+        'total_employment': pd.to_numeric(df['totalemp'], errors='coerce').fillna(0),
+        'total_investment': pd.to_numeric(df['investmentcost'], errors='coerce').fillna(0),
+    })
+    for col, (src, value) in MASTER_FLAGS.items():
+        out[col] = (df[src].astype(str).str.strip() == value).astype('int64').to_numpy()
+    return out.drop_duplicates('aid', keep='last').set_index('aid')
+
+
+class ProfileAggregator:
+    """District/state aggregates kept up to date by applying batches of master rows as deltas
+
+    Rows are keyed by aid: a row whose aid was seen before replaces the earlier one
+    (its old contribution is subtracted first). The cost of apply_batch grows with
+    the batch and the number of districts, never with the rows already absorbed.
+
+    Only each row's contribution is kept, not the row: a code for its location and
+    NIC keys, its employment and investment, and its flags as bits. Contributions are
+    appended batch by batch and never modified, and aids map to their current one.
+    """
+    STATE_VERSION = 2
+
+    def __init__(self):
+        self.districts = pd.DataFrame(columns=MEASURES, dtype='float64',
+                                      index=pd.MultiIndex.from_arrays([[], []], names=DISTRICT_KEYS))
+        self.locations = pd.Series(dtype='int64', index=pd.MultiIndex.from_arrays(
+            [[]] * len(LOCATION_KEYS), names=LOCATION_KEYS))
+        self.district_nic = pd.Series(dtype='int64', index=pd.MultiIndex.from_arrays(
+            [[], [], []], names=DISTRICT_KEYS + ['nic']))
+        self.state_nic = pd.Series(dtype='int64', index=pd.MultiIndex.from_arrays(
+            [[], []], names=['State', 'nic']))
+        self._keys = {}           # (location..., nic) -> key code
+        self._key_values = []     # key code -> (location..., nic)
+        self._contributions = []  # one CONTRIBUTION array per batch
+        self._starts = [0]        # row number of each batch's first contribution, then the total
+        self._aid_row = {}        # aid -> row number of its current contribution
+        self.source_stamp = None
+        self.state_version = self.STATE_VERSION
+
+    @classmethod
+    def from_master(cls, df_master, batch_rows=500_000):
+        agg = cls()
+        for start in range(0, len(df_master), batch_rows):
+            agg.apply_batch(df_master.iloc[start:start + batch_rows])
+        return agg
+
+    def __len__(self):
+        return len(self._aid_row)
+
+    def copy(self):
+        """An aggregator that takes batches without changing this one (contributions are shared)"""
+        other = copy.copy(self)
+        other._keys = dict(self._keys)
+        other._key_values = list(self._key_values)
+        other._contributions = list(self._contributions)
+        other._starts = list(self._starts)
+        other._aid_row = dict(self._aid_row)
+        return other
+
+    @staticmethod
+    def _add(total, delta):
+        out = total.add(delta, fill_value=0)
+        return out[out != 0] if isinstance(out, pd.Series) else out[out['total_msmes'] != 0]
+
+    def _accumulate(self, rows, sign):
+        self.districts = self._add(self.districts, sign * rows.groupby(DISTRICT_KEYS)[MEASURES].sum())
+        self.locations = self._add(self.locations, sign * rows.groupby(LOCATION_KEYS).size())
+        self.district_nic = self._add(self.district_nic, sign * rows.groupby(DISTRICT_KEYS + ['nic']).size())
+        self.state_nic = self._add(self.state_nic, sign * rows.groupby(['State', 'nic']).size())
+
+    def _encode(self, rows):
+        """CONTRIBUTION array of prepared rows, adding any new keys to the key table"""
+        codes, uniques = pd.MultiIndex.from_frame(rows[ROW_KEYS]).factorize()
+        for key in uniques:
+            if key not in self._keys:
+                self._keys[key] = len(self._key_values)
+                self._key_values.append(key)
+        out = np.empty(len(rows), dtype=CONTRIBUTION)
+        out['key'] = np.array([self._keys[key] for key in uniques], dtype='int32')[codes]
+        out['total_employment'] = rows['total_employment'].to_numpy()
+        out['total_investment'] = rows['total_investment'].to_numpy()
+        out['flags'] = sum(rows[col].to_numpy(dtype='int64') << bit for bit, col in enumerate(MASTER_FLAGS))
+        return out
+
+    def _decode(self, row_numbers):
+        """Prepared rows (as from prepare_master_rows) of the contributions at these row numbers"""
+        batches = np.searchsorted(self._starts, row_numbers, side='right') - 1
+        taken = np.concatenate([self._contributions[b][row_numbers[batches == b] - self._starts[b]]
+                                for b in np.unique(batches)])
+        rows = pd.DataFrame([self._key_values[k] for k in taken['key']], columns=ROW_KEYS)
+        rows['total_msmes'] = 1
+        rows['total_employment'] = taken['total_employment']
+        rows['total_investment'] = taken['total_investment']
+        for bit, col in enumerate(MASTER_FLAGS):
+            rows[col] = ((taken['flags'] >> bit) & 1).astype('int64')
+        return rows
+
+    def apply_batch(self, batch):
+        """Fold a batch of raw master rows into the aggregates; returns the (State, District) pairs touched"""
+        rows = prepare_master_rows(batch)
+        if rows.empty:
+            return set()
+
+        # Subtract the earlier version of any re-sent aid
+        touched = set()
+        previous = np.array([r for r in map(self._aid_row.get, rows.index) if r is not None], dtype='int64')
+        if len(previous):
+            old = self._decode(previous)
+            self._accumulate(old, -1)
+            touched.update(zip(old['State'], old['District']))
+
+        self._accumulate(rows, 1)
+        start = self._starts[-1]
+        self._contributions.append(self._encode(rows))
+        self._starts.append(start + len(rows))
+        self._aid_row.update(zip(rows.index, range(start, start + len(rows))))
+        touched.update(zip(rows['State'], rows['District']))
+        return touched
+
+    def state_totals(self):
+        """State-level sums plus the number of distinct NIC codes"""
+        states = self.districts.groupby(level='State').sum()
+        states['nic_codes'] = self.state_nic.groupby(level='State').size().reindex(states.index, fill_value=0)
+        return states
+
+    def profiles(self):
+        """The five profile tables in the same layout as the offline CSVs"""
+        d = self.districts
+        keys = d.index.to_frame(index=False)
+        counts = d.astype('int64')
+
+        loc = self.locations.rename('msme_count').reset_index()
+
+        soc = keys.copy()
+        for col in ['total_msmes', 'sc_count', 'st_count', 'obc_count', 'general_count',
+                    'female_owned', 'male_owned', 'ph_count']:
+            soc[col] = counts[col].to_numpy()
+
+        emp = keys.copy()
+        emp['total_msmes'] = counts['total_msmes'].to_numpy()
+        emp['total_employment'] = d['total_employment'].to_numpy()
+        emp['avg_employment'] = (d['total_employment'] / d['total_msmes']).round(2).to_numpy()
+        emp['total_investment'] = d['total_investment'].to_numpy()
+        emp['enterprise_type_split'] = self._enterprise_split(counts[ENTERPRISE_TYPES])
+
+        # Most common first NIC code (lowest code on ties) and number of distinct codes
+        nic = self.district_nic.reset_index(name='n').sort_values(
+            DISTRICT_KEYS + ['n', 'nic'], ascending=[True, True, False, True], kind='mergesort')
+        top = nic.drop_duplicates(DISTRICT_KEYS).set_index(DISTRICT_KEYS)['nic']
+        ind = keys.copy()
+        ind['top_nic_sector'] = top.reindex(d.index).to_numpy()
+        ind['manufacturing_pct'] = (d['manufacturing'] / d['total_msmes'] * 100).round(2).to_numpy()
+        ind['services_pct'] = (d['services'] / d['total_msmes'] * 100).round(2).to_numpy()
+        ind['industry_diversity_index'] = nic.groupby(DISTRICT_KEYS).size().reindex(d.index).to_numpy()
+
+        score = composite_scores(self.state_totals()).reset_index()
+        return {'loc': loc, 'soc': soc, 'emp': emp, 'ind': ind, 'score': score}
+
+    @staticmethod
+    def _enterprise_split(types):
+        """Format per-type counts as "Micro: 5 | Small: 2", largest first"""
+        values = types.to_numpy()
+        order = np.argsort(-values, axis=1, kind='stable')
+        return [' | '.join(f'{ENTERPRISE_TYPES[i]}: {row[i]}' for i in idx if row[i] > 0)
+                for row, idx in zip(values, order)]
+
+    def save(self, path):
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            agg = pickle.load(f)
+        if getattr(agg, 'state_version', None) != ProfileAggregator.STATE_VERSION:
+            raise ValueError(f"saved aggregates have an older layout ({path})")
+        return agg
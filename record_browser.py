@@ -0,0 +1,254 @@
+"""Server-side filtering, sorting and paging of the master registrations for the record browser
+
+Only one page of rows ever leaves the memory-mapped master table. Rows are grouped in
+blocks (all rows, one per state, or one per district) and an ordering of a sortable
+column lists the row positions sorted by (block, value), so a page of a selection is a
+slice of it. Orderings are built the first time a column is sorted at a level and kept
+for the data version; after that a page costs O(page size) whatever the table size.
+
+Filters typed in the table's filter row ("{gender} = Female && {totalemp} > 10") are
+a scan of the selection; the matching positions are cached, so paging through a
+filtered result is a slice too.
+"""
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Master column -> table heading
+RECORD_COLUMNS = {
+    'enterprisename': 'Enterprise',
+    'enterprisetype': 'Category',
+    'socialcategory': 'Social Category',
+    'gender': 'Gender',
+    'nic5digitcode': 'NIC Codes',
+    'totalemp': 'Employment',
+    'investmentcost': 'Investment',
+    'dic_name': 'DIC',
+    'district': 'District',
+    'state': 'State',
+}
+NUMERIC_COLUMNS = {'totalemp', 'investmentcost'}
+PAGE_SIZE = 25
+MAX_PAGE_SIZE = 500
+FILTER_CACHE_ENTRIES = 32
+
+# dash_table filter_query operators, longest first
+FILTER_OPERATORS = [('>=', 'ge'), ('<=', 'le'), ('!=', 'ne'), ('>', 'gt'), ('<', 'lt'), ('=', 'eq'),
+                    ('contains', 'contains'), ('ge', 'ge'), ('le', 'le'), ('ne', 'ne'), ('gt', 'gt'),
+                    ('lt', 'lt'), ('eq', 'eq')]
+# An 'i' or 's' prefix (case-insensitive/sensitive) is accepted; text always matches case-insensitively
+_FILTER_PART = re.compile(r'^\{(?P<column>[^}]+)\}\s*[is]?(?P<op>' + '|'.join(re.escape(o) for o, _ in FILTER_OPERATORS)
+                          + r')\s*(?P<value>.*)$', re.IGNORECASE)
+# Parts of a filter_query between '&&' separators; a quoted value is kept whole even if it holds '&&'
+_FILTER_SPLIT = re.compile(r'(?:"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|`(?:[^`\\]|\\.)*`|[^"\'`&]|(?<!&)&(?!&)|["\'`])+')
+
+NUMERIC_COMPARE = {'eq': np.equal, 'ne': np.not_equal, 'gt': np.greater, 'lt': np.less,
+                   'ge': np.greater_equal, 'le': np.less_equal}
+TEXT_COMPARE = {'gt': pc.greater, 'lt': pc.less, 'ge': pc.greater_equal, 'le': pc.less_equal}
+
+Page = namedtuple('Page', ['rows', 'total'])
+_Blocks = namedtuple('_Blocks', ['codes', 'count', 'names'])
+
+
+def parse_filter(query):
+    """[(column, op, value)] of a dash_table filter_query; parts it can't read are ignored"""
+    parts = []
+    for part in _FILTER_SPLIT.findall(query or ''):
+        match = _FILTER_PART.match(part.strip())
+        if not match:
+            continue
+        op = dict(FILTER_OPERATORS)[match['op'].lower()]
+        value = match['value'].strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'`':
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        parts.append((match['column'], op, value))
+    return parts
+
+
+def _trimmed(column):
+    return pc.utf8_trim_whitespace(column.cast(pa.string()))
+
+
+class RecordIndex:
+    """Pages of the master table for a (state, district) selection, sort and filter"""
+
+    def __init__(self, table):
+        self.table = table
+        self.columns = [c for c in RECORD_COLUMNS if c in table.column_names]
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._orderings = {}
+        self._filtered = OrderedDict()
+        # Record batches of the displayed columns: a take on the chunked table would
+        # concatenate every chunk first, so pages are taken batch by batch
+        self._batches = table.select(self.columns).to_batches()
+        self._batch_starts = np.cumsum([0] + [len(b) for b in self._batches])
+        self._blocks = {'all': _Blocks(None, 1, {None: 0})}  # a single block, codes not needed
+        if table.num_rows and {'state', 'district'} <= set(table.column_names):
+            states = _trimmed(table.column('state')).combine_chunks().dictionary_encode()
+            districts = _trimmed(table.column('district')).combine_chunks().dictionary_encode()
+            state_codes = states.indices.to_numpy(zero_copy_only=False).astype('int64')
+            pairs = state_codes * len(districts.dictionary) + districts.indices.to_numpy(zero_copy_only=False)
+            unique_pairs, pair_codes = np.unique(pairs, return_inverse=True)
+            state_names, district_names = states.dictionary.to_pylist(), districts.dictionary.to_pylist()
+            self._blocks['state'] = _Blocks(state_codes.astype('int32'), len(state_names),
+                                            {s: i for i, s in enumerate(state_names)})
+            self._blocks['district'] = _Blocks(pair_codes.astype('int32'), len(unique_pairs), {
+                (state_names[p // len(district_names)], district_names[p % len(district_names)]): i
+                for i, p in enumerate(unique_pairs)})
+
+    def _sort_key(self, column):
+        """float64 per row ordering a column's values: numbers, or text as its sorted rank; NaN if blank"""
+        key = self._keys.get(column)
+        if key is None:
+            values = self.table.column(column)
+            if column in NUMERIC_COLUMNS:
+                key = pd.to_numeric(pd.Series(_trimmed(values).to_numpy(zero_copy_only=False)),
+                                    errors='coerce').to_numpy(dtype='float64')
+            else:
+                encoded = _trimmed(values).combine_chunks().dictionary_encode()
+                dictionary = encoded.dictionary.to_numpy(zero_copy_only=False)
+                rank = np.empty(len(dictionary), dtype='float64')
+                rank[np.argsort(dictionary, kind='stable')] = np.arange(len(dictionary))
+                rank[dictionary == ''] = np.nan
+                key = rank[encoded.indices.to_numpy(zero_copy_only=False)]
+            self._keys[column] = key
+        return key
+
+    def _ordering(self, level, column):
+        """(positions sorted by block then value with NaN last, block starts, non-NaN count per block)"""
+        ordering = self._orderings.get((level, column))
+        if ordering is None:
+            codes = self._blocks[level].codes
+            if codes is None:
+                codes = np.zeros(self.table.num_rows, dtype='int8')
+            counts = np.bincount(codes, minlength=self._blocks[level].count)
+            starts = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+            if column is None:
+                order = np.argsort(codes, kind='stable').astype('int32')
+                valid = counts
+            else:
+                key = self._sort_key(column)
+                missing = np.isnan(key)
+                order = np.lexsort((np.where(missing, np.inf, key), codes)).astype('int32')
+                valid = np.bincount(codes, weights=~missing, minlength=len(counts)).astype('int64')
+            ordering = (order, starts, valid)
+            self._orderings[(level, column)] = ordering
+        return ordering
+
+    def states(self):
+        """Sorted state names of the master, whitespace trimmed"""
+        blocks = self._blocks.get('state')
+        return sorted(s for s in blocks.names if s) if blocks else []
+
+    def districts(self, state):
+        """Sorted district names of a state in the master, whitespace trimmed"""
+        blocks = self._blocks.get('district')
+        state = (state or '').strip()
+        return sorted(d for s, d in blocks.names if s == state and d) if blocks else []
+
+    def _selection(self, state, district):
+        """(level, block) of a selection; block is None if it has no rows"""
+        # Names are matched trimmed, like the master's (profile names can carry trailing spaces)
+        state, district = (state or '').strip(), (district or '').strip()
+        if state and district:
+            level, name = 'district', (state, district)
+        else:
+            level, name = ('state', state) if state else ('all', None)
+        blocks = self._blocks.get(level)
+        return level, blocks.names.get(name) if blocks else None
+
+    def _sorted_positions(self, level, block, column, ascending, start, stop):
+        """Row positions [start, stop) of a block in sort order; NaN values come last either way"""
+        if level == 'all' and column is None:
+            return np.arange(start, stop, dtype='int64')
+        order, starts, valid = self._ordering(level, column)
+        first, n_valid = starts[block], valid[block]
+        ranks = np.arange(start, stop)
+        if column is not None and not ascending:
+            ranks = np.where(ranks < n_valid, n_valid - 1 - ranks, ranks)
+        return order[first + ranks]
+
+    def _matches(self, positions, filters):
+        """Which of the positions pass every (column, op, value) filter"""
+        keep = np.ones(len(positions), dtype=bool)
+        for column, op, value in filters:
+            if column not in self.columns:
+                continue
+            number = pd.to_numeric(value, errors='coerce')
+            if column in NUMERIC_COLUMNS and op != 'contains' and not pd.isna(number):
+                keep &= NUMERIC_COMPARE[op](self._sort_key(column)[positions], number)
+                continue
+            text = _trimmed(self.table.column(column).take(pa.array(positions)))
+            if op == 'contains':
+                mask = pc.match_substring(text, value, ignore_case=True)
+            elif op in ('eq', 'ne'):
+                mask = pc.equal(pc.utf8_lower(text), value.lower())
+                mask = pc.invert(mask) if op == 'ne' else mask
+            else:
+                mask = TEXT_COMPARE[op](text, value)
+            keep &= mask.fill_null(False).to_numpy(zero_copy_only=False)
+        return keep
+
+    def page(self, state=None, district=None, sort_by=None, ascending=True, filter_query='',
+             page=0, page_size=PAGE_SIZE, rows=None, rows_key=None):
+        """One page of records (display columns, master column names) and the selection's row count
+
+        rows, if given, is a bool per master row restricting the records further (e.g. a
+        CategoryIndex row mask); rows_key identifies it in the filter cache.
+        """
+        page_size = max(1, min(int(page_size or PAGE_SIZE), MAX_PAGE_SIZE))
+        sort_by = sort_by if sort_by in self.columns else None
+        level, block = self._selection(state, district)
+        if block is None or not self.table.num_rows:
+            return Page(pd.DataFrame(columns=self.columns), 0)
+        filters = parse_filter(filter_query)
+        with self._lock:
+            if filters or rows is not None:
+                key = (level, block, sort_by, ascending, tuple(filters), rows_key)
+                matched = self._filtered.get(key)
+                if matched is None:
+                    everything = self._block_size(level, block)
+                    positions = self._sorted_positions(level, block, sort_by, ascending, 0, everything)
+                    keep = self._matches(positions, filters)
+                    if rows is not None:
+                        keep &= rows[positions]
+                    matched = positions[keep]
+                    self._filtered[key] = matched
+                    while len(self._filtered) > FILTER_CACHE_ENTRIES:
+                        self._filtered.popitem(last=False)
+                else:
+                    self._filtered.move_to_end(key)
+                total = len(matched)
+                positions = matched[page * page_size:(page + 1) * page_size]
+            else:
+                total = self._block_size(level, block)
+                start = min(page * page_size, total)
+                positions = self._sorted_positions(level, block, sort_by, ascending,
+                                                   start, min(start + page_size, total))
+        taken = self._take(positions)
+        rows = {c: _trimmed(taken.column(c)).to_numpy(zero_copy_only=False) for c in self.columns}
+        for column in NUMERIC_COLUMNS.intersection(rows):
+            rows[column] = pd.to_numeric(rows[column], errors='coerce')
+        return Page(pd.DataFrame(rows, columns=self.columns), total)
+
+    def _take(self, positions):
+        """The displayed columns of the rows at positions, in that order"""
+        positions = np.asarray(positions, dtype='int64')
+        batch_of = np.searchsorted(self._batch_starts, positions, side='right') - 1
+        by_batch = np.argsort(batch_of, kind='stable')
+        pieces = [self._batches[b].take(pa.array(positions[batch_of == b] - self._batch_starts[b]))
+                  for b in np.unique(batch_of)]
+        rows = pa.Table.from_batches(pieces, schema=self.table.select(self.columns).schema)
+        return rows.take(pa.array(np.argsort(by_batch)))
+
+    def _block_size(self, level, block):
+        if level == 'all':
+            return self.table.num_rows
+        _, starts, _ = self._ordering(level, None)
+        return int(starts[block + 1] - starts[block])
@@ -0,0 +1,222 @@
+"""Compact callback payloads: orjson, typed numeric arrays, shared templates and compression
+
+Figures are rewritten before they are cached and sent:
+- numeric trace arrays become plotly.js typed arrays ({'dtype', 'bdata'}: base64 of the
+  raw little-endian values, in the smallest dtype that holds them exactly)
+- the default plotly template, which is most of a chart's JSON, is replaced by its name;
+  the browser loads the templates once from a cacheable script
+
+The plotly.js bundled with Dash 2.14 predates typed-array support, so
+assets/figure_decode.js turns both back into what it understands before each plot.
+Responses are then gzip or brotli compressed when the client accepts it.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import plotly.io as pio
+from flask import request
+from plotly.basedatatypes import BaseFigure
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENGINE = 'orjson' if orjson else 'json'
+MIN_TYPED_LENGTH = 8  # shorter arrays are smaller as plain JSON
+TYPED_OVERHEAD = '{"dtype":"f8","bdata":""}'
+# Trace attributes (at any depth, e.g. marker.size) sent as typed arrays when numeric
+TYPED_KEYS = {'x', 'y', 'z', 'lat', 'lon', 'r', 'theta', 'values', 'base', 'width',
+              'size', 'color', 'opacity', 'customdata'}
+SHARED_TEMPLATES = ['plotly']
+
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE = {'application/json', 'application/javascript', 'text/javascript', 'text/html',
+                'text/css', 'text/plain'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+STATIC_CACHE_ENTRIES = 64  # compressed copies of static responses (Dash's component bundles)
+STATIC_MAX_AGE = 86400  # responses cacheable this long (or with an ETag) count as static
+
+# Smallest exact integer dtype first
+_INT_DTYPES = [('i1', np.int8), ('u1', np.uint8), ('i2', np.int16), ('u2', np.uint16),
+               ('i4', np.int32), ('u4', np.uint32)]
+
+pio.json.config.default_engine = ENGINE  # also used by Dash for the responses it encodes
+
+
+def _int_dtype(array):
+    low, high = array.min(), array.max()
+    for code, dtype in _INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return code
+    return None
+
+
+def typed_array(values):
+    """plotly.js typed-array spec for a 1-D numeric array, or None when plain JSON is smaller"""
+    if isinstance(values, (list, tuple)):
+        if len(values) < MIN_TYPED_LENGTH or isinstance(values[0], bool) \
+                or not isinstance(values[0], (int, float, np.number)):
+            return None
+    elif not isinstance(values, np.ndarray):
+        return None
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return None
+    if array.ndim != 1 or len(array) < MIN_TYPED_LENGTH or array.dtype.kind not in 'iuf':
+        return None
+    code = None
+    if array.dtype.kind in 'iu' or (np.isfinite(array).all() and (array == np.trunc(array)).all()):
+        code = _int_dtype(array)
+    if code is None:
+        if array.dtype.kind in 'iu' and np.abs(array).max() > 2 ** 53:
+            return None
+        as_f4 = array.astype('float32')
+        code = 'f4' if np.array_equal(as_f4, array, equal_nan=True) else 'f8'
+    bdata = base64.b64encode(array.astype('<' + code).tobytes()).decode('ascii')
+    if len(bdata) + len(TYPED_OVERHEAD) >= len(to_json_plotly(array, engine=ENGINE)):
+        return None  # e.g. short decimals, which are smaller as text
+    return {'dtype': code, 'bdata': bdata}
+
+
+def _compact_trace(node):
+    out = {}
+    for key, value in node.items():
+        if isinstance(value, dict):
+            value = _compact_trace(value)
+        elif key in TYPED_KEYS:
+            value = typed_array(value) or value
+        out[key] = value
+    return out
+
+
+# name -> template as it appears in a figure dict, to recognise it by content
+_TEMPLATES = {name: pio.templates[name].to_plotly_json() for name in SHARED_TEMPLATES}
+
+
+def compact_figure(figure):
+    """Copy of a figure dict with typed numeric arrays and shared templates by name"""
+    figure = dict(figure)
+    figure['data'] = [_compact_trace(trace) for trace in figure.get('data', [])]
+    if figure.get('frames'):
+        figure['frames'] = [dict(frame, data=[_compact_trace(t) for t in frame.get('data', [])])
+                            for frame in figure['frames']]
+    layout = figure.get('layout')
+    if isinstance(layout, dict) and isinstance(layout.get('template'), dict):
+        for name, template in _TEMPLATES.items():
+            if layout['template'] == template:
+                figure['layout'] = dict(layout, template=name)
+                break
+    return figure
+
+
+def _figure_dict(figure):
+    # to_plotly_json() deep-copies the figure, template included. The dict is only read
+    # here (compact_figure copies what it rewrites), so plotly's own dicts do.
+    out = {'data': figure._data, 'layout': figure._layout}
+    frames = [frame._props for frame in figure._frame_objs]
+    if frames:
+        out['frames'] = frames
+    return out
+
+
+def _compact(obj):
+    if isinstance(obj, BaseFigure):
+        return compact_figure(_figure_dict(obj))
+    if isinstance(obj, (list, tuple)):
+        return [_compact(o) for o in obj]
+    if isinstance(obj, dict) and 'data' in obj and 'layout' in obj:
+        return compact_figure(obj)
+    return obj
+
+
+def _plotly_json(obj):
+    if hasattr(obj, 'to_plotly_json'):
+        return obj.to_plotly_json()
+    raise TypeError
+
+
+def dumps(outputs):
+    """JSON for callback outputs, with every figure among them in compact form"""
+    compact = _compact(outputs)
+    if orjson:
+        try:
+            return orjson.dumps(compact, default=_plotly_json,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            pass  # a type only plotly's encoder knows (pandas objects, ...)
+    return to_json_plotly(compact, engine='json')
+
+
+def loads(payload):
+    return orjson.loads(payload) if orjson else json.loads(payload)
+
+
+def templates_script():
+    """(JavaScript defining the shared templates, its version tag)"""
+    body = f'window.dashFigureTemplates = {to_json_plotly(_TEMPLATES, engine="json")};\n'.encode()
+    return body, hashlib.sha1(body).hexdigest()[:16]
+
+
+def _encode(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _accepted_encoding(accept_encoding):
+    accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+    if brotli and 'br' in accepted:
+        return 'br'
+    return 'gzip' if 'gzip' in accepted else None
+
+
+def install_compression(server):
+    """Compress text and JSON responses of a Flask server (brotli, else gzip)
+
+    Register it before any other after_request hook that reads response bodies:
+    Flask runs them in reverse order, so this one then sees the finished body.
+    """
+    static_cache = OrderedDict()
+    lock = threading.Lock()
+
+    @server.after_request
+    def _compress(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = _accepted_encoding(request.headers.get('Accept-Encoding', ''))
+        data = response.get_data()
+        if encoding is None or len(data) < MIN_COMPRESS_BYTES:
+            return response
+        etag = response.get_etag()[0]
+        static = etag or (response.cache_control.max_age or 0) >= STATIC_MAX_AGE
+        key = (request.full_path, etag, encoding)
+        with lock:
+            body = static_cache.get(key) if static else None
+        if body is None:
+            body = _encode(data, encoding)
+            if static:
+                with lock:
+                    static_cache[key] = body
+                    while len(static_cache) > STATIC_CACHE_ENTRIES:
+                        static_cache.popitem(last=False)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,190 @@
+"""Versioned JSON API over the rollup cube, for reporting tools
+
+    GET  /api/v1                              profiles and their metrics
+    GET  /api/v1/<profile>?state=&district=   totals for a selection and the rows one level down
+    GET  /api/v1/scores                       composite scores, ranked
+    GET  /api/v1/top-districts?metric=&state=&k=&order=desc
+    POST /api/v1/batch  {"queries": [{"state": ..., "district": ..., "metric": ...} or [state, district, metric], ...]}
+
+GET responses are cached per data version and carry that version as a (weak) ETag, so
+a client revalidating with If-None-Match gets a 304 until the data is reloaded. A batch
+is answered with one vectorized lookup per metric and level. Metrics are column names,
+qualified by profile (e.g. emp.total_msmes) where more than one profile has them.
+"""
+import numpy as np
+import pandas as pd
+from flask import Blueprint, jsonify, request
+
+from response_encoding import dumps, loads
+from rollups import select_rollup
+
+API_VERSION = 'v1'
+API_PREFIX = f'/api/{API_VERSION}'
+PROFILES = ['loc', 'soc', 'emp', 'ind', 'score']
+MAX_BATCH = 100_000
+MAX_TOP_K = 1000
+
+
+def profile_metrics(cube):
+    """profile -> metric names, in the order metrics are resolved"""
+    return {p: list(cube[p]['state'].columns) for p in PROFILES if p in cube}
+
+
+def resolve_metric(cube, name):
+    """(profile, column) for a metric name, 'column' or 'profile.column'; None if unknown"""
+    profile, _, column = str(name).rpartition('.')
+    for p in ([profile] if profile else PROFILES):
+        levels = cube.get(p)
+        if levels is not None and column in levels['state'].columns:
+            return p, column
+    return None
+
+
+def _records(frame):
+    return frame.reset_index().to_dict('records')
+
+
+def summary(snap, profile, state=None, district=None):
+    """Totals of a profile for a selection, with its states (national) or districts (state)"""
+    view = select_rollup(snap.rollups, profile, state, district)
+    level = 'district' if district else 'state' if state else 'national'
+    rows = {'national': view.states, 'state': view.districts}.get(level)
+    return {'version': snap.version, 'profile': profile, 'level': level, 'state': state, 'district': district,
+            'totals': view.totals.to_dict(), 'rows': _records(rows) if rows is not None else []}
+
+
+def scores(snap):
+    """Every state's pillar and final scores with its rank and category"""
+    score = snap.rollups['score']
+    states = score['state'].copy()
+    states['Rank'] = states['Final_MSME_Score'].rank(ascending=False, method='min').astype('int64')
+    return {'version': snap.version, 'national': score['national'].to_dict(),
+            'states': _records(states.sort_values('Rank'))}
+
+
+def top_districts(snap, profile, column, state=None, k=10, ascending=False):
+    """The k districts with the highest (or lowest) value of a metric, nationally or in a state"""
+    top = snap.indexes['ranks'].top(profile, column, k, state, ascending=ascending)[column]
+    return {'version': snap.version, 'metric': f'{profile}.{column}', 'state': state,
+            'order': 'asc' if ascending else 'desc',
+            'rows': [{'State': s, 'District': d, 'value': v} for (s, d), v in top.items()]}
+
+
+def query_frame(queries):
+    """DataFrame of batch queries given as {state, district, metric} objects or 3-item lists"""
+    frame = pd.DataFrame.from_records(queries, columns=['state', 'district', 'metric'])
+    return frame.replace({'': None})
+
+
+def unknown_metrics(cube, frame):
+    return sorted(str(m) for m in frame['metric'].unique() if resolve_metric(cube, m) is None)
+
+
+def batch_lookup(cube, frame):
+    """Value of each (state, district, metric) row of a query_frame; None where there's no data
+
+    A query without a state is national and one without a district is state-level. A
+    district is only looked up within its state (district names repeat across states).
+    """
+    values = np.full(len(frame), None, dtype=object)
+    for metric, group in frame.groupby('metric', sort=False, dropna=False):
+        profile, column = resolve_metric(cube, metric)
+        levels = cube[profile]
+        positions = group.index.to_numpy()
+        has_state = group['state'].notna().to_numpy()
+        has_district = group['district'].notna().to_numpy()
+
+        in_district = has_state & has_district
+        if in_district.any() and 'district' in levels:
+            where = pd.MultiIndex.from_arrays([group['state'][in_district], group['district'][in_district]])
+            values[positions[in_district]] = levels['district'][column].reindex(where).to_numpy()
+        in_state = has_state & ~has_district
+        if in_state.any():
+            values[positions[in_state]] = levels['state'][column].reindex(group['state'][in_state]).to_numpy()
+        national = ~has_state & ~has_district
+        if national.any():
+            values[positions[national]] = levels['national'].get(column)
+    values[pd.isna(values)] = None
+    return values.tolist()
+
+
+def install_rollup_api(server, snapshots, cache, prefix=API_PREFIX):
+    """Register the API on a Flask server; GET payloads are kept in cache (a FigureCache)"""
+    api = Blueprint('rollup_api', __name__, url_prefix=prefix)
+
+    def cached(name, snap, build):
+        """build(snap) as JSON, or a 304 if the client already has this data version"""
+        etag = f'{API_VERSION}-{snap.version}'
+        if request.if_none_match.contains_weak(etag):
+            response = server.response_class(status=304)
+        else:
+            key = (f'api:{name}', snap.version, tuple(sorted(request.args.items(multi=True))))
+            response = server.response_class(cache.payload(key, lambda: build(snap)),
+                                             mimetype='application/json')
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'  # always revalidate; a 304 is cheap
+        return response
+
+    @api.route('')
+    def index():
+        return cached('index', snapshots.current(), lambda snap: {
+            'version': snap.version, 'built': snap.built, 'profiles': profile_metrics(snap.rollups)})
+
+    @api.route('/scores')
+    def state_scores():
+        snap = snapshots.current()
+        if 'score' not in snap.rollups:
+            return jsonify(error="No composite scores loaded"), 404
+        return cached('scores', snap, scores)
+
+    @api.route('/top-districts')
+    def top():
+        snap = snapshots.current()
+        cube = snap.rollups
+        resolved = resolve_metric(cube, request.args.get('metric', 'loc.msme_count'))
+        if resolved is None or 'district' not in cube[resolved[0]]:
+            return jsonify(error="Unknown district metric"), 400
+        state = request.args.get('state') or None
+        if state and state not in cube[resolved[0]]['state'].index:
+            return jsonify(error="Unknown state"), 404
+        k = request.args.get('k', 10, type=int)
+        if not 1 <= k <= MAX_TOP_K:
+            return jsonify(error=f"k must be between 1 and {MAX_TOP_K}"), 400
+        ascending = request.args.get('order', 'desc') == 'asc'
+        return cached('top-districts', snap, lambda snap: top_districts(snap, *resolved, state, k, ascending))
+
+    @api.route('/<profile>')
+    def profile_summary(profile):
+        snap = snapshots.current()
+        levels = snap.rollups.get(profile)
+        if levels is None or 'district' not in levels:
+            return jsonify(error="Unknown profile"), 404
+        state = request.args.get('state') or None
+        district = request.args.get('district') or None
+        if district and not state:
+            return jsonify(error="A district needs its state"), 400
+        if (state and state not in levels['state'].index) or \
+                (district and (state, district) not in levels['district'].index):
+            return jsonify(error="Unknown state or district"), 404
+        return cached(profile, snap, lambda snap: summary(snap, profile, state, district))
+
+    @api.route('/batch', methods=['POST'])
+    def batch():
+        try:
+            queries = loads(request.get_data()).get('queries')
+            if not isinstance(queries, list):
+                raise TypeError('queries')
+            frame = query_frame(queries)
+        except (AttributeError, TypeError, ValueError):
+            return jsonify(error='Expected {"queries": [{"state", "district", "metric"}, ...]}'), 400
+        if len(frame) > MAX_BATCH:
+            return jsonify(error=f"At most {MAX_BATCH} queries per batch"), 400
+        snap = snapshots.current()
+        unknown = unknown_metrics(snap.rollups, frame)
+        if unknown:
+            return jsonify(error="Unknown metrics", metrics=unknown), 400
+        body = dumps({'version': snap.version, 'values': batch_lookup(snap.rollups, frame)})
+        return server.response_class(body, mimetype='application/json')
+
+    server.register_blueprint(api)
+    return api
@@ -0,0 +1,258 @@
+"""Precomputed national -> state -> district rollups for the dashboard views"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Additive measures per profile. Everything else (ratios, means) is derived
+# from these sums plus the row count, so any level can be rebuilt from the one below.
+ROLLUP_MEASURES = {
+    'loc': ['msme_count'],
+    'soc': ['total_msmes', 'sc_count', 'st_count', 'obc_count', 'general_count',
+            'female_owned', 'male_owned', 'ph_count'],
+    'emp': ['total_msmes', 'total_employment', 'total_investment',
+            'micro_count', 'small_count', 'medium_count',
+            'micro_employment', 'small_employment', 'medium_employment'],
+    'ind': ['manufacturing_pct', 'services_pct', 'industry_diversity_index'],
+}
+
+# Columns averaged over profile rows (industry percentages are per-district shares)
+ROLLUP_MEANS = {
+    'ind': ['manufacturing_pct', 'services_pct', 'industry_diversity_index'],
+}
+
+SCORE_COLUMNS = ['Scale_Score', 'Social_Score', 'Employment_Score', 'Industry_Score', 'Final_MSME_Score']
+CATEGORY_ORDER = ['Nascent', 'Emerging', 'Developing', 'Advanced']
+
+RollupView = namedtuple('RollupView', ['states', 'districts', 'totals'])
+
+
+def _safe_ratio(num, den, scale=1.0):
+    """Element-wise num/den that yields 0 instead of inf/NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.asarray(num, dtype='float64') * scale / np.asarray(den, dtype='float64')
+    out[~np.isfinite(out)] = 0.0
+    return out
+
+
+def _add_ratios(profile, agg):
+    """Attach derived ratio columns computed from the summed measures"""
+    if profile == 'soc':
+        agg['women_pct'] = _safe_ratio(agg['female_owned'], agg['total_msmes'], 100)
+        agg['sc_st_pct'] = _safe_ratio(agg['sc_count'] + agg['st_count'], agg['total_msmes'], 100)
+    elif profile == 'emp':
+        agg['avg_employment'] = _safe_ratio(agg['total_employment'], agg['total_msmes'])
+        agg['employment_per_investment'] = _safe_ratio(agg['total_employment'], agg['total_investment'])
+        agg['investment_per_job'] = _safe_ratio(agg['total_investment'], agg['total_employment'])
+    for col in ROLLUP_MEANS.get(profile, []):
+        agg[f'{col}_mean'] = _safe_ratio(agg[col], agg['rows'])
+    return agg
+
+
+def _totals(profile, frame):
+    """Collapse a rollup frame into a single totals row"""
+    measures = [c for c in ROLLUP_MEASURES[profile] if c in frame.columns]
+    sums = frame[measures + ['rows']].sum().to_frame().T
+    sums['districts'] = frame['districts'].sum() if 'districts' in frame else len(frame)
+    return _add_ratios(profile, sums).iloc[0]
+
+
+def _build_profile(profile, df):
+    """Build the district, state and national levels for one profile frame"""
+    measures = [c for c in ROLLUP_MEASURES[profile] if c in df.columns]
+    if df.empty or not measures or 'District' not in df.columns:
+        return None
+
+    grouped = df.groupby(['State', 'District'], sort=True)
+    district = grouped[measures].sum()
+    district['rows'] = grouped.size()
+    district['districts'] = 1
+    district = _add_ratios(profile, district)
+
+    by_state = df.groupby('State', sort=True)
+    state = by_state[measures].sum()
+    state['rows'] = by_state.size()
+    state['districts'] = by_state['District'].nunique()
+    state = _add_ratios(profile, state)
+
+    national = _totals(profile, state)
+    national['districts'] = df['District'].nunique()
+
+    levels = {'district': district, 'state': state, 'national': national}
+    if profile == 'loc' and 'Dic_Name' in df.columns:
+        levels['dic'] = df.groupby(['State', 'District', 'Dic_Name'], sort=True)[measures].sum()
+    return levels
+
+
+def _build_score(df):
+    """Index the (already state-level) composite scores and precompute category stats"""
+    if df.empty:
+        return None
+    state = df.set_index('State').sort_index()
+    category_stats = state.groupby('Category')['Final_MSME_Score'].agg(['mean', 'count']).reset_index()
+    category_stats.columns = ['Category', 'Avg_Score', 'Count']
+    category_stats['Category'] = pd.Categorical(category_stats['Category'], categories=CATEGORY_ORDER, ordered=True)
+    national = state[[c for c in SCORE_COLUMNS if c in state.columns]].mean()
+    national['rows'] = len(state)
+    return {
+        'state': state,
+        'national': national,
+        'category_counts': state['Category'].value_counts(),
+        'category_stats': category_stats.sort_values('Category'),
+    }
+
+
+def build_rollup_cube(df_loc, df_soc, df_emp, df_ind, df_score):
+    """Build every rollup level once at load time"""
+    cube = {
+        'loc': _build_profile('loc', df_loc),
+        'soc': _build_profile('soc', df_soc),
+        'emp': _build_profile('emp', df_emp),
+        'ind': _build_profile('ind', df_ind),
+        'score': _build_score(df_score),
+    }
+    return {k: v for k, v in cube.items() if v is not None}
+
+
+def _xs(frame, state, district):
+    """Slice a (State, District)-indexed frame without scanning it"""
+    try:
+        if state:
+            frame = frame.xs(state, level='State', drop_level=False)
+        if district:
+            frame = frame.xs(district, level='District', drop_level=False)
+    except KeyError:
+        return frame.iloc[0:0]
+    return frame
+
+
+def select_rollup(cube, profile, state=None, district=None):
+    """Return the state rows, district rows and totals for a dropdown selection"""
+    levels = cube.get(profile)
+    if levels is None:
+        empty = pd.DataFrame()
+        return RollupView(empty, empty, None)
+
+    districts = _xs(levels['district'], state, district)
+    if districts.empty:
+        return RollupView(districts.droplevel('District'), districts, None)
+
+    if district:
+        states = districts.droplevel('District')
+        totals = states.iloc[0] if len(states) == 1 else _totals(profile, states)
+    elif state:
+        states = levels['state'].loc[[state]]
+        totals = states.iloc[0]
+    else:
+        states = levels['state']
+        totals = levels['national']
+    return RollupView(states, districts, totals)
+
+
+def select_dic(cube, state=None, district=None):
+    """DIC-level MSME counts for a selection (location profile only)"""
+    dic = cube.get('loc', {}).get('dic')
+    if dic is None:
+        return pd.DataFrame()
+    return _xs(dic, state, district).reset_index()
+
+
+# Sorted district/state orderings of one metric: positions in the rollup frame grouped
+# in blocks (one per state, or a single national block), and the row count of each
+_Ordering = namedtuple('_Ordering', ['order', 'starts', 'sizes'])
+
+
+def _ordering(values, blocks, ascending):
+    """Positions sorted by value within each block, NaN last and ties in frame order"""
+    values = np.asarray(values, dtype='float64')
+    missing = np.isnan(values)
+    key = np.where(missing, np.inf, values if ascending else -values)
+    order = np.lexsort((key, blocks)).astype('int32')
+    counts = np.bincount(blocks, minlength=blocks.max() + 1 if len(blocks) else 0)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype('int64')
+    return _Ordering(order, starts, counts.astype('int64'))
+
+
+class RankIndex:
+    """Every numeric rollup metric pre-sorted, so top-N lookups are slices instead of sorts
+
+    Built once per data version. For each profile and metric it keeps the states in
+    order, the districts in national order and the districts in order within each
+    state, both descending and ascending. top() picks the same rows as nlargest/nsmallest
+    (keep='first') on the selection's rollup frame, NaN rows last once the others run
+    out; ties are listed in frame order.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube
+        self._orderings = {}
+        self._state_blocks = {}
+        for profile, levels in cube.items():
+            if not isinstance(levels.get('state'), pd.DataFrame):
+                continue
+            frames = {'state': levels['state']}
+            if 'district' in levels:
+                frames['district'] = levels['district']
+                states = levels['district'].index.get_level_values('State')
+                codes, uniques = pd.factorize(states)  # frame is sorted, so codes ascend
+                self._state_blocks[profile] = ({s: i for i, s in enumerate(uniques)}, codes)
+            for level, frame in frames.items():
+                national = np.zeros(len(frame), dtype='int64')
+                for metric in frame.select_dtypes('number').columns:
+                    for ascending in (False, True):
+                        key = (profile, level, metric, ascending)
+                        self._orderings[key + (False,)] = _ordering(frame[metric], national, ascending)
+                        if level == 'district':
+                            blocks = self._state_blocks[profile][1]
+                            self._orderings[key + (True,)] = _ordering(frame[metric], blocks, ascending)
+
+    def top(self, profile, metric, n, state=None, district=None, level='district', ascending=False):
+        """The n rows of a profile's district (or state) rollup with the highest metric in a selection"""
+        levels = self.cube.get(profile)
+        if levels is None:
+            return pd.DataFrame()
+        if district or (state and level == 'state'):
+            # At most one row in scope: nothing to rank
+            if level == 'state' and not district:
+                rows = levels['state'].loc[levels['state'].index == state]
+            else:
+                view = select_rollup(self.cube, profile, state, district)
+                rows = view.districts if level == 'district' else view.states
+            return rows.nsmallest(n, metric) if ascending else rows.nlargest(n, metric)
+
+        frame = levels[level]
+        by_state = level == 'district' and state is not None
+        ordering = self._orderings[(profile, level, metric, ascending, by_state)]
+        block = self._state_blocks[profile][0].get(state) if by_state else 0
+        if block is None or block >= len(ordering.starts):
+            return frame.iloc[0:0]
+        start = ordering.starts[block]
+        return frame.iloc[ordering.order[start:start + min(n, ordering.sizes[block])]]
+
+
+def _percentile(values):
+    """Share of the other non-NaN values that are lower or equal (ties take the highest rank)"""
+    ranks = values.rank(method='max')
+    count = values.count()
+    return (ranks - 1) / (count - 1) if count > 1 else ranks.where(ranks.isna(), 1.0)
+
+
+def build_state_features(cube):
+    """One row per state joining every profile's state-level metrics, with percentile ranks
+
+    Columns keep their rollup names; a name already taken by an earlier profile is
+    qualified by its own (emp.total_msmes). '<column>_percentile' ranks the states
+    nationally, so a value is at or above the q quantile exactly where it is >= q.
+    """
+    if 'loc' not in cube:
+        return pd.DataFrame()
+    features = cube['loc']['state'][[]]
+    for profile in ['loc', 'soc', 'emp', 'ind', 'score']:
+        levels = cube.get(profile)
+        if levels is None:
+            continue
+        metrics = levels['state'].select_dtypes('number').drop(columns=['rows', 'districts'], errors='ignore')
+        metrics = metrics.rename(columns=lambda c: f'{profile}.{c}' if c in features.columns else c)
+        features = features.join(metrics)
+    percentiles = features.apply(_percentile).add_suffix('_percentile')
+    return features.join(percentiles)
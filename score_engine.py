@@ -0,0 +1,107 @@
+"""Composite MSME development scores as array operations, with what-if weights and input changes"""
+import numpy as np
+import pandas as pd
+
+# State-level totals the pillars are computed from
+SCORE_INPUTS = ['total_msmes', 'female_owned', 'sc_count', 'st_count',
+                'total_investment', 'total_employment', 'nic_codes']
+# Owner-group inputs are adjusted in percentage points of the state's MSMEs, the rest relatively
+SHARE_INPUTS = ['female_owned', 'sc_count', 'st_count']
+INPUT_LABELS = {
+    'total_msmes': 'Registered MSMEs',
+    'female_owned': 'Female ownership',
+    'sc_count': 'SC ownership',
+    'st_count': 'ST ownership',
+    'total_investment': 'Investment',
+    'total_employment': 'Employment',
+    'nic_codes': 'Distinct NIC codes',
+}
+SCORE_PILLARS = ['Scale_Score', 'Social_Score', 'Employment_Score', 'Industry_Score']
+CATEGORY_CUTS = [25, 50, 75]
+CATEGORY_LABELS = ['Nascent', 'Emerging', 'Developing', 'Advanced']
+
+
+def _minmax(values):
+    """Min-max normalise each row of a 2-D array to 0-100 (all zeros where a row is flat)"""
+    low = values.min(axis=1, keepdims=True)
+    span = values.max(axis=1, keepdims=True) - low
+    ok = np.isfinite(span) & (span > 0)
+    return np.where(ok, (values - low) / np.where(ok, span, 1) * 100, 0.0)
+
+
+class ScoreEngine:
+    """Pillar and final scores for every state from one inputs matrix
+
+    Scale and Employment use log1p(total) so one large state doesn't flatten the rest;
+    Social is the women + SC/ST share; Industry is the count of distinct NIC codes.
+    Each pillar is min-max normalised to 0-100 and the final score is their weighted
+    mean (equal weights reproduce the offline composite_score.csv). A scenario is a
+    handful of array operations over the states and takes a few milliseconds.
+    """
+
+    def __init__(self, states):
+        self.states = np.asarray(states.index, dtype=object)
+        self._position = {s: i for i, s in enumerate(self.states)}
+        self.inputs = states.reindex(columns=SCORE_INPUTS).fillna(0).to_numpy(dtype='float64').T
+        self.baseline = self.score()
+
+    def adjusted_inputs(self, adjustments=()):
+        """Inputs with each {'state', 'input', 'change_pct'} adjustment applied
+
+        "+10 female_owned" adds 10% of the state's MSMEs to its female-owned count
+        (capped at the total); "+10 total_investment" raises investment by 10%.
+        """
+        inputs = self.inputs
+        for adj in adjustments or ():
+            row = SCORE_INPUTS.index(adj['input']) if adj.get('input') in SCORE_INPUTS else None
+            col = self._position.get(adj.get('state'))
+            if row is None or col is None:
+                continue
+            if inputs is self.inputs:
+                inputs = inputs.copy()
+            change = float(adj.get('change_pct') or 0) / 100
+            if adj['input'] in SHARE_INPUTS:
+                total = inputs[0, col]
+                inputs[row, col] = min(max(inputs[row, col] + change * total, 0), total)
+            else:
+                inputs[row, col] = max(inputs[row, col] * (1 + change), 0)
+        return inputs
+
+    @staticmethod
+    def pillars(inputs):
+        """4 x states array of pillar scores, rounded to 2 decimals"""
+        total, female, sc, st, investment, employment, nic_codes = inputs
+        social = np.divide(female + sc + st, total, out=np.zeros_like(total), where=total > 0)
+        raw = np.vstack([np.log1p(investment), social, np.log1p(employment), nic_codes])
+        return np.round(_minmax(raw), 2)
+
+    def score(self, weights=None, adjustments=()):
+        """Scores, category and rank of every state for a set of pillar weights and input changes"""
+        pillars = self.pillars(self.adjusted_inputs(adjustments))
+        weights = np.ones(len(SCORE_PILLARS)) if weights is None else np.asarray(weights, dtype='float64')
+        if np.all(weights == weights[0]):
+            # Equal (or all-zero) weights: the plain mean, exactly as the offline scores
+            final = pillars.mean(axis=0)
+        else:
+            final = np.average(pillars, axis=0, weights=weights)
+        final = np.round(final, 2)
+        out = pd.DataFrame(pillars.T, index=pd.Index(self.states, name='State'), columns=SCORE_PILLARS)
+        out['Final_MSME_Score'] = final
+        out['Category'] = np.asarray(CATEGORY_LABELS, dtype=object)[np.searchsorted(CATEGORY_CUTS, final, side='right')]
+        out['Rank'] = pd.Series(final, index=out.index).rank(ascending=False, method='min').astype('int64')
+        return out
+
+    def compare(self, weights=None, adjustments=()):
+        """A scenario's scores next to the baseline, with rank and category changes"""
+        scenario = self.score(weights, adjustments)
+        base = self.baseline
+        scenario['Baseline_Score'] = base['Final_MSME_Score']
+        scenario['Score_Change'] = (scenario['Final_MSME_Score'] - base['Final_MSME_Score']).round(2)
+        scenario['Rank_Change'] = base['Rank'] - scenario['Rank']
+        scenario['Baseline_Category'] = base['Category']
+        return scenario.sort_values(['Rank', 'State'], kind='mergesort')
+
+
+def composite_scores(states):
+    """Composite development score per state from state-level totals (see ScoreEngine)"""
+    return ScoreEngine(states).baseline.drop(columns='Rank')
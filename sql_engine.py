@@ -0,0 +1,169 @@
+"""Read-only SQL over the master registrations and the profile tables, in process (DuckDB)
+
+The tables are registered with DuckDB as they already are in memory: the master is the
+memory-mapped Arrow table, scanned in place with projection and filter pushdown, and
+the profiles are the snapshot's pandas frames. Nothing is copied or loaded twice.
+
+    master                      msme_merged.csv with totalemp/investmentcost as numbers
+                                and the two dates as DATEs (master_raw: all text)
+    location_profile, social_profile, employment_profile, industry_profile,
+    composite_score, sector_profile
+
+A query must be a single SELECT; files, COPY and settings are disabled for the whole
+database. It is interrupted after QUERY_TIMEOUT_SECONDS and returns at most MAX_ROWS
+rows (the limit is pushed into the query). Results are cached per data version by the
+caller (see cached_query).
+"""
+import threading
+import time
+
+from flask import Blueprint, jsonify, request
+
+from response_encoding import loads
+from rollup_api import API_PREFIX
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+QUERY_TIMEOUT_SECONDS = 10
+MAX_ROWS = 10_000
+MEMORY_LIMIT = '2GB'
+MASTER_NUMBERS = ['totalemp', 'investmentcost']
+MASTER_DATES = ['commmencedate', 'registrationdate']  # dd-mm-yyyy
+EXAMPLE_QUERY = """SELECT state, enterprisetype, count(*) AS msmes, sum(totalemp) AS employment
+FROM master
+WHERE gender = 'Female'
+GROUP BY ALL
+ORDER BY msmes DESC"""
+
+
+class QueryError(Exception):
+    """A query that was rejected, failed or timed out"""
+
+
+def _master_view(columns):
+    select = []
+    for col in columns:
+        name = f'"{col}"'
+        if col in MASTER_NUMBERS:
+            select.append(f'TRY_CAST(trim({name}) AS DOUBLE) AS {name}')
+        elif col in MASTER_DATES:
+            select.append(f"CAST(TRY_STRPTIME(trim({name}), '%d-%m-%Y') AS DATE) AS {name}")
+        else:
+            select.append(name)
+    return f'CREATE TEMP VIEW master AS SELECT {", ".join(select)} FROM master_raw'
+
+
+class SqlEngine:
+    """An in-memory DuckDB database over one snapshot's tables
+
+    tables maps a table name to a pandas frame or Arrow table. Every serving thread
+    gets its own connection (registered tables are per connection), opened on first use.
+    """
+
+    def __init__(self, tables, master=None):
+        self.tables = {name: t for name, t in tables.items() if t is not None and len(t.columns)}
+        self.master = master if master is not None and master.num_columns else None
+        self._db = duckdb.connect(':memory:', config={
+            'enable_external_access': False, 'memory_limit': MEMORY_LIMIT, 'lock_configuration': True})
+        self._local = threading.local()
+
+    def _connection(self):
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = self._db.cursor()
+            for name, table in self.tables.items():
+                con.register(name, table)
+            if self.master is not None:
+                con.register('master_raw', self.master)
+                con.execute(_master_view(self.master.column_names))
+            self._local.con = con
+        return con
+
+    def schema(self):
+        """table -> [(column, type)]"""
+        rows = self._connection().execute(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            "ORDER BY table_name, ordinal_position").fetchall()
+        schema = {}
+        for table, column, dtype in rows:
+            schema.setdefault(table, []).append((column, dtype))
+        return schema
+
+    def query(self, sql, limit=MAX_ROWS):
+        """{'columns', 'rows', 'truncated', 'seconds'} of a single SELECT; raises QueryError"""
+        limit = max(1, min(int(limit), MAX_ROWS))
+        con = self._connection()
+        try:
+            statements = con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise QueryError(str(e)) from None
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise QueryError("Only a single SELECT statement is allowed")
+
+        timer = threading.Timer(QUERY_TIMEOUT_SECONDS, con.interrupt)
+        started = time.perf_counter()
+        timer.start()
+        try:
+            # On its own line, so a trailing comment can't swallow the limit
+            result = con.execute(f'SELECT * FROM ({statements[0].query}\n) AS q LIMIT {limit + 1}').arrow()
+        except duckdb.InterruptException:
+            raise QueryError(f"Query stopped after {QUERY_TIMEOUT_SECONDS} seconds") from None
+        except duckdb.Error as e:
+            raise QueryError(str(e)) from None
+        finally:
+            timer.cancel()
+        if hasattr(result, 'read_all'):
+            result = result.read_all()  # a RecordBatchReader in newer DuckDB versions
+        seconds = time.perf_counter() - started
+        truncated = result.num_rows > limit
+        result = result.slice(0, limit)
+        columns = [col.to_pylist() for col in result.columns]
+        return {'columns': result.column_names, 'rows': [list(row) for row in zip(*columns)],
+                'truncated': truncated, 'seconds': round(seconds, 4)}
+
+
+def build_sql_engine(tables, master=None):
+    """SqlEngine over the tables, or None when duckdb isn't installed"""
+    return SqlEngine(tables, master) if duckdb else None
+
+
+def cached_query(cache, snap, sql, limit=MAX_ROWS):
+    """A query's result as JSON, kept in cache (a FigureCache) per data version; raises QueryError"""
+    return cache.payload(('sql', sql.strip(), limit),
+                         lambda: dict(snap.indexes['sql'].query(sql, limit), version=snap.version))
+
+
+def install_sql_api(server, snapshots, cache, prefix=API_PREFIX):
+    """POST {prefix}/sql {"sql": ..., "limit": ...} and GET {prefix}/sql/tables; results kept in cache"""
+    api = Blueprint('sql_api', __name__, url_prefix=f'{prefix}/sql')
+
+    @api.route('/tables')
+    def tables():
+        snap = snapshots.current()
+        if snap.indexes.get('sql') is None:
+            return jsonify(error="SQL engine unavailable (install duckdb)"), 503
+        return jsonify(version=snap.version, tables=snap.indexes['sql'].schema())
+
+    @api.route('', methods=['POST'])
+    def run():
+        snap = snapshots.current()
+        if snap.indexes.get('sql') is None:
+            return jsonify(error="SQL engine unavailable (install duckdb)"), 503
+        try:
+            body = loads(request.get_data())
+            query, limit = body['sql'], int(body.get('limit', MAX_ROWS))
+            if not isinstance(query, str):
+                raise TypeError('sql')
+        except (KeyError, AttributeError, TypeError, ValueError):
+            return jsonify(error='Expected {"sql": "SELECT ...", "limit": 1000}'), 400
+        try:
+            payload = cached_query(cache, snap, query, max(1, min(limit, MAX_ROWS)))
+        except QueryError as e:
+            return jsonify(error=str(e)), 400
+        return server.response_class(payload, mimetype='application/json')
+
+    server.register_blueprint(api)
+    return api
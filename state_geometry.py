@@ -0,0 +1,98 @@
+"""State boundaries from india_states.geojson, simplified and served once as a cacheable asset
+
+Each level is the geometry simplified (Douglas-Peucker) at one tolerance and quantized
+to a fixed coordinate precision, then serialized once with its ETag and a gzip copy.
+Figures reference a level by URL, so the browser downloads it once and every later
+response only carries per-state values.
+"""
+import gzip
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+GEOJSON_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'india_states.geojson')
+FEATURE_ID_KEY = 'properties.NAME_1'
+
+# level -> (simplification tolerance in degrees, decimal places kept)
+LEVELS = {
+    'full': (0.0, 5),
+    'medium': (0.01, 3),
+    'low': (0.05, 2),
+}
+
+
+GeometryAsset = namedtuple('GeometryAsset', ['body', 'gzip_body', 'etag'])
+
+
+def level_for_zoom(zoom):
+    """Coarsest level that still looks right at a mapbox zoom"""
+    if zoom >= 5.5:
+        return 'full'
+    return 'medium' if zoom >= 4 else 'low'
+
+
+def simplify_ring(points, tolerance):
+    """Douglas-Peucker simplification of one closed ring (n x 2 array), keeping at least 4 points"""
+    if tolerance <= 0 or len(points) <= 4:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = points[end] - points[start]
+        rel = points[start + 1:end] - points[start]
+        norm = np.hypot(*seg)
+        if norm == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack += [(start, mid), (mid, end)]
+    if keep.sum() < 4:
+        # Too small for the tolerance: keep a minimal closed outline instead of dropping it
+        keep[np.linspace(0, len(points) - 1, 4).astype(int)] = True
+    return points[keep]
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def simplify_geojson(geojson, tolerance, decimals):
+    """Copy of a FeatureCollection with every ring simplified and its coordinates rounded"""
+    features = []
+    for feature in geojson['features']:
+        polygons = []
+        for polygon in _polygons(feature['geometry']):
+            rings = [np.round(simplify_ring(np.asarray(ring, dtype='float64'), tolerance), decimals).tolist()
+                     for ring in polygon]
+            polygons.append(rings)
+        geometry = ({'type': 'Polygon', 'coordinates': polygons[0]} if len(polygons) == 1
+                    else {'type': 'MultiPolygon', 'coordinates': polygons})
+        features.append({'type': 'Feature', 'properties': feature['properties'], 'geometry': geometry})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_assets(path=GEOJSON_FILE):
+    """Serialize every simplification level once: level -> GeometryAsset"""
+    with open(path) as f:
+        geojson = json.load(f)
+    assets = {}
+    for level, (tolerance, decimals) in LEVELS.items():
+        body = json.dumps(simplify_geojson(geojson, tolerance, decimals), separators=(',', ':')).encode()
+        etag = hashlib.sha1(body).hexdigest()[:16]
+        assets[level] = GeometryAsset(body, gzip.compress(body, compresslevel=9, mtime=0), etag)
+    return assets
@@ -0,0 +1,237 @@
+"""Synthetic national-size msme_merged.csv and matching profile CSVs, for benchmarking
+
+Registrations are skewed the way the real data is: a few large states hold most of
+them, and within a state a few districts dominate. NIC fields carry one to five
+codes in the " 1) 90001; 2) 90002" layout, and the categorical columns follow the
+shipped sample's distributions. Rows are generated and written in chunks with Arrow
+compute, so memory stays flat at any size. The profile tables are aggregated from the
+same arrays and laid out by ProfileAggregator.profiles, exactly like the offline ones.
+
+    python synthetic_data.py 1000000 data/synthetic-1m
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from india_map import STATE_COORDS
+from profile_aggregator import (DISTRICT_KEYS, LOCATION_KEYS, MASTER_FLAGS, MEASURES, ProfileAggregator)
+
+CHUNK_ROWS = 1_000_000
+PINS_PER_DISTRICT = 8
+
+# The exported file's header has a stray empty cell after 'ph' (see master_columns)
+MASTER_HEADER = ['aid', 'enterprisename', 'socialcategory', 'gender', 'ph', '', 'organisationtype',
+                 'plantlocation', 'address', 'state', 'district', 'pincode', 'commmencedate',
+                 'majoractivity', 'enterprisetype', 'nic5digitcode', 'totalemp', 'investmentcost',
+                 'dic_name', 'registrationdate', 'lg_dist_code']
+
+# States from most to fewest registrations; shares fall off as 1 / rank
+STATE_ORDER = [
+    'MAHARASHTRA', 'TAMIL NADU', 'UTTAR PRADESH', 'RAJASTHAN', 'GUJARAT', 'KARNATAKA', 'MADHYA PRADESH',
+    'WEST BENGAL', 'BIHAR', 'TELANGANA', 'ANDHRA PRADESH', 'KERALA', 'HARYANA', 'PUNJAB', 'ODISHA', 'DELHI',
+    'JHARKHAND', 'ASSAM', 'CHHATTISGARH', 'UTTARAKHAND', 'HIMACHAL PRADESH', 'JAMMU AND KASHMIR', 'GOA',
+    'TRIPURA', 'MANIPUR', 'CHANDIGARH', 'PUDUCHERRY', 'MEGHALAYA', 'NAGALAND', 'DADAR AND NAGAR HAVELI',
+    'DAMAN AND DIU', 'MIZORAM', 'ARUNACHAL PRADESH', 'SIKKIM', 'LAKSHADWEEP',
+]
+# column -> {value: probability}, from the shipped sample
+CATEGORIES = {
+    'socialcategory': {'General': 0.60, 'OBC': 0.21, 'ST': 0.12, 'SC': 0.07},
+    'gender': {'Male': 0.55, 'NA': 0.29, 'Female': 0.16},
+    'ph': {'No': 0.705, 'NA': 0.29, 'Yes': 0.005},
+    'organisationtype': {'Proprietary': 0.834, 'Private Limited Company': 0.063, 'Partnership': 0.06,
+                         'Public Limited Company': 0.009, 'Others': 0.009, 'Self Help Group': 0.009,
+                         'Co-Operative': 0.006, 'Hindu Undivided Family': 0.006, 'Society': 0.004,
+                         'Limited Liability Partnership': 0.004},
+    'majoractivity': {'Services': 0.55, 'Manufacturing': 0.45},
+    'enterprisetype': {'Micro': 0.95, 'Small': 0.045, 'Medium': 0.005},
+}
+# NIC 2-digit divisions -> weight; codes are the division plus three random digits
+NIC_DIVISIONS = {10: 6, 13: 4, 14: 6, 16: 2, 22: 2, 25: 4, 28: 2, 31: 2, 41: 2, 43: 3, 45: 4, 46: 8, 47: 16,
+                 49: 3, 52: 2, 55: 2, 56: 6, 62: 3, 63: 2, 69: 2, 73: 2, 74: 2, 82: 2, 85: 2, 86: 3, 90: 1,
+                 93: 2, 95: 4, 96: 7}
+NIC_CODE_POOL = 40  # distinct codes per division
+CODES_PER_FIELD = {1: 0.60, 2: 0.20, 3: 0.10, 4: 0.05, 5: 0.05}
+EMPLOYEES = {'Micro': (1.0, 0.8), 'Small': (3.0, 0.7), 'Medium': (4.5, 0.6)}  # lognormal (mean, sigma)
+INVESTMENT = {'Micro': (1.5, 1.2), 'Small': (5.0, 0.8), 'Medium': (7.0, 0.5)}  # lakhs
+
+
+class Geography:
+    """Synthetic districts of every state, with registration weights and location codes"""
+
+    def __init__(self, rng, districts=700):
+        states = [s for s in STATE_ORDER if s in STATE_COORDS]
+        state_share = 1 / np.arange(1, len(states) + 1)
+        # Larger states have more districts: roughly proportional to sqrt(share)
+        per_state = np.maximum(1, np.round(districts * np.sqrt(state_share) / np.sqrt(state_share).sum())).astype(int)
+        self.state = np.repeat(np.array(states, dtype=object), per_state)
+        self.district = np.array([f'{s} DISTRICT {i + 1:02d}' for s, n in zip(states, per_state) for i in range(n)],
+                                 dtype=object)
+        within = np.concatenate([1 / np.arange(1, n + 1) for n in per_state])
+        within_total = np.repeat(np.add.reduceat(within, np.r_[0, np.cumsum(per_state)[:-1]]), per_state)
+        weights = np.repeat(state_share, per_state) * within / within_total
+        self.weights = weights / weights.sum()
+        self.lg_code = np.arange(1, len(self.district) + 1)
+        self.pin_base = 110000 + rng.choice(880000 // PINS_PER_DISTRICT, len(self.district), replace=False) * PINS_PER_DISTRICT
+
+    def __len__(self):
+        return len(self.district)
+
+
+def _choice(rng, spec, n):
+    values = np.array(list(spec), dtype=object)
+    return rng.choice(len(values), n, p=np.array(list(spec.values())) / sum(spec.values())), values
+
+
+def nic_code_pool():
+    """(every code the generator can emit, the probability of each)"""
+    rng = np.random.default_rng(0)
+    divisions = sorted(NIC_DIVISIONS)
+    pool = np.concatenate([d * 1000 + np.sort(rng.choice(1000, NIC_CODE_POOL, replace=False)) for d in divisions])
+    weights = np.repeat([NIC_DIVISIONS[d] for d in divisions], NIC_CODE_POOL).astype('float64')
+    return pool, weights / weights.sum()
+
+
+def _nic_fields(rng, pool, n):
+    """(NIC field strings as an Arrow array, first code's index into the pool)"""
+    pool, weights = pool
+    count_idx, counts = _choice(rng, CODES_PER_FIELD, n)
+    counts = counts[count_idx].astype(int)
+    picks = rng.choice(len(pool), (n, max(CODES_PER_FIELD)), p=weights)
+    parts = []
+    for i in range(max(CODES_PER_FIELD)):
+        code = pc.utf8_lpad(pa.array(pool[picks[:, i]]).cast(pa.string()), 5, '0')
+        part = pc.binary_join_element_wise(f' {i + 1}) ', code, '')
+        parts.append(pc.if_else(pa.array(counts > i), part, pa.nulls(n, pa.string())))
+    return pc.binary_join_element_wise(*parts, '; ', null_handling='skip'), picks[:, 0]
+
+
+def _dates(rng, start, end, n):
+    days = (np.datetime64(end) - np.datetime64(start)).astype(int)
+    # Skewed towards recent dates
+    offset = (days * rng.beta(2.5, 1.2, n)).astype('int64')
+    return pc.strftime(pa.array(np.datetime64(start) + offset.astype('timedelta64[D]')), '%d-%m-%Y')
+
+
+def generate_chunk(rng, geo, pool, first_aid, n):
+    """(master rows as an Arrow table, numeric columns for the profile aggregates)"""
+    d = rng.choice(len(geo), n, p=geo.weights)
+    pin = rng.integers(0, PINS_PER_DISTRICT, n)
+    cats = {col: _choice(rng, spec, n) for col, spec in CATEGORIES.items()}
+    etype_idx, etypes = cats['enterprisetype']
+    emp_mu, emp_sigma = (np.array([EMPLOYEES[t][k] for t in etypes]) for k in (0, 1))
+    inv_mu, inv_sigma = (np.array([INVESTMENT[t][k] for t in etypes]) for k in (0, 1))
+    employees = np.maximum(1, np.round(rng.lognormal(emp_mu[etype_idx], emp_sigma[etype_idx]))).astype('int64')
+    investment = np.round(rng.lognormal(inv_mu[etype_idx], inv_sigma[etype_idx]), 2)
+    nic, first = _nic_fields(rng, pool, n)
+    aid = pa.array(np.arange(first_aid, first_aid + n)).cast(pa.string())
+    district = pa.array(geo.district[d], pa.string())
+
+    table = pa.table({
+        'aid': aid,
+        'enterprisename': pc.binary_join_element_wise('ENTERPRISE ', aid, ''),
+        **{col: pa.array(values[idx], pa.string()) for col, (idx, values) in cats.items()
+           if col in ('socialcategory', 'gender', 'ph', 'organisationtype')},
+        'plantlocation': pc.binary_join_element_wise(' 1) UNIT ', aid, ''),
+        'address': pc.binary_join_element_wise('PLOT ', aid, ', ', district, ''),
+        'state': pa.array(geo.state[d], pa.string()),
+        'district': district,
+        'pincode': pa.array(geo.pin_base[d] + pin).cast(pa.string()),
+        'commmencedate': _dates(rng, '1990-01-01', '2020-06-30', n),
+        'majoractivity': pa.array(cats['majoractivity'][1][cats['majoractivity'][0]], pa.string()),
+        'enterprisetype': pa.array(etypes[etype_idx], pa.string()),
+        'nic5digitcode': nic,
+        'totalemp': pa.array(employees).cast(pa.string()),
+        'investmentcost': pa.array(investment).cast(pa.string()),
+        'dic_name': district,
+        'registrationdate': _dates(rng, '2020-07-01', '2025-12-31', n),
+        'lg_dist_code': pa.array(geo.lg_code[d]).cast(pa.string()),
+    })
+    flags = {col: cats[src][0] == list(CATEGORIES[src]).index(value) for col, (src, value) in MASTER_FLAGS.items()}
+    return table, {'district': d, 'pin': pin, 'first_code': first, 'employees': employees,
+                   'investment': investment, **flags}
+
+
+class SyntheticAggregates:
+    """Running district, location and NIC totals of the generated rows"""
+
+    def __init__(self, geo, pool):
+        self.geo, self.pool = geo, pool[0]
+        self.measures = np.zeros((len(MEASURES), len(geo)))
+        self.locations = np.zeros(len(geo) * PINS_PER_DISTRICT, dtype='int64')
+        self.nic = np.zeros(len(geo) * len(self.pool), dtype='int64')
+
+    def add(self, rows):
+        d, n_geo = rows['district'], len(self.geo)
+        values = {'total_msmes': None, 'total_employment': rows['employees'], 'total_investment': rows['investment']}
+        values.update({col: rows[col] for col in MASTER_FLAGS})
+        for i, col in enumerate(MEASURES):
+            self.measures[i] += np.bincount(d, weights=values[col], minlength=n_geo)
+        self.locations += np.bincount(d * PINS_PER_DISTRICT + rows['pin'], minlength=len(self.locations))
+        self.nic += np.bincount(d * len(self.pool) + rows['first_code'], minlength=len(self.nic))
+
+    def aggregator(self):
+        """A ProfileAggregator holding these totals, for its profiles() layout"""
+        geo, agg = self.geo, ProfileAggregator()
+        keys = pd.MultiIndex.from_arrays([geo.state, geo.district], names=DISTRICT_KEYS)
+        districts = pd.DataFrame(self.measures.T, index=keys, columns=MEASURES)
+        agg.districts = districts[districts['total_msmes'] > 0]
+
+        loc = np.flatnonzero(self.locations)
+        dl, pin = np.divmod(loc, PINS_PER_DISTRICT)
+        agg.locations = pd.Series(self.locations[loc], index=pd.MultiIndex.from_arrays(
+            [geo.state[dl], geo.district[dl], geo.lg_code[dl].astype(str), (geo.pin_base[dl] + pin).astype(str),
+             geo.district[dl]], names=LOCATION_KEYS))
+
+        pairs = np.flatnonzero(self.nic)
+        dn, code = np.divmod(pairs, len(self.pool))
+        codes = np.char.zfill(self.pool[code].astype(str), 5)
+        agg.district_nic = pd.Series(self.nic[pairs], index=pd.MultiIndex.from_arrays(
+            [geo.state[dn], geo.district[dn], codes], names=DISTRICT_KEYS + ['nic']))
+        agg.state_nic = agg.district_nic.groupby(level=['State', 'nic']).sum()
+        return agg
+
+
+def write_master_header(f):
+    f.write((','.join(MASTER_HEADER) + '\n').encode())
+
+
+def generate(rows, out_dir, seed=0, chunk_rows=CHUNK_ROWS, progress=print):
+    """Write msme_merged.csv and the five profile CSVs for rows synthetic registrations"""
+    rng = np.random.default_rng(seed)
+    geo, pool = Geography(rng), nic_code_pool()
+    totals = SyntheticAggregates(geo, pool)
+    os.makedirs(out_dir, exist_ok=True)
+    master_path = os.path.join(out_dir, 'msme_merged.csv')
+    started = time.perf_counter()
+    with open(f'{master_path}.tmp', 'wb') as f:
+        write_master_header(f)
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            table, numeric = generate_chunk(rng, geo, pool, 10_000_000 + start, n)
+            pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False, quoting_style='needed'))
+            totals.add(numeric)
+            if progress:
+                progress(f'{start + n:,} / {rows:,} rows ({time.perf_counter() - started:.1f}s)')
+    os.replace(f'{master_path}.tmp', master_path)
+
+    profiles = totals.aggregator().profiles()
+    for name, filename in [('loc', 'location_profile.csv'), ('soc', 'social_profile.csv'),
+                           ('emp', 'employment_profile.csv'), ('ind', 'industry_profile.csv'),
+                           ('score', 'composite_score.csv')]:
+        profiles[name].to_csv(os.path.join(out_dir, filename), index=False)
+    return out_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('rows', type=int, help='number of registrations, e.g. 10000 or 50000000')
+    parser.add_argument('out_dir', help='folder to write the CSVs into (used as WORK_DIR)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    generate(args.rows, args.out_dir, args.seed)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from category_index import CATEGORY_COLUMNS, CategoryIndex, district_codes
+
+# District sizes that put nearly every boundary in the middle of a byte
+DISTRICTS = [('JHARKHAND', 'BOKARO ', 3), ('JHARKHAND', 'RANCHI', 9), (' DELHI', 'SOUTH ', 1),
+             ('DELHI', 'EAST', 13), ('GOA', 'NORTH', 7), ('ODISHA', 'PURI', 22)]
+
+
+def master(seed=0):
+    """Rows of each district, shuffled so the file order isn't the index order"""
+    rng = np.random.default_rng(seed)
+    keys = [(s, d) for s, d, n in DISTRICTS for _ in range(n)]
+    keys = [keys[i] for i in rng.permutation(len(keys))]
+    n = len(keys)
+    columns = {
+        'state': [s for s, _ in keys],
+        'district': [d for _, d in keys],
+        'gender': rng.choice(['Female', 'Male', ' Female', ''], n),
+        'socialcategory': rng.choice(['SC', 'ST', 'OBC', 'General'], n),
+        'ph': rng.choice(['Yes', 'No'], n),
+        'organisationtype': rng.choice(['Proprietary', 'Partnership'], n),
+        'majoractivity': rng.choice(['Manufacturing', 'Services'], n),
+        'enterprisetype': rng.choice(['Micro', 'Small', 'Medium'], n),
+    }
+    return pa.table({c: pa.array(v, pa.string()) for c, v in columns.items()})
+
+
+TABLE = master()
+FRAME = TABLE.to_pandas().apply(lambda col: col.str.strip())
+
+FILTERS = [
+    {},
+    {'gender': ['Female']},
+    {'gender': ['Female', 'Male'], 'socialcategory': ['SC', 'ST']},
+    {'ph': ['Yes'], 'majoractivity': ['Services'], 'enterprisetype': ['Micro', 'Medium']},
+    {'gender': ['Other']},
+    {'gender': []},  # an empty list doesn't filter
+]
+
+
+def matching(filters, state=None, district=None, skip=None):
+    keep = pd.Series(True, index=FRAME.index)
+    for column, values in filters.items():
+        if values and column != skip:
+            keep &= FRAME[column].isin(values)
+    if state:
+        keep &= FRAME['state'] == state.strip()
+    if district:
+        keep &= FRAME['district'] == district.strip()
+    return keep
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('state, district', [(None, None), ('JHARKHAND', None), ('DELHI', None),
+                                             (' DELHI', 'SOUTH '), ('GOA', 'NORTH'), ('ODISHA', None),
+                                             ('NOSUCH', None), ('GOA', 'PURI')])
+def test_counts_match_pandas(filters, state, district):
+    index = CategoryIndex(TABLE)
+    assert index.count(filters, state, district) == matching(filters, state, district).sum()
+    for column in CATEGORY_COLUMNS:
+        expected = FRAME[matching(filters, state, district, skip=column)][column].value_counts()
+        counts = index.value_counts(column, filters, state, district)
+        assert counts == {v: int(expected.get(v, 0)) for v in index.values(column)}
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('state', [None, 'JHARKHAND', ' DELHI ', 'ODISHA'])
+def test_district_counts_match_groupby(filters, state):
+    counts = CategoryIndex(TABLE).district_counts(filters, state)
+    keys = FRAME[['state', 'district']].drop_duplicates()
+    if state:
+        keys = keys[keys['state'] == state.strip()]
+    expected = FRAME[matching(filters, state)].groupby(['state', 'district']).size()
+    assert sorted(counts.index) == sorted(map(tuple, keys.to_numpy()))
+    np.testing.assert_array_equal(counts.to_numpy(), expected.reindex(counts.index, fill_value=0).to_numpy())
+
+
+def test_district_counts_of_unknown_state():
+    assert CategoryIndex(TABLE).district_counts({'gender': ['Female']}, 'NOSUCH').sum() == 0
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_row_mask_is_in_file_order(filters):
+    mask = CategoryIndex(TABLE).row_mask(filters)
+    if not any(filters.values()):
+        assert mask is None
+    else:
+        np.testing.assert_array_equal(mask, matching(filters).to_numpy())
+
+
+def test_popcount_at_every_bit_boundary():
+    index = CategoryIndex(TABLE)
+    bits = index.bitmaps['ph']['Yes']
+    unpacked = np.unpackbits(bits, count=index.num_rows)
+    for start in range(index.num_rows + 1):
+        for stop in range(start, index.num_rows + 1):
+            packed = bits[start >> 3:(stop + 7) >> 3]
+            assert index._count(packed, start, stop) == unpacked[start:stop].sum(), (start, stop)
+
+
+def test_names_with_whitespace():
+    index = CategoryIndex(TABLE)
+    assert index.count(None, 'JHARKHAND', 'BOKARO ') == index.count(None, 'JHARKHAND', 'BOKARO') == 3
+    assert ('DELHI', 'SOUTH') in index.districts
+    assert set(index.values('gender')) == {'Female', 'Male'}  # ' Female' is Female, blanks aren't indexed
+
+
+def test_district_codes_group_states():
+    codes, districts = district_codes(TABLE)
+    assert len(codes) == TABLE.num_rows
+    states = districts.get_level_values('State')
+    # Each state's districts have consecutive codes
+    assert all(np.ptp(np.flatnonzero(states == s)) == (states == s).sum() - 1 for s in set(states))
+    np.testing.assert_array_equal(districts[codes].get_level_values('District'), FRAME['district'])
+
+
+def test_empty_table():
+    index = CategoryIndex(TABLE.slice(0, 0))
+    assert index.count({'gender': ['Female']}) == 0
+    assert index.district_counts().empty
+    assert index.values('gender') == []
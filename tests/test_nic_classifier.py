@@ -0,0 +1,105 @@
+import re
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from nic_classifier import NIC_SECTOR_MAP, OTHER, SECTORS, classify_nic, nic_sector, split_nic_codes
+
+
+def reference_codes(field):
+    """Codes of a field the slow way: every digit run of five or more, first five digits"""
+    return [int(run[:5]) for run in re.findall(r'\d+', field or '') if len(run) >= 5]
+
+
+def reference_sector(code):
+    """Narrowest range containing the code"""
+    matches = [(len(r), name) for name, r in NIC_SECTOR_MAP.items() if code in r]
+    return SECTORS.index(min(matches)[1]) if matches else OTHER
+
+
+def reference_memberships(codes):
+    bits = 0
+    for code in codes:
+        in_any = [SECTORS.index(name) for name, r in NIC_SECTOR_MAP.items() if code in r]
+        for i in in_any or [OTHER]:
+            bits |= 1 << i
+    return bits if codes else 1 << OTHER
+
+
+FIELDS = [
+    ' 1) 13201; 2) 10101; 3) 99999',
+    '62011',
+    '',
+    None,
+    '1) 4711',                # a run shorter than five: no code
+    '123456789',              # a long run: its first five digits
+    '1) 56101;2) 45200 ',
+    '12345',                  # ends with digits ...
+    '67890',                  # ... and the next field starts with digits: two codes, not one run
+    '1234',                   # a short run at the end of a field ...
+    '5 abc',                  # ... is not joined with the next field's digits
+]
+
+
+def check_codes(values, fields):
+    offsets, codes = split_nic_codes(values)
+    assert len(offsets) == len(fields) + 1
+    assert [codes[offsets[i]:offsets[i + 1]].tolist() for i in range(len(fields))] == \
+        [reference_codes(f) for f in fields]
+
+
+def test_split_matches_regex_reference():
+    check_codes(FIELDS, FIELDS)
+
+
+@pytest.mark.parametrize('start', [0, 1, 3, 7])
+def test_split_of_sliced_arrow_array(start):
+    # A slice keeps the parent's buffers with a non-zero offset
+    array = pa.array(FIELDS, pa.string()).slice(start)
+    check_codes(array, FIELDS[start:])
+
+
+def test_split_of_chunked_and_large_string_arrays():
+    chunked = pa.chunked_array([pa.array(FIELDS[:4]), pa.array(FIELDS[4:])])
+    check_codes(chunked, FIELDS)
+    check_codes(pa.array(FIELDS, pa.large_string()), FIELDS)
+
+
+def test_split_of_empty_input():
+    offsets, codes = split_nic_codes([])
+    assert offsets.tolist() == [0] and len(codes) == 0
+    offsets, codes = split_nic_codes(pa.chunked_array([], pa.string()))
+    assert offsets.tolist() == [0] and len(codes) == 0
+
+
+def test_classify_matches_reference():
+    result = classify_nic(FIELDS)
+    for i, field in enumerate(FIELDS):
+        codes = reference_codes(field)
+        assert result.primary[i] == (reference_sector(codes[0]) if codes else OTHER), field
+        assert result.memberships[i] == reference_memberships(codes), field
+
+
+def test_every_range_boundary():
+    codes = sorted({b for r in NIC_SECTOR_MAP.values() for b in (r.start - 1, r.start, r.stop - 1, r.stop)})
+    result = classify_nic([f'{c:05d}' for c in codes])
+    assert result.primary.tolist() == [reference_sector(c) for c in codes]
+    assert result.memberships.tolist() == [reference_memberships([c]) for c in codes]
+
+
+def test_narrowest_range_wins():
+    assert nic_sector('13201') == 'Textiles & Apparel'
+    assert nic_sector('33000') == 'Manufacturing'
+    assert nic_sector('') == 'Other'
+    memberships = classify_nic(['13201']).memberships[0]
+    assert memberships & (1 << SECTORS.index('Manufacturing'))
+
+
+def test_random_fields():
+    rng = np.random.default_rng(0)
+    fields = ['; '.join(f'{j + 1}) {c:05d}' for j, c in enumerate(rng.integers(0, 100_000, rng.integers(0, 4))))
+              for _ in range(500)]
+    check_codes(fields, fields)
+    result = classify_nic(fields)
+    assert result.memberships.tolist() == [reference_memberships(reference_codes(f)) for f in fields]
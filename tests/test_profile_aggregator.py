@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from profile_aggregator import MASTER_COLUMNS, MEASURES, ProfileAggregator, prepare_master_rows
+
+
+def master(rows):
+    """Raw master rows (all text) from (aid, state, district, gender, totalemp, nic) tuples"""
+    df = pd.DataFrame(rows, columns=['aid', 'state', 'district', 'gender', 'totalemp', 'nic5digitcode'])
+    defaults = {'lg_dist_code': '1', 'pincode': '100001', 'dic_name': 'DIC', 'investmentcost': '10',
+                'socialcategory': 'General', 'ph': 'No', 'enterprisetype': 'Micro', 'majoractivity': 'Services'}
+    for col in MASTER_COLUMNS:
+        if col not in df:
+            df[col] = defaults[col]
+    return df
+
+
+def reference(*batches):
+    """District measures of the last version of every aid, straight from pandas"""
+    rows = prepare_master_rows(pd.concat(batches, ignore_index=True))
+    return rows.groupby(['State', 'District'])[MEASURES].sum().astype('float64')
+
+
+def check(agg, *batches):
+    expected = reference(*batches)
+    pd.testing.assert_frame_equal(agg.districts.sort_index()[MEASURES], expected.sort_index(), check_names=False)
+
+
+BATCH_1 = master([
+    ('1', 'JHARKHAND', 'BOKARO ', 'Female', '5', '1) 10101'),
+    ('2', 'JHARKHAND', 'RANCHI', 'Male', '', '2) 20202'),
+    ('3', ' DELHI', 'SOUTH ', 'Female', 'n/a', '10101'),
+    ('3', 'DELHI', 'SOUTH', 'Male', '7', '10101'),  # same aid twice in a batch: the last one counts
+])
+BATCH_2 = master([
+    ('1', 'JHARKHAND', 'RANCHI', 'Male', '2', '20202'),  # moves district and changes gender
+    ('4', 'ODISHA', 'PURI', 'Female', '3', '30303'),
+])
+
+
+def test_batches_match_pandas_reference():
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    check(agg, BATCH_1)
+    agg.apply_batch(BATCH_2)
+    check(agg, BATCH_1, BATCH_2)
+    assert len(agg) == 4
+
+
+def test_replaced_aid_moves_its_contribution():
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    touched = agg.apply_batch(BATCH_2)
+    # The district the row left is touched too, and drops out once empty
+    assert ('JHARKHAND', 'BOKARO') in touched
+    assert ('JHARKHAND', 'BOKARO') not in agg.districts.index
+    ranchi = agg.districts.loc[('JHARKHAND', 'RANCHI')]
+    assert ranchi['total_msmes'] == 2
+    assert ranchi['female_owned'] == 0 and ranchi['male_owned'] == 2
+    assert ranchi['total_employment'] == 2  # the blank totalemp counts as 0
+
+
+def test_names_are_trimmed():
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    assert ('DELHI', 'SOUTH') in agg.districts.index
+    assert agg.districts.loc[('DELHI', 'SOUTH'), 'total_msmes'] == 1
+
+
+def test_empty_batch():
+    agg = ProfileAggregator()
+    assert agg.apply_batch(BATCH_1.iloc[:0]) == set()
+    assert agg.districts.empty
+
+
+def test_resending_a_batch_changes_nothing():
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    before = agg.districts.copy()
+    agg.apply_batch(BATCH_1)
+    pd.testing.assert_frame_equal(agg.districts, before)
+
+
+@pytest.mark.parametrize('batch_rows', [1, 2, 10])
+def test_from_master_is_independent_of_batch_size(batch_rows):
+    full = pd.concat([BATCH_1, BATCH_2], ignore_index=True)
+    check(ProfileAggregator.from_master(full, batch_rows=batch_rows), full)
+
+
+def test_top_nic_prefers_lowest_code_on_ties():
+    agg = ProfileAggregator()
+    agg.apply_batch(master([('1', 'GOA', 'NORTH', 'Male', '1', '20202'),
+                            ('2', 'GOA', 'NORTH', 'Male', '1', '10101')]))
+    ind = agg.profiles()['ind'].set_index(['State', 'District'])
+    assert ind.loc[('GOA', 'NORTH'), 'top_nic_sector'] == '10101'
+    assert ind.loc[('GOA', 'NORTH'), 'industry_diversity_index'] == 2
+
+
+def test_resending_aids_of_a_large_batch_leaves_it_untouched():
+    n = 50_000
+    big = master([(str(i), 'GOA' if i % 3 else 'ODISHA', f'D{i % 40}', 'Female' if i % 2 else 'Male',
+                   str(i % 7), f'{10000 + i % 13}') for i in range(n)])
+    agg = ProfileAggregator.from_master(big)
+    first = agg._contributions[0]
+    update = master([('7', 'GOA', 'NEW', 'Male', '100', '99999'),
+                     ('42', 'GOA', 'D2', 'Female', '', '10001'),
+                     ('x', 'GOA', 'D1', 'Male', '1', '10001')])
+    touched = agg.apply_batch(update)
+    check(agg, big, update)
+    assert len(agg) == n + 1
+    assert ('GOA', 'D7') in touched and ('GOA', 'NEW') in touched
+    # The earlier contributions are not copied: only the batch's own are added
+    assert agg._contributions[0] is first
+    assert agg._starts == [0, n, n + 3]
+
+
+def test_copy_takes_batches_without_changing_the_original():
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    before = agg.districts.copy()
+    other = agg.copy()
+    other.apply_batch(BATCH_2)
+    check(other, BATCH_1, BATCH_2)
+    pd.testing.assert_frame_equal(agg.districts, before)
+    assert len(agg) == 3
+    agg.apply_batch(BATCH_2)
+    check(agg, BATCH_1, BATCH_2)
+
+
+def test_save_and_load(tmp_path):
+    agg = ProfileAggregator()
+    agg.apply_batch(BATCH_1)
+    agg.save(tmp_path / 'agg.pkl')
+    loaded = ProfileAggregator.load(tmp_path / 'agg.pkl')
+    loaded.apply_batch(BATCH_2)
+    check(loaded, BATCH_1, BATCH_2)
+
+    agg.state_version = None
+    agg.save(tmp_path / 'old.pkl')
+    with pytest.raises(ValueError):
+        ProfileAggregator.load(tmp_path / 'old.pkl')
@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from record_browser import NUMERIC_COLUMNS, RECORD_COLUMNS, RecordIndex, parse_filter
+
+STATES = {'JHARKHAND': ['BOKARO ', 'RANCHI'], ' DELHI': ['SOUTH ', 'EAST'], 'GOA': ['NORTH']}
+
+
+def master(n=60, batch_rows=7, seed=0):
+    """A master table of text columns in several record batches, names padded with spaces"""
+    rng = np.random.default_rng(seed)
+    states = rng.choice(list(STATES), n)
+    columns = {
+        'state': states,
+        'district': [rng.choice(STATES[s]) for s in states],
+        'enterprisename': [f' Unit {i % 9} ' for i in range(n)],
+        'enterprisetype': rng.choice(['Micro', 'Small', 'Medium', ''], n),
+        'socialcategory': rng.choice(['SC', 'ST', 'General'], n),
+        'gender': rng.choice(['Female', 'Male', 'female'], n),
+        'nic5digitcode': rng.choice(['1) 10101', '2) 62011'], n),
+        'totalemp': rng.choice(['1', '2', ' 10', '', 'n/a', '2.5'], n),
+        'investmentcost': rng.choice(['100', '250', ''], n),
+        'dic_name': rng.choice(['DIC A', 'DIC B'], n),
+    }
+    table = pa.table({c: pa.array(v, pa.string()) for c, v in columns.items()})
+    return pa.Table.from_batches(table.to_batches(max_chunksize=batch_rows))
+
+
+def trimmed(table):
+    df = table.to_pandas()
+    return df.apply(lambda col: col.str.strip())
+
+
+def sort_key(df, column):
+    if column in NUMERIC_COLUMNS:
+        return pd.to_numeric(df[column], errors='coerce')
+    return df[column].where(df[column] != '')
+
+
+def reference(df, state=None, district=None, sort_by=None, ascending=True, filter_query='', rows=None):
+    """The records a page is cut from, the slow way"""
+    keep = pd.Series(True, index=df.index)
+    if state:
+        keep &= df['state'] == state.strip()
+        if district:
+            keep &= df['district'] == district.strip()
+    for column, op, value in parse_filter(filter_query):
+        if column not in RECORD_COLUMNS:
+            continue  # unknown columns are ignored
+        number = pd.to_numeric(value, errors='coerce')
+        if column in NUMERIC_COLUMNS and op != 'contains' and not pd.isna(number):
+            values = pd.to_numeric(df[column], errors='coerce')
+            keep &= {'eq': values == number, 'ne': values != number, 'gt': values > number,
+                     'lt': values < number, 'ge': values >= number, 'le': values <= number}[op]
+        elif op == 'contains':
+            keep &= df[column].str.lower().str.contains(value.lower(), regex=False)
+        elif op in ('eq', 'ne'):
+            equal = df[column].str.lower() == value.lower()
+            keep &= ~equal if op == 'ne' else equal
+        else:
+            keep &= {'gt': df[column] > value, 'lt': df[column] < value,
+                     'ge': df[column] >= value, 'le': df[column] <= value}[op]
+    if rows is not None:
+        keep &= rows
+    selected = df[keep]
+    if sort_by:
+        key = sort_key(selected, sort_by)
+        valid = key.notna()
+        ranked = selected[valid].iloc[np.argsort(key[valid].to_numpy(), kind='stable')]
+        if not ascending:
+            ranked = ranked.iloc[::-1]  # descending is the ascending order read backwards
+        selected = pd.concat([ranked, selected[~valid]])
+    return selected
+
+
+def check_pages(index, expected, page_size, **kwargs):
+    total = None
+    seen = []
+    for page in range(max(1, -(-len(expected) // page_size)) + 1):
+        result = index.page(page=page, page_size=page_size, **kwargs)
+        total = result.total
+        seen.append(result.rows)
+    assert total == len(expected)
+    got = pd.concat(seen, ignore_index=True)
+    want = expected[list(RECORD_COLUMNS)].reset_index(drop=True)
+    for column in NUMERIC_COLUMNS:
+        want[column] = pd.to_numeric(want[column], errors='coerce')
+    pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+TABLE = master()
+FRAME = trimmed(TABLE)
+
+
+@pytest.mark.parametrize('state, district', [(None, None), ('JHARKHAND', None), ('DELHI', 'SOUTH'),
+                                             ('JHARKHAND', 'BOKARO '), (' DELHI ', 'SOUTH ')])
+@pytest.mark.parametrize('sort_by', [None, 'totalemp', 'enterprisetype', 'district'])
+@pytest.mark.parametrize('ascending', [True, False])
+def test_pages_match_reference(state, district, sort_by, ascending):
+    index = RecordIndex(TABLE)
+    expected = reference(FRAME, state, district, sort_by, ascending)
+    check_pages(index, expected, 4, state=state, district=district, sort_by=sort_by, ascending=ascending)
+
+
+@pytest.mark.parametrize('filter_query', [
+    '{gender} = Female',
+    '{gender} ne female && {totalemp} > 1',
+    '{totalemp} >= 2',
+    '{totalemp} <= 2.5',
+    '{enterprisename} contains "unit 3"',
+    '{enterprisetype} = ""',
+    '{investmentcost} != 100',
+    '{dic_name} < "DIC B"',
+    '{nosuch} = 1 && {gender} contains MAL',
+])
+@pytest.mark.parametrize('sort_by', [None, 'investmentcost'])
+def test_filtered_pages_match_reference(filter_query, sort_by):
+    index = RecordIndex(TABLE)
+    for state in [None, 'JHARKHAND']:
+        expected = reference(FRAME, state, None, sort_by, False, filter_query)
+        check_pages(index, expected, 5, state=state, sort_by=sort_by, ascending=False, filter_query=filter_query)
+
+
+def test_row_mask_restricts_records():
+    index = RecordIndex(TABLE)
+    rows = np.zeros(TABLE.num_rows, dtype=bool)
+    rows[::3] = True
+    expected = reference(FRAME, 'GOA', None, 'totalemp', True, '{gender} = female', rows)
+    check_pages(index, expected, 3, state='GOA', sort_by='totalemp', filter_query='{gender} = female',
+                rows=rows, rows_key='every third')
+
+
+def test_names_are_matched_trimmed():
+    index = RecordIndex(TABLE)
+    assert index.states() == ['DELHI', 'GOA', 'JHARKHAND']
+    assert index.districts('JHARKHAND') == ['BOKARO', 'RANCHI']
+    assert index.page('JHARKHAND', 'BOKARO ').total == index.page('JHARKHAND', 'BOKARO').total > 0
+    assert index.page(' DELHI', 'SOUTH ').total == (FRAME['district'] == 'SOUTH').sum()
+
+
+def test_empty_selections():
+    index = RecordIndex(TABLE)
+    assert index.page('NOSUCH').total == 0
+    assert index.page('GOA', 'SOUTH').total == 0
+    assert index.page(filter_query='{gender} = Other').total == 0
+    assert index.page(page=100).rows.empty
+    empty = RecordIndex(TABLE.slice(0, 0))
+    result = empty.page()
+    assert result.total == 0 and result.rows.empty
+
+
+def test_take_reassembles_rows_across_batches():
+    index = RecordIndex(TABLE)
+    positions = np.array([59, 0, 7, 6, 13, 14, 7, 33])
+    taken = index._take(positions).to_pandas()
+    expected = TABLE.to_pandas()[index.columns].iloc[positions].reset_index(drop=True)
+    pd.testing.assert_frame_equal(taken, expected)
+
+
+def test_parse_filter():
+    assert parse_filter('{gender} s= Female && {totalemp} i> 10 && junk') == \
+        [('gender', 'eq', 'Female'), ('totalemp', 'gt', '10')]
+    assert parse_filter('{enterprisename} contains "A && B"') == [('enterprisename', 'contains', 'A && B')]
+    assert parse_filter('{enterprisename} = "say \\"hi\\"" && {totalemp} >= 2') == \
+        [('enterprisename', 'eq', 'say "hi"'), ('totalemp', 'ge', '2')]
+    assert parse_filter('{enterprisename} contains R&D&&{gender} = Male') == \
+        [('enterprisename', 'contains', 'R&D'), ('gender', 'eq', 'Male')]
+    assert parse_filter("{dic_name} eq 'DIC A'") == [('dic_name', 'eq', 'DIC A')]
+    assert parse_filter('') == [] and parse_filter(None) == []
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import RankIndex, build_rollup_cube, build_state_features, select_rollup
+
+
+def district_frame(values):
+    """(State, District)-indexed rollup frame of one metric, sorted like the cube's"""
+    index = pd.MultiIndex.from_tuples([k for k, _ in values], names=['State', 'District'])
+    return pd.DataFrame({'metric': [v for _, v in values]}, index=index).sort_index()
+
+
+def cube_of(district):
+    state = district.groupby(level='State').sum(min_count=1)
+    return {'loc': {'district': district, 'state': state, 'national': state.sum()}}
+
+
+# Ties within and across states, NaN values and a state with only NaN
+DISTRICTS = district_frame([
+    (('A', 'a1'), 5.0), (('A', 'a2'), 5.0), (('A', 'a3'), np.nan), (('A', 'a4'), 1.0),
+    (('B', 'b1'), 5.0), (('B', 'b2'), 7.0), (('B', 'b3'), -2.0),
+    (('C', 'c1'), np.nan), (('C', 'c2'), np.nan),
+    (('D', 'd1'), 0.0),
+])
+
+
+def assert_same_top(top, rows, n, ascending, metric='metric'):
+    """top() against nlargest/nsmallest(keep='first')
+
+    pandas lists ties in frame order only when n is below the row count (it falls back to
+    an unstable sort otherwise), so beyond that the rows, the value sequence and
+    frame-order ties are checked instead.
+    """
+    expected = rows.nsmallest(n, metric) if ascending else rows.nlargest(n, metric)
+    if n < len(rows):
+        pd.testing.assert_frame_equal(top, expected)
+        return
+    assert sorted(top.index) == sorted(expected.index)
+    np.testing.assert_array_equal(top[metric].to_numpy(), expected[metric].to_numpy())
+    position = pd.Series(np.arange(len(rows)), index=rows.index)[top.index]
+    for _, tied in position.groupby(top[metric].fillna(np.inf).to_numpy(), sort=False):
+        assert tied.is_monotonic_increasing
+
+
+@pytest.mark.parametrize('ascending', [False, True])
+@pytest.mark.parametrize('n', [1, 2, 3, 20])
+@pytest.mark.parametrize('state', [None, 'A', 'B', 'C', 'D'])
+def test_top_districts_match_nlargest(state, n, ascending):
+    cube = cube_of(DISTRICTS)
+    rows = select_rollup(cube, 'loc', state).districts
+    top = RankIndex(cube).top('loc', 'metric', n, state, ascending=ascending)
+    assert_same_top(top, rows, n, ascending)
+
+
+@pytest.mark.parametrize('ascending', [False, True])
+@pytest.mark.parametrize('n', [1, 2, 10])
+def test_top_states_match_nlargest(n, ascending):
+    cube = cube_of(DISTRICTS)
+    top = RankIndex(cube).top('loc', 'metric', n, level='state', ascending=ascending)
+    assert_same_top(top, cube['loc']['state'], n, ascending)
+
+
+def test_single_row_selections():
+    cube = cube_of(DISTRICTS)
+    ranks = RankIndex(cube)
+    assert ranks.top('loc', 'metric', 5, 'B', 'b2')['metric'].tolist() == [7.0]
+    assert ranks.top('loc', 'metric', 5, 'A', level='state')['metric'].tolist() == [11.0]
+    assert ranks.top('loc', 'metric', 5, 'A', 'a3').index.tolist() == [('A', 'a3')]  # NaN, as nlargest keeps it
+
+
+def test_unknown_selection_is_empty():
+    cube = cube_of(DISTRICTS)
+    ranks = RankIndex(cube)
+    assert ranks.top('loc', 'metric', 5, 'NOSUCH').empty
+    assert ranks.top('loc', 'metric', 5, 'A', 'nosuch').empty
+    assert ranks.top('nosuch', 'metric', 5).empty
+
+
+def test_names_with_whitespace_are_distinct_states():
+    cube = cube_of(district_frame([(('A', 'x'), 1.0), (('A ', 'y'), 2.0)]))
+    ranks = RankIndex(cube)
+    assert ranks.top('loc', 'metric', 5, 'A').index.tolist() == [('A', 'x')]
+    assert ranks.top('loc', 'metric', 5, 'A ').index.tolist() == [('A ', 'y')]
+
+
+def test_built_cube_matches_nlargest_for_every_metric():
+    rng = np.random.default_rng(1)
+    states = np.repeat(['S1', 'S2', 'S3'], 6)
+    soc = pd.DataFrame({
+        'State': states, 'District': [f'{s}-{i % 4}' for i, s in enumerate(states)],
+        **{col: rng.integers(0, 4, len(states)) for col in
+           ['total_msmes', 'sc_count', 'st_count', 'obc_count', 'general_count', 'female_owned', 'male_owned', 'ph_count']}})
+    cube = build_rollup_cube(pd.DataFrame(), soc, pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+    ranks = RankIndex(cube)
+    for metric in cube['soc']['district'].select_dtypes('number').columns:
+        for state in [None, 'S2']:
+            rows = select_rollup(cube, 'soc', state).districts
+            for ascending in (False, True):
+                for n in (1, 4, len(rows)):
+                    assert_same_top(ranks.top('soc', metric, n, state, ascending=ascending), rows, n, ascending, metric)
+
+
+def test_state_feature_percentiles():
+    cube = cube_of(DISTRICTS)
+    features = build_state_features(cube)
+    values = cube['loc']['state']['metric']
+    valid = values.dropna()
+    expected = values.map(lambda v: (valid <= v).sum() - 1) / (len(valid) - 1)
+    pd.testing.assert_series_equal(features['metric_percentile'], expected.where(values.notna()),
+                                   check_names=False)
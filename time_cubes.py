@@ -0,0 +1,135 @@
+"""Monthly cumulative cubes of the master's registrations, for date-range filters and trend animations
+
+The two dates of the master (commmencedate, registrationdate; dd-mm-yyyy text) are
+parsed once per snapshot, as whole columns. Each row adds its count, employment and
+investment to its (district, month) cell, and the cells are summed along the months,
+so any date range of any state or district is one subtraction of two columns:
+
+    total over months [start, end] = cumulative[:, end + 1] - cumulative[:, start]
+
+An animation frame is the same subtraction at a later end month, so every frame of a
+range comes from the cube without going back to the master.
+"""
+import datetime
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from category_index import district_codes
+
+# Master column -> control label
+DATE_COLUMNS = {
+    'registrationdate': 'Registration Date',
+    'commmencedate': 'Commencement Date',
+}
+# Measure -> (master column summed, or None to count rows; label)
+MEASURES = {
+    'msme_count': (None, 'Registrations'),
+    'total_employment': ('totalemp', 'Employment'),
+    'total_investment': ('investmentcost', 'Investment'),
+}
+FIRST_YEAR = 1950  # earlier dates are counted in the first month
+MAX_FRAMES = 48
+
+Frame = namedtuple('Frame', ['month', 'values'])
+
+
+def parse_months(column):
+    """Month number (year * 12 + month - 1) per row of a dd-mm-yyyy column; -1 where blank or invalid"""
+    dates = pc.strptime(pc.utf8_trim_whitespace(column.cast(pa.string())), format='%d-%m-%Y', unit='s',
+                        error_is_null=True)
+    months = pc.add(pc.multiply(pc.year(dates), 12), pc.subtract(pc.month(dates), 1))
+    return months.fill_null(-1).to_numpy(zero_copy_only=False).astype('int64')
+
+
+def month_label(month):
+    return f'{month // 12:04d}-{month % 12 + 1:02d}'
+
+
+class TimeCube:
+    """Cumulative count, employment and investment per district and month of one date column"""
+
+    def __init__(self, table, column, today=None):
+        today = today or datetime.date.today()
+        last = today.year * 12 + today.month - 1
+        codes, self.districts = district_codes(table)
+        months = parse_months(table.column(column))
+        dated = (months >= 0) & (months <= last)  # future dates are typos
+        self.undated = int((~dated).sum())
+        months = np.maximum(months[dated], FIRST_YEAR * 12)
+        self.first = int(months.min()) if len(months) else last
+        self.months = [month_label(m) for m in range(self.first, last + 1)]
+
+        n_districts, n_months = len(self.districts), len(self.months)
+        cells = codes[dated].astype('int64') * n_months + (months - self.first)
+        self.cumulative = {}
+        for measure, (source, _) in MEASURES.items():
+            if source is not None and source not in table.column_names:
+                continue
+            weights = None
+            if source is not None:
+                values = pc.utf8_trim_whitespace(table.column(source).cast(pa.string())).to_numpy(zero_copy_only=False)
+                weights = pd.to_numeric(values, errors='coerce')[dated]
+                weights = np.nan_to_num(weights.astype('float64'))
+            monthly = np.bincount(cells, weights=weights, minlength=n_districts * n_months)
+            cumulative = np.zeros((n_districts, n_months + 1))
+            np.cumsum(monthly.reshape(n_districts, n_months), axis=1, out=cumulative[:, 1:])
+            self.cumulative[measure] = cumulative
+
+        # Districts are grouped by state, so a state's cube is the sum of a run of rows
+        states = self.districts.get_level_values('State')
+        runs = np.flatnonzero(np.r_[True, states[1:] != states[:-1]]) if n_districts else np.zeros(0, dtype='int64')
+        self.states = pd.Index(states[runs], name='State')
+        self.state_cumulative = {m: np.add.reduceat(c, runs, axis=0) if n_districts else c
+                                 for m, c in self.cumulative.items()}
+
+    def span(self, start=None, end=None):
+        """A month range clipped to the cube: (first, last) positions, inclusive"""
+        last = len(self.months) - 1
+        start = 0 if start is None else min(max(int(start), 0), last)
+        end = last if end is None else min(max(int(end), start), last)
+        return start, end
+
+    def _rows(self, state, level):
+        """(cumulative arrays, index) of every state, or of every district nationally or in a state"""
+        if level == 'state' and not state:
+            return self.state_cumulative, self.states
+        rows = np.arange(len(self.districts))
+        if state:
+            rows = np.flatnonzero(self.districts.get_level_values('State') == state)
+        return {m: c[rows] for m, c in self.cumulative.items()}, self.districts[rows]
+
+    def window(self, start=None, end=None, state=None, level='state'):
+        """Totals per state (or district) of registrations dated within months [start, end]"""
+        start, end = self.span(start, end)
+        cumulative, index = self._rows(state, level)
+        return pd.DataFrame({m: c[:, end + 1] - c[:, start] for m, c in cumulative.items()}, index=index)
+
+    def monthly(self, start=None, end=None, state=None):
+        """New registrations (and their employment, investment) per month, nationally or in a state"""
+        start, end = self.span(start, end)
+        cumulative, _ = self._rows(state, 'district')
+        return pd.DataFrame({m: np.diff(c[:, start:end + 2].sum(axis=0)) for m, c in cumulative.items()},
+                            index=pd.Index(self.months[start:end + 1], name='Month'))
+
+    def frames(self, measure, start=None, end=None, state=None, max_frames=MAX_FRAMES):
+        """[Frame(month, Series per state or district)] of the running total from start, at most max_frames
+
+        Frames are evenly spaced months ending at end, so the last one is the whole range.
+        """
+        start, end = self.span(start, end)
+        step = -(-(end - start + 1) // max_frames)
+        cumulative, index = self._rows(state, 'district' if state else 'state')
+        values = cumulative[measure]
+        return [Frame(self.months[m], pd.Series(values[:, m + 1] - values[:, start], index=index, name=measure))
+                for m in range(end, start - 1, -step)][::-1]
+
+
+def build_time_cubes(table):
+    """date column -> TimeCube, for the date columns the master has"""
+    if not table.num_rows or not {'state', 'district'} <= set(table.column_names):
+        return {}
+    return {column: TimeCube(table, column) for column in DATE_COLUMNS if column in table.column_names}
@@ -0,0 +1,85 @@
+"""Chunked CSV ingestion with bounded memory and file-based progress reporting"""
+import io
+import json
+import os
+import time
+import uuid
+
+import pandas as pd
+
+UPLOAD_CHUNK_ROWS = 50_000
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw binary reader that counts the bytes pulled from the wrapped stream"""
+
+    def __init__(self, src):
+        self.src = src
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        data = self.src.read(len(buf))
+        n = len(data)
+        buf[:n] = data
+        self.bytes_read += n
+        return n
+
+
+def _progress_path(work_dir, upload_id):
+    return os.path.join(work_dir, '.uploads', f'{upload_id}.json')
+
+
+def write_progress(work_dir, upload_id, **status):
+    """Record an upload's progress where every worker can read it"""
+    path = _progress_path(work_dir, upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(status, updated=time.time()), f)
+    os.replace(tmp, path)
+
+
+def read_progress(work_dir, upload_id):
+    """Last recorded progress of an upload, or None if unknown"""
+    try:
+        with open(_progress_path(work_dir, upload_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def new_upload_id():
+    return uuid.uuid4().hex
+
+
+def stream_csv_to_file(src, dest_path, total_bytes=None, chunk_rows=UPLOAD_CHUNK_ROWS, on_progress=None):
+    """Parse a binary CSV stream chunk by chunk and write it to dest_path
+
+    Values are read as text so nothing is reformatted (PIN codes stay integers,
+    NIC codes keep their leading zeros). Only one chunk is ever held in memory, and
+    the destination is replaced atomically once the whole file has parsed.
+    Returns (rows, columns).
+    """
+    counter = _CountingReader(src)
+    reader = pd.read_csv(io.BufferedReader(counter, buffer_size=1 << 20), dtype=str,
+                         keep_default_na=False, chunksize=chunk_rows, encoding='utf-8')
+    tmp_path = f'{dest_path}.{os.getpid()}.partial'
+    rows, columns = 0, []
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+            for chunk in reader:
+                if not columns:
+                    columns = list(chunk.columns)
+                chunk.to_csv(out, header=rows == 0, index=False)
+                rows += len(chunk)
+                if on_progress:
+                    on_progress(rows=rows, bytes_read=counter.bytes_read, total_bytes=total_bytes)
+        os.replace(tmp_path, dest_path)
+    finally:
+        reader.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return rows, columns